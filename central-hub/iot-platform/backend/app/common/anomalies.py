@@ -0,0 +1,219 @@
+"""Streaming anomaly detection on the plant readings (rolling statistics per plant and metric)."""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Literal
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.common.constants import (
+    ANOMALY_EWMA_ALPHA,
+    ANOMALY_MIN_STD,
+    ANOMALY_SPIKE_COOLDOWN,
+    ANOMALY_STEP_METRICS,
+    ANOMALY_STUCK_READINGS,
+    ANOMALY_WARMUP_READINGS,
+    ANOMALY_Z_THRESHOLD,
+)
+from app.common.daily_stats import sensor_range
+from app.common.rollups import METRIC_COLUMNS
+from app.models.plant_anomaly_state import PlantAnomalyState
+
+AnomalyKind = Literal["SPIKE", "STUCK", "DROPOUT"]
+
+# Checkpointed state fields, as in the PlantAnomalyState model
+STATE_FIELDS = (
+    "count", "mean", "variance", "rate_mean", "rate_variance",
+    "last_value", "last_timestamp", "repeats", "stuck", "dropout", "last_spike",
+)
+
+
+@dataclass(slots=True)
+class MetricState:
+    """Rolling statistics of one plant's metric (exponentially weighted)."""
+
+    count: int
+    mean: float
+    variance: float
+    rate_mean: float
+    rate_variance: float
+    last_value: float
+    last_timestamp: datetime
+    repeats: int = 0
+    stuck: bool = False
+    dropout: bool = False
+    last_spike: datetime | None = None
+
+
+@dataclass
+class Anomaly:
+    """Anomaly detected on a reading."""
+
+    plant_id: int
+    metric: str
+    kind: AnomalyKind
+    value: float
+    expected: float  # Moving mean before the reading
+    score: float | None  # Deviation in moving standard deviations (spikes and dropouts)
+    timestamp: datetime
+
+
+def _ewma(mean: float, variance: float, value: float) -> tuple[float, float]:
+    """Fold a value into an exponentially weighted mean and variance."""
+    delta = value - mean
+    return mean + ANOMALY_EWMA_ALPHA * delta, (1 - ANOMALY_EWMA_ALPHA) * (variance + ANOMALY_EWMA_ALPHA * delta * delta)
+
+
+class AnomalyDetector:
+    """
+    In-memory anomaly detector, updated in constant time by each reading.
+
+    Each plant's metric keeps an exponentially weighted moving mean and
+    variance of its value and of its rate of change. A reading is reported as:
+    - SPIKE: both its value and its rate of change deviate by more than
+      ANOMALY_Z_THRESHOLD moving standard deviations (a slow drift is not one),
+    - STUCK: the sensor returned the same value ANOMALY_STUCK_READINGS times
+      in a row (the floor of the step metrics, e.g. darkness, excepted),
+    - DROPOUT: the value fell to a bound of the sensor range, far from the
+      moving mean (a failed sensor read, e.g. the DHT11 returning 0%).
+    Stuck sensors and dropouts are reported once, until the readings recover.
+    Silent modules are reported by the heartbeat checker.
+
+    The states are checkpointed periodically (see app.tasks.anomaly_checkpoint),
+    so that a restart resumes from them instead of replaying the history.
+    """
+
+    def __init__(self) -> None:
+        self._states: dict[tuple[int, str], MetricState] = {}
+        self._dirty: set[tuple[int, str]] = set()
+        self.detected = 0
+
+    def stats(self) -> dict:
+        """Get the detector counters."""
+        return {"series": len(self._states), "detected": self.detected, "pending": len(self._dirty)}
+
+    def update(self, plant_id: int, timestamp: datetime, values: dict[str, float]) -> list[Anomaly]:
+        """Fold a reading of a plant into its metrics states, and get the anomalies it shows."""
+        anomalies = []
+        for column in METRIC_COLUMNS:
+            key = (plant_id, column)
+            state = self._states.get(key)
+            if state is None:
+                self._states[key] = MetricState(
+                    count=1, mean=values[column], variance=0.0, rate_mean=0.0, rate_variance=0.0,
+                    last_value=values[column], last_timestamp=timestamp,
+                )
+            elif timestamp > state.last_timestamp:
+                anomalies += self._update_metric(plant_id, column, state, timestamp, values[column])
+            self._dirty.add(key)
+
+        self.detected += len(anomalies)
+        return anomalies
+
+    def _update_metric(
+        self,
+        plant_id: int,
+        metric: str,
+        state: MetricState,
+        timestamp: datetime,
+        value: float,
+    ) -> list[Anomaly]:
+        """Update the state of a plant's metric with a reading."""
+        low, high = sensor_range(metric)
+        span = high - low
+        step = metric in ANOMALY_STEP_METRICS
+        warm = state.count >= ANOMALY_WARMUP_READINGS
+        anomaly = None
+
+        std = max(math.sqrt(state.variance), ANOMALY_MIN_STD * span)
+        score = (value - state.mean) / std
+
+        # Dropout: the reading is not folded into the statistics
+        at_bound = value in (low, high) and not step
+        if at_bound and warm and abs(score) > ANOMALY_Z_THRESHOLD:
+            if not state.dropout:
+                state.dropout = True
+                anomaly = Anomaly(plant_id, metric, "DROPOUT", value, state.mean, score, timestamp)
+            return [anomaly] if anomaly else []
+        state.dropout = False
+
+        # Stuck sensor
+        state.repeats = state.repeats + 1 if value == state.last_value else 0
+        if state.repeats + 1 >= ANOMALY_STUCK_READINGS and not (step and value == low):
+            if not state.stuck:
+                state.stuck = True
+                anomaly = Anomaly(plant_id, metric, "STUCK", value, state.mean, None, timestamp)
+        else:
+            state.stuck = False
+
+        # Spike: sudden change (value and rate of change both out of their usual band)
+        minutes = max((timestamp - state.last_timestamp).total_seconds(), 1.0) / 60
+        rate = (value - state.last_value) / minutes
+        rate_std = max(math.sqrt(state.rate_variance), ANOMALY_MIN_STD * span)
+        if (
+            warm and not step and anomaly is None
+            and abs(score) > ANOMALY_Z_THRESHOLD
+            and abs(rate - state.rate_mean) / rate_std > ANOMALY_Z_THRESHOLD
+            and (state.last_spike is None or timestamp - state.last_spike >= timedelta(seconds=ANOMALY_SPIKE_COOLDOWN))
+        ):
+            state.last_spike = timestamp
+            anomaly = Anomaly(plant_id, metric, "SPIKE", value, state.mean, score, timestamp)
+
+        state.mean, state.variance = _ewma(state.mean, state.variance, value)
+        state.rate_mean, state.rate_variance = _ewma(state.rate_mean, state.rate_variance, rate)
+        state.count += 1
+        state.last_value = value
+        state.last_timestamp = timestamp
+        return [anomaly] if anomaly else []
+
+    def forget(self, plant_id: int) -> None:
+        """Drop the states of a plant (deleted plant)."""
+        for key in [key for key in self._states if key[0] == plant_id]:
+            del self._states[key]
+            self._dirty.discard(key)
+
+    def load(self, session: Session) -> int:
+        """
+        Load the checkpointed states (states updated since are kept).
+
+        Returns:
+            int: Number of states loaded.
+        """
+        loaded = 0
+        for row in session.execute(select(PlantAnomalyState)).scalars():
+            key = (row.plant_id, row.metric)
+            if key not in self._states:
+                self._states[key] = MetricState(**{field: getattr(row, field) for field in STATE_FIELDS})
+                loaded += 1
+        return loaded
+
+    def take_dirty(self) -> list[dict]:
+        """Get the states updated since the last call, as PlantAnomalyState rows."""
+        rows = []
+        for plant_id, metric in self._dirty:
+            state = self._states[plant_id, metric]
+            rows.append({"plant_id": plant_id, "metric": metric, **{field: getattr(state, field) for field in STATE_FIELDS}})
+        self._dirty.clear()
+        return rows
+
+    def mark_dirty(self, rows: list[dict]) -> None:
+        """Mark states as updated again (failed checkpoint)."""
+        self._dirty.update((row["plant_id"], row["metric"]) for row in rows if (row["plant_id"], row["metric"]) in self._states)
+
+
+def save_states(session: Session, rows: list[dict]) -> None:
+    """Upsert checkpointed anomaly states (not committed)."""
+    if not rows:
+        return
+    stmt = insert(PlantAnomalyState).values(rows)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["plant_id", "metric"],
+        set_={field: getattr(stmt.excluded, field) for field in STATE_FIELDS},
+    ))
+
+
+# Global anomaly detector instance
+anomaly_detector = AnomalyDetector()
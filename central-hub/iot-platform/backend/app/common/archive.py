@@ -0,0 +1,264 @@
+"""Cold-tier archive of old raw metrics: one Parquet file per plant per month (requires pyarrow)."""
+
+import os
+import re
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+from app.common.constants import METRICS_ARCHIVE_DIR, METRICS_ARCHIVE_ROW_GROUP_ROWS
+from app.common.partitions import next_period
+from app.models.metrics import VALUE_SCALE
+
+_EPOCH = datetime.fromtimestamp(0, tz=timezone.utc)
+_FILE_PATTERN = re.compile(r"^(\d{4})-(\d{2})\.parquet$")
+
+# Stored columns, as in the metrics table (fixed-point values)
+ARCHIVE_COLUMNS = ("id", "timestamp", "light_lux", "soil_moist_centi", "humidity_centi", "temp_centi")
+
+
+@dataclass
+class ArchivedMonth:
+    """Archive file of a plant's metrics over the month [start, end)."""
+
+    plant_id: int
+    start: datetime
+    path: Path
+
+    @property
+    def end(self) -> datetime:
+        return next_period(self.start, "month")
+
+    def overlaps(self, from_time: datetime | None, to_time: datetime | None) -> bool:
+        """Check if the month overlaps the window [from_time, to_time] (None: unbounded)."""
+        return (from_time is None or from_time < self.end) and (to_time is None or self.start <= to_time)
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("light_lux", pa.int32()),
+        ("soil_moist_centi", pa.int16()),
+        ("humidity_centi", pa.int16()),
+        ("temp_centi", pa.int16()),
+    ])
+
+
+def plant_archive_dir(plant_id: int) -> Path:
+    """Get the archive directory of a plant."""
+    return Path(METRICS_ARCHIVE_DIR) / f"plant-{plant_id}"
+
+
+def archived_months(plant_id: int) -> list[ArchivedMonth]:
+    """Get the archive files of a plant, oldest first."""
+    directory = plant_archive_dir(plant_id)
+    if not directory.is_dir():
+        return []
+
+    months = []
+    for path in directory.iterdir():
+        if match := _FILE_PATTERN.match(path.name):
+            start = datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+            months.append(ArchivedMonth(plant_id=plant_id, start=start, path=path))
+    return sorted(months, key=lambda month: month.start)
+
+
+def write_month(plant_id: int, start: datetime, rows: Sequence[tuple]) -> int:
+    """
+    Add rows (ARCHIVE_COLUMNS) to the archive file of a plant's month.
+
+    The rows are merged with the ones already archived (rows archived twice,
+    e.g. after an interrupted run, are kept once), sorted by timestamp and id,
+    and the file is replaced atomically.
+
+    Returns:
+        int: Number of rows in the archive file.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = _schema()
+    path = plant_archive_dir(plant_id) / f"{start:%Y-%m}.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)],
+        schema=schema,
+    )
+    if path.exists():
+        table = pa.concat_tables([pq.read_table(path), table])
+        # Keep the first occurrence of each id
+        _, first = np.unique(table.column("id").to_numpy(), return_index=True)
+        table = table.take(pa.array(first))
+    table = table.take(pc.sort_indices(table, [("timestamp", "ascending"), ("id", "ascending")]))
+
+    temporary = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, temporary, compression="zstd", row_group_size=METRICS_ARCHIVE_ROW_GROUP_ROWS)
+    os.replace(temporary, path)
+    return table.num_rows
+
+
+def _overlapping_months(plant_id: int, from_time: datetime | None, to_time: datetime | None) -> list[ArchivedMonth]:
+    """Get the archive files of a plant overlapping a window (pyarrow is only imported if there are any)."""
+    return [month for month in archived_months(plant_id) if month.overlaps(from_time, to_time)]
+
+
+def _read_row_groups(
+    months: list[ArchivedMonth],
+    from_time: datetime | None,
+    to_time: datetime | None,
+    columns: list[str] | None = None,
+) -> Iterator:
+    """
+    Read the archive files one row group at a time, keeping the rows in the window [from_time, to_time].
+
+    Row groups outside of the window (according to their timestamp statistics) are skipped.
+
+    Yields:
+        pyarrow.Table: Rows of a row group, ordered by timestamp and id.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    condition = None
+    if from_time is not None:
+        condition = pc.field("timestamp") >= from_time
+    if to_time is not None:
+        upper = pc.field("timestamp") <= to_time
+        condition = upper if condition is None else condition & upper
+
+    for month in months:
+        file = pq.ParquetFile(month.path)
+        timestamp_index = file.schema_arrow.get_field_index("timestamp")
+        for index in range(file.num_row_groups):
+            statistics = file.metadata.row_group(index).column(timestamp_index).statistics
+            if statistics is not None and statistics.has_min_max and not (
+                (from_time is None or from_time <= statistics.max) and (to_time is None or statistics.min <= to_time)
+            ):
+                continue
+            table = file.read_row_group(index, columns=columns)
+            yield table if condition is None else table.filter(condition)
+
+
+def read_archive(
+    plant_id: int,
+    from_time: datetime | None = None,
+    to_time: datetime | None = None,
+) -> Iterator[tuple]:
+    """
+    Read the archived metrics of a plant over a window, one row group at a time.
+
+    Yields:
+        tuple: (timestamp, id, soil_moist, humidity, light, temp), ordered by timestamp and id.
+    """
+    months = _overlapping_months(plant_id, from_time, to_time)
+    if not months:
+        return
+
+    import pyarrow as pa
+
+    for table in _read_row_groups(months, from_time, to_time):
+        timestamps = (_EPOCH + timedelta(microseconds=us) for us in table.column("timestamp").cast(pa.int64()).to_pylist())
+        yield from zip(
+            timestamps,
+            table.column("id").to_pylist(),
+            (table.column("soil_moist_centi").to_numpy() / VALUE_SCALE).tolist(),
+            (table.column("humidity_centi").to_numpy() / VALUE_SCALE).tolist(),
+            table.column("light_lux").to_numpy().astype(float).tolist(),
+            (table.column("temp_centi").to_numpy() / VALUE_SCALE).tolist(),
+        )
+
+
+def count_archive(plant_id: int, from_time: datetime | None = None, to_time: datetime | None = None) -> int:
+    """Count the archived metrics of a plant over a window."""
+    months = _overlapping_months(plant_id, from_time, to_time)
+    if not months:
+        return 0
+
+    import pyarrow.parquet as pq
+
+    # Months entirely in the window are counted from their metadata
+    inside = [
+        month for month in months
+        if (from_time is None or from_time <= month.start) and (to_time is None or month.end <= to_time)
+    ]
+    count = sum(pq.ParquetFile(month.path).metadata.num_rows for month in inside)
+    partial = [month for month in months if month not in inside]
+    return count + sum(table.num_rows for table in _read_row_groups(partial, from_time, to_time, ["timestamp"]))
+
+
+def archive_buckets(
+    plant_id: int,
+    from_time: datetime,
+    to_time: datetime,
+    interval: int,
+) -> dict[int, tuple[int, np.ndarray]]:
+    """
+    Aggregate the archived metrics of a plant over a window into fixed buckets.
+
+    Returns:
+        dict: Bucket start (epoch seconds) -> (count, sums of soil_moist, temp, light, humidity).
+    """
+    buckets: dict[int, tuple[int, np.ndarray]] = {}
+    months = _overlapping_months(plant_id, from_time, to_time)
+    if not months:
+        return buckets
+
+    import pyarrow as pa
+
+    for table in _read_row_groups(months, from_time, to_time):
+        if table.num_rows == 0:
+            continue
+
+        epochs = table.column("timestamp").cast(pa.int64()).to_numpy() // 1_000_000
+        keys, inverse, counts = np.unique(epochs // interval * interval, return_inverse=True, return_counts=True)
+        values = np.column_stack([
+            table.column("soil_moist_centi").to_numpy() / VALUE_SCALE,
+            table.column("temp_centi").to_numpy() / VALUE_SCALE,
+            table.column("light_lux").to_numpy().astype(float),
+            table.column("humidity_centi").to_numpy() / VALUE_SCALE,
+        ])
+        sums = np.column_stack([np.bincount(inverse, weights=column, minlength=len(keys)) for column in values.T])
+        for key, count, bucket_sums in zip(keys.tolist(), counts.tolist(), sums):
+            previous_count, previous_sums = buckets.get(key, (0, 0.0))
+            buckets[key] = (previous_count + count, previous_sums + bucket_sums)
+    return buckets
+
+
+def delete_archive(plant_id: int, before: datetime | None = None) -> int:
+    """
+    Delete the archive files of a plant whose month ends before a date (default: all of them).
+
+    Returns:
+        int: Number of deleted rows.
+    """
+    months = [month for month in archived_months(plant_id) if before is None or month.end <= before]
+    deleted = 0
+    if months:
+        import pyarrow.parquet as pq
+
+        for month in months:
+            deleted += pq.ParquetFile(month.path).metadata.num_rows
+            month.path.unlink()
+
+    directory = plant_archive_dir(plant_id)
+    if before is None and directory.is_dir():
+        for leftover in directory.iterdir():
+            leftover.unlink()
+        directory.rmdir()
+    return deleted
+
+
+def archived_plant_ids() -> list[int]:
+    """Get the IDs of the plants having an archive directory."""
+    root = Path(METRICS_ARCHIVE_DIR)
+    if not root.is_dir():
+        return []
+    return sorted(int(path.name.removeprefix("plant-")) for path in root.glob("plant-*") if path.is_dir())
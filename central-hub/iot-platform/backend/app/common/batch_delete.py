@@ -0,0 +1,30 @@
+"""Batched deletion of raw metrics (retention, archive, deleted plants purge)."""
+
+from sqlalchemy import ColumnElement, delete, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.metrics import Metrics
+
+
+def delete_metrics_batch(session: Session, plant_id: int, size: int, *conditions: ColumnElement[bool]) -> int:
+    """
+    Delete the `size` oldest metrics of a plant matching the conditions (not committed).
+
+    The batch is bounded by the (timestamp, id) key of its last row, so that the
+    delete is a single range scan of the (plant_id, timestamp) index, whatever
+    the statistics of the table (e.g. right after a bulk load).
+
+    Returns:
+        int: Number of deleted rows (less than `size` once all are deleted).
+    """
+    window = (Metrics.plant_id == plant_id, *conditions)
+    last = session.execute(
+        select(Metrics.timestamp, Metrics.id)
+        .where(*window)
+        .order_by(Metrics.timestamp, Metrics.id)
+        .offset(size - 1)
+        .limit(1)
+    ).first()
+    if last is not None:
+        window += (Metrics.timestamp <= last.timestamp, tuple_(Metrics.timestamp, Metrics.id) <= tuple_(*last))
+    return session.execute(delete(Metrics).where(*window)).rowcount
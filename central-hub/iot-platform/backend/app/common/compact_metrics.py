@@ -0,0 +1,186 @@
+"""Migration of the metrics table to the compact storage schema (see app.models.metrics)."""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import MetaData, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.common.constants import METRICS_PARTITIONS_AHEAD
+from app.common.partitions import (
+    ensure_partitions,
+    is_partitioned,
+    next_period,
+    partition_granularity,
+    period_start,
+)
+from app.models.metrics import VALUE_SCALE, compact_table
+from app.models.plant import Plant
+
+logger = logging.getLogger(__name__)
+
+FORMER_TABLE = "metrics_former"  # Table in the former schema, kept until dropped explicitly
+MIGRATED_MARK = "migrated to metrics"  # Comment of the former table once all its rows are copied
+
+# Rows are copied per plant and per window, each window in its own transaction
+COPY_WINDOW = timedelta(days=30)
+
+
+def has_former_schema(session: Session) -> bool:
+    """Check if the metrics table still uses the former schema (float value columns)."""
+    return session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_attribute "
+        "WHERE attrelid = to_regclass('metrics') AND attname = 'soil_moist' AND NOT attisdropped)"
+    )).scalar_one()
+
+
+def has_former_table(session: Session) -> bool:
+    """Check if a migration has been started (the former table has been renamed)."""
+    return session.execute(text(f"SELECT to_regclass('{FORMER_TABLE}') IS NOT NULL")).scalar_one()
+
+
+def is_migrated(session: Session) -> bool:
+    """Check if all the rows of the former table have been copied."""
+    return session.execute(
+        text(f"SELECT obj_description(to_regclass('{FORMER_TABLE}'), 'pg_class') = :mark"),
+        {"mark": MIGRATED_MARK},
+    ).scalar_one() is True
+
+
+def stored_schema(session: Session) -> str:
+    """
+    Get the schema of the metrics table.
+
+    Returns:
+        str: "float", "compact", or "copying" while a migration is incomplete.
+    """
+    if has_former_schema(session):
+        return "float"
+    if has_former_table(session) and not is_migrated(session):
+        return "copying"
+    return "compact"
+
+
+def _rename_former_table(session: Session) -> bool:
+    """
+    Rename the metrics table, its partitions, indexes and sequence out of the way (not committed).
+
+    Returns:
+        bool: Whether the table was partitioned.
+    """
+    partitioned = is_partitioned(session)
+    relations = session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('metrics')"
+    )).scalars().all()
+
+    for relation in ["metrics", *relations]:
+        indexes = session.execute(text(
+            f"SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            f"WHERE i.indrelid = to_regclass('{relation}')"
+        )).scalars().all()
+        for index in indexes:
+            session.execute(text(f"ALTER INDEX {index} RENAME TO {index}_former"))
+        target = FORMER_TABLE if relation == "metrics" else f"{relation}_former"
+        session.execute(text(f"ALTER TABLE {relation} RENAME TO {target}"))
+
+    session.execute(text("ALTER SEQUENCE IF EXISTS metrics_id_seq RENAME TO metrics_former_id_seq"))
+    return partitioned
+
+
+def _create_table(session: Session, partitioned: bool) -> None:
+    """Create the metrics table in the compact schema, partitioned like the former one (not committed)."""
+    metadata = MetaData()
+    Plant.__table__.to_metadata(metadata)
+    compact_table(metadata, partitioned).create(session.connection(), checkfirst=False)
+
+
+def _plant_bounds(session: Session) -> list[tuple[int, datetime, datetime]]:
+    """Get the (plant ID, oldest, newest timestamp) of the plants having former metrics."""
+    return session.execute(text(
+        f"SELECT p.id, b.oldest, b.newest FROM plants p "
+        f"CROSS JOIN LATERAL (SELECT min(timestamp) AS oldest, max(timestamp) AS newest "
+        f"FROM {FORMER_TABLE} WHERE plant_id = p.id) b WHERE b.oldest IS NOT NULL ORDER BY p.id"
+    )).tuples().all()
+
+
+def _copy_window(session: Session, plant_id: int, start: datetime, end: datetime) -> int:
+    """Copy the former metrics of a plant in [start, end) into the compact table (not committed)."""
+    return session.execute(text(
+        f"INSERT INTO metrics (id, timestamp, plant_id, light_lux, soil_moist_centi, humidity_centi, temp_centi) "
+        f"SELECT id, timestamp, plant_id, round(light), round(soil_moist * {VALUE_SCALE}), "
+        f"round(humidity * {VALUE_SCALE}), round(temp * {VALUE_SCALE}) FROM {FORMER_TABLE} "
+        f"WHERE plant_id = :plant_id AND timestamp >= :start AND timestamp < :end ORDER BY timestamp, id"
+    ), {"plant_id": plant_id, "start": start, "end": end}).rowcount
+
+
+def migrate_to_compact(session_factory: sessionmaker, drop_former: bool = False) -> int:
+    """
+    Migrate the metrics table from the former schema to the compact one (backend stopped).
+
+    The former table is renamed, then its rows are copied plant by plant in time
+    order (so they are stored clustered by plant and timestamp). It is kept,
+    marked as migrated, until dropped with `drop_former`. An interrupted
+    migration restarts its copy when run again.
+
+    Returns:
+        int: Number of copied metrics.
+    """
+    copied = 0
+    session = session_factory()
+    try:
+        if has_former_schema(session):
+            if has_former_table(session):
+                raise RuntimeError(f"The metrics table uses the former schema, but {FORMER_TABLE} already exists")
+            partitioned = _rename_former_table(session)
+            _create_table(session, partitioned)
+            session.commit()
+        elif not has_former_table(session):
+            logger.info("The metrics table already uses the compact schema")
+            return copied
+
+        if not is_migrated(session):
+            copied = _copy_former_table(session)
+
+        if drop_former:
+            session.execute(text(f"DROP TABLE {FORMER_TABLE} CASCADE"))
+            session.commit()
+            logger.info(f"Dropped the former metrics table ({FORMER_TABLE})")
+        return copied
+    finally:
+        session.close()
+
+
+def _copy_former_table(session: Session) -> int:
+    """Copy all the rows of the former table into the (emptied) compact one, and mark it as migrated."""
+    # Restart from an empty table if the copy was interrupted
+    session.execute(text("TRUNCATE metrics"))
+    bounds = _plant_bounds(session)
+    if is_partitioned(session) and bounds:
+        now = datetime.now(timezone.utc)
+        granularity = partition_granularity()
+        oldest = period_start(min(oldest for _, oldest, _ in bounds), granularity)
+        # Partitions from the oldest period to the upcoming ones
+        periods, start = 0, next_period(oldest, granularity)
+        while start <= now:
+            periods, start = periods + 1, next_period(start, granularity)
+        ensure_partitions(session, granularity, oldest, periods + METRICS_PARTITIONS_AHEAD)
+    session.commit()
+
+    copied = 0
+    for plant_id, oldest, newest in bounds:
+        start = oldest
+        while start <= newest:
+            copied += _copy_window(session, plant_id, start, start + COPY_WINDOW)
+            session.commit()
+            start += COPY_WINDOW
+        logger.info(f"Migrated the metrics of plant #{plant_id} to the compact schema ({copied} so far)")
+
+    session.execute(text(
+        "SELECT setval('metrics_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM metrics), false)"
+    ))
+    session.execute(text(f"COMMENT ON TABLE {FORMER_TABLE} IS '{MIGRATED_MARK}'"))
+    session.commit()
+    session.execute(text("ANALYZE metrics"))
+    session.commit()
+    logger.info(f"Migrated {copied} metrics to the compact schema")
+    return copied
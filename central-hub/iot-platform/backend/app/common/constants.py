@@ -1,9 +1,12 @@
 """Application constants."""
 
+import os
+
 # Module heartbeat configuration
 MODULE_HB_INTERVAL = 30
 MODULE_HB_TIMEOUT = 3 * MODULE_HB_INTERVAL
 MODULE_HB_CHECK_INTERVAL = MODULE_HB_INTERVAL
+MODULE_HB_BATCH_SIZE = 50  # Modules per connectivity event of a heartbeat sweep (event bus payloads are limited to 8 kB)
 
 # Sensor ranges
 SENSOR_THRESHOLDS = {
@@ -11,4 +14,103 @@ SENSOR_THRESHOLDS = {
     "HUMIDITY": {"MIN": 0.0, "MAX": 100.0},
     "LIGHT": {"MIN": 0.0, "MAX": 65000.0},
     "TEMP": {"MIN": -10.0, "MAX": 50.0},
-}
\ No newline at end of file
+}
+
+# WebSocket fan-out (per-client send queues)
+WS_SEND_QUEUE_SIZE = 256  # Messages waiting for a client, beyond which the slow consumer policy applies
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")  # "drop_oldest", "conflate" or "disconnect"
+WS_MAX_LAG = 10  # Seconds the oldest queued message may wait before a client is disconnected ("disconnect" policy)
+WS_SEND_TIMEOUT = 10  # Seconds a single send may take before a client is deemed stalled and disconnected
+WS_METRICS_WINDOW = float(os.getenv("WS_METRICS_WINDOW", "0"))  # Default PLANT_METRICS conflation window of the clients (seconds, 0: none)
+WS_METRICS_WINDOW_MAX = 60  # Longest conflation window a client may ask for (seconds)
+WS_REPLAY_SIZE = 1024  # Latest events kept to resume the connections of reconnecting clients
+
+# Event bus between the backend processes
+EVENT_BUS = os.getenv("EVENT_BUS", "postgres")  # "postgres" (LISTEN/NOTIFY, several workers) or "memory" (single worker)
+EVENT_BUS_CHANNEL = "iot_events"
+EVENT_BUS_RECONNECT_INTERVAL = 5  # Seconds between the reconnection attempts of the listener
+
+# Leader election of the background tasks
+LEADER_LOCK_TIMEOUT = 5  # Seconds a check of the leader lock may take (connection, query)
+
+# Metrics rollups (pre-aggregated buckets)
+ROLLUP_INTERVAL = 1800
+SPARKLINE_RANGE = 24 * 3600  # 48 rollup buckets
+
+# Daily statistics
+STATS_HISTOGRAM_BINS = 200  # Bins over each sensor range, for the percentiles
+STATS_MAX_HOLD = MODULE_HB_TIMEOUT  # Seconds a reading is held for at most (longer gaps are not counted)
+STATS_REBUILD_CHUNK_ROWS = 10_000
+STATS_DEFAULT_DAYS = 7
+STATS_MAX_DAYS = 366
+STATS_DEFAULT_PERCENTILES = (10.0, 50.0, 90.0)
+
+# Trend forecast (lines fitted on the latest rollup buckets)
+FORECAST_WINDOW = 12 * 3600  # Seconds of rollup buckets fitted
+FORECAST_MIN_POINTS = 4  # Buckets needed for a trend (2 hours)
+FORECAST_BREAK = 0.05  # Change between two buckets starting a new trend (e.g. watering), in sensor range
+FORECAST_HORIZON = 7 * 24 * 3600  # Seconds ahead within which threshold crossings are forecast
+FORECAST_STABLE_SLOPE = 0.001  # Slope under which a trend is stable, in sensor range per hour
+FORECAST_WORKERS = 1  # Fitting processes (all the requested plants are fitted in one batch)
+
+# Anomaly detection (rolling statistics per plant and metric)
+ANOMALY_EWMA_ALPHA = 0.05  # Weight of a new reading in the moving mean and variance (~20 readings)
+ANOMALY_WARMUP_READINGS = 30  # Readings before spikes and dropouts are detected
+ANOMALY_Z_THRESHOLD = 4.0  # Deviations (in moving standard deviations) reported as spikes
+ANOMALY_MIN_STD = 0.01  # Floor of the standard deviations, in sensor range (per minute for the rate of change)
+ANOMALY_STUCK_READINGS = int(os.getenv("ANOMALY_STUCK_READINGS", 240))  # Identical readings for a stuck sensor (2 hours)
+ANOMALY_SPIKE_COOLDOWN = 600  # Seconds between two spike events of a plant's metric
+ANOMALY_STEP_METRICS = ("light",)  # Metrics which legitimately step (lights on/off): only checked for stuck sensors
+ANOMALY_CHECKPOINT_INTERVAL = 60
+
+# History
+HISTORY_GAP_THRESHOLD = 45  # Gap (seconds) above which null slots are inserted (1.5x the normal interval)
+HISTORY_CACHE_MAX_POINTS = 100_000
+
+# History downsampling (arbitrary windows)
+HISTORY_DEFAULT_MAX_POINTS = 1000
+HISTORY_MAX_POINTS = 10000
+HISTORY_LTTB_MAX_ROWS = 200_000  # Above this, raw rows are rolled up in SQL before downsampling
+HISTORY_ROLLUP_OVERSAMPLING = 4  # Rollup buckets per returned point
+
+# Response compression (gzip, for the clients accepting it)
+RESPONSE_GZIP_MIN_SIZE = int(os.getenv("RESPONSE_GZIP_MIN_SIZE", 1024))  # Smallest compressed body in bytes, 0 disables
+RESPONSE_GZIP_LEVEL = 6  # Fast enough for the history payloads, close to the best ratio on JSON
+
+# Metrics export
+EXPORT_CHUNK_ROWS = 5000  # Rows fetched from the server-side cursor (and written) per chunk
+
+# Raw metrics pagination
+METRICS_PAGE_DEFAULT_SIZE = 1000
+METRICS_PAGE_MAX_SIZE = 10000
+
+# Metrics retention (0 keeps the data forever)
+METRICS_RAW_RETENTION_DAYS = int(os.getenv("METRICS_RAW_RETENTION_DAYS", 0))  # At least 35 for the month history range
+METRICS_ROLLUP_RETENTION_DAYS = int(os.getenv("METRICS_ROLLUP_RETENTION_DAYS", 0))
+METRICS_RETENTION_CHECK_INTERVAL = 3600
+METRICS_RETENTION_WINDOW = 24 * 3600  # Raw data rolled up then purged per step
+METRICS_RETENTION_BATCH_SIZE = 5000  # Rows deleted per transaction
+METRICS_RETENTION_BATCH_PAUSE = 0.5  # Seconds between two deletes
+
+# Metrics cold-tier archive (0 keeps all the raw metrics in the database)
+METRICS_ARCHIVE_AFTER_DAYS = int(os.getenv("METRICS_ARCHIVE_AFTER_DAYS", 0))  # Whole months older than this are archived
+METRICS_ARCHIVE_MIN_DAYS = 31  # The history presets (up to 30 days) only read the database
+METRICS_ARCHIVE_DIR = os.getenv("METRICS_ARCHIVE_DIR", "archive")
+METRICS_ARCHIVE_CHECK_INTERVAL = 6 * 3600
+METRICS_ARCHIVE_ROW_GROUP_ROWS = 16384  # Rows per Parquet row group (unit skipped by the time filters)
+METRICS_ARCHIVE_BATCH_SIZE = 5000  # Archived rows deleted from the database per transaction
+METRICS_ARCHIVE_BATCH_PAUSE = 0.1  # Seconds between two deletes
+METRICS_ARCHIVE_RETENTION_DAYS = int(os.getenv("METRICS_ARCHIVE_RETENTION_DAYS", 0))  # 0 keeps the archive forever
+
+# Metrics partitioning ("month" or "week", empty for a single table)
+METRICS_PARTITIONING = os.getenv("METRICS_PARTITIONING", "")
+METRICS_PARTITIONS_AHEAD = 3  # Future partitions created ahead of time
+METRICS_PARTITIONS_CHECK_INTERVAL = 12 * 3600
+
+# Metrics table schema ("float" or "compact", see scripts/migrate_metrics_compact.py)
+METRICS_STORAGE = os.getenv("METRICS_STORAGE", "float")
+
+# Deleted plants purge
+PLANT_PURGE_CHECK_INTERVAL = 60
+PLANT_PURGE_BATCH_SIZE = 5000  # Rows deleted per transaction
+PLANT_PURGE_BATCH_PAUSE = 0.1  # Seconds between two deletes
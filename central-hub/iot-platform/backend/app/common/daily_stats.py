@@ -0,0 +1,209 @@
+"""Per-plant daily statistics maintenance (streaming accumulators per UTC day and metric)."""
+
+import heapq
+from collections.abc import Sequence
+from datetime import date, datetime, timezone
+from itertools import groupby
+
+import numpy as np
+from sqlalchemy import delete, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.common.archive import read_archive
+from app.common.constants import SENSOR_THRESHOLDS, STATS_HISTOGRAM_BINS, STATS_MAX_HOLD, STATS_REBUILD_CHUNK_ROWS
+from app.common.rollups import METRIC_COLUMNS
+from app.models.metrics import Metrics
+from app.models.plant import Plant
+from app.models.plant_daily_stats import PlantDailyStats
+
+# Elementwise sum of the stored and inserted histograms
+_HISTOGRAM_SUM = literal_column(
+    "ARRAY(SELECT u.a + u.b FROM unnest(plant_daily_stats.histogram, excluded.histogram) "
+    "WITH ORDINALITY AS u(a, b, i) ORDER BY u.i)"
+)
+
+
+def sensor_range(metric: str) -> tuple[float, float]:
+    """Get the (min, max) sensor range of a metric, which the histogram bins cover."""
+    sensor = SENSOR_THRESHOLDS[metric.upper()]
+    return sensor["MIN"], sensor["MAX"]
+
+
+def histogram_bins(metric: str, values: np.ndarray) -> np.ndarray:
+    """Get the histogram bins of values of a metric (out of range values go to the first or last bin)."""
+    low, high = sensor_range(metric)
+    bins = np.floor((np.asarray(values, dtype=float) - low) / (high - low) * STATS_HISTOGRAM_BINS)
+    return np.clip(bins, 0, STATS_HISTOGRAM_BINS - 1).astype(int)
+
+
+def plant_thresholds(plant: Plant) -> dict[str, tuple[float, float]]:
+    """Get the (min, max) thresholds of a plant for each metric."""
+    return {column: (getattr(plant, f"min_{column}"), getattr(plant, f"max_{column}")) for column in METRIC_COLUMNS}
+
+
+def _empty_row(plant_id: int, day: date, metric: str) -> dict:
+    return {
+        "plant_id": plant_id,
+        "day": day,
+        "metric": metric,
+        "count": 0,
+        "sum": 0.0,
+        "sum_sq": 0.0,
+        "min": None,
+        "max": None,
+        "histogram": [0] * STATS_HISTOGRAM_BINS,
+        "seconds_covered": 0.0,
+        "seconds_below": 0.0,
+        "seconds_above": 0.0,
+    }
+
+
+def record_reading(
+    session: Session,
+    plant: Plant,
+    timestamp: datetime,
+    values: dict[str, float],
+    previous: tuple[datetime, dict[str, float]] | None,
+) -> None:
+    """
+    Fold a reading into the daily statistics of its plant (not committed).
+
+    The time spent out of the thresholds is counted per reading: the previous
+    reading (timestamp and values) is held until this one, at most
+    STATS_MAX_HOLD seconds (longer gaps are not counted), on the day of the
+    previous reading, against the thresholds of the plant at ingestion.
+    """
+    rows = {}
+    for column in METRIC_COLUMNS:
+        value = values[column]
+        row = rows[timestamp.date(), column] = _empty_row(plant.id, timestamp.date(), column)
+        row.update(count=1, sum=value, sum_sq=value * value, min=value, max=value)
+        row["histogram"][int(histogram_bins(column, [value])[0])] = 1
+
+    if previous is not None and previous[0] < timestamp:
+        held = min((timestamp - previous[0]).total_seconds(), STATS_MAX_HOLD)
+        day = previous[0].astimezone(timezone.utc).date()
+        for column, (low, high) in plant_thresholds(plant).items():
+            row = rows.setdefault((day, column), _empty_row(plant.id, day, column))
+            row["seconds_covered"] += held
+            if previous[1][column] < low:
+                row["seconds_below"] += held
+            elif previous[1][column] > high:
+                row["seconds_above"] += held
+
+    stmt = insert(PlantDailyStats).values(list(rows.values()))
+    excluded = stmt.excluded
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["plant_id", "day", "metric"],
+        set_={
+            "count": PlantDailyStats.count + excluded.count,
+            "sum": PlantDailyStats.sum + excluded.sum,
+            "sum_sq": PlantDailyStats.sum_sq + excluded.sum_sq,
+            # least() and greatest() ignore nulls
+            "min": func.least(PlantDailyStats.min, excluded.min),
+            "max": func.greatest(PlantDailyStats.max, excluded.max),
+            "histogram": _HISTOGRAM_SUM,
+            "seconds_covered": PlantDailyStats.seconds_covered + excluded.seconds_covered,
+            "seconds_below": PlantDailyStats.seconds_below + excluded.seconds_below,
+            "seconds_above": PlantDailyStats.seconds_above + excluded.seconds_above,
+        },
+    ))
+
+
+def _day_rows(
+    plant_id: int,
+    day: date,
+    readings: list[Sequence],
+    next_timestamp: datetime | None,
+    thresholds: dict[str, tuple[float, float]],
+) -> list[dict]:
+    """Compute the statistics rows of a plant's day from its readings, as record_reading accumulates them."""
+    epochs = np.array([reading[0].timestamp() for reading in readings])
+    values = np.array([reading[2:] for reading in readings], dtype=float)
+    # Each reading is held until the next one (the last one is only counted once the next one comes in)
+    following = np.append(epochs[1:], next_timestamp.timestamp() if next_timestamp is not None else epochs[-1])
+    held = np.minimum(following - epochs, STATS_MAX_HOLD)
+
+    rows = []
+    for index, column in enumerate(METRIC_COLUMNS):
+        column_values = values[:, index]
+        low, high = thresholds[column]
+        row = _empty_row(plant_id, day, column)
+        row.update(
+            count=len(column_values),
+            sum=float(column_values.sum()),
+            sum_sq=float(np.square(column_values).sum()),
+            min=float(column_values.min()),
+            max=float(column_values.max()),
+            histogram=np.bincount(histogram_bins(column, column_values), minlength=STATS_HISTOGRAM_BINS).tolist(),
+            seconds_covered=float(held.sum()),
+            seconds_below=float(held[column_values < low].sum()),
+            seconds_above=float(held[column_values > high].sum()),
+        )
+        rows.append(row)
+    return rows
+
+
+def rebuild_daily_stats(session: Session, plant: Plant) -> int:
+    """
+    Recompute all the daily statistics of a plant from its raw and archived metrics (not committed).
+
+    The time out of the thresholds is computed against the current thresholds.
+
+    Returns:
+        int: Number of statistics rows written.
+    """
+    session.execute(delete(PlantDailyStats).where(PlantDailyStats.plant_id == plant.id))
+
+    hot = session.execute(
+        select(Metrics.timestamp, Metrics.id, *(getattr(Metrics, column) for column in METRIC_COLUMNS))
+        .where(Metrics.plant_id == plant.id)
+        .order_by(Metrics.timestamp, Metrics.id)
+        .execution_options(yield_per=STATS_REBUILD_CHUNK_ROWS)
+    )
+    readings = heapq.merge(read_archive(plant.id), hot, key=lambda row: row[:2])
+    thresholds = plant_thresholds(plant)
+
+    # A day is written once the first reading of the next one is known
+    written, pending = 0, None
+    for day, group in groupby(readings, key=lambda row: row[0].astimezone(timezone.utc).date()):
+        day_readings = list(group)
+        if pending is not None:
+            rows = _day_rows(plant.id, *pending, day_readings[0][0], thresholds)
+            session.execute(insert(PlantDailyStats).values(rows))
+            written += len(rows)
+        pending = (day, day_readings)
+    if pending is not None:
+        rows = _day_rows(plant.id, *pending, None, thresholds)
+        session.execute(insert(PlantDailyStats).values(rows))
+        written += len(rows)
+    return written
+
+
+def histogram_percentiles(
+    metric: str,
+    histogram: Sequence[int],
+    minimum: float,
+    maximum: float,
+    percentiles: Sequence[float],
+) -> list[float]:
+    """
+    Estimate percentiles from a histogram, interpolating linearly within the bins.
+
+    The estimates are exact to a bin width (1/STATS_HISTOGRAM_BINS of the sensor
+    range) and clamped to the actual minimum and maximum.
+    """
+    low, high = sensor_range(metric)
+    width = (high - low) / STATS_HISTOGRAM_BINS
+    counts = np.asarray(histogram, dtype=float)
+    cumulative = np.cumsum(counts)
+
+    estimates = []
+    for percentile in percentiles:
+        rank = percentile / 100 * cumulative[-1]
+        index = min(int(np.searchsorted(cumulative, rank)), len(counts) - 1)
+        before = cumulative[index - 1] if index > 0 else 0.0
+        fraction = (rank - before) / counts[index] if counts[index] else 0.0
+        estimates.append(float(min(max(low + (index + fraction) * width, minimum), maximum)))
+    return estimates
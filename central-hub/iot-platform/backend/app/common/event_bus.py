@@ -0,0 +1,271 @@
+"""Event bus between the backend processes (workers): in-process, or Postgres LISTEN/NOTIFY."""
+
+import asyncio
+import logging
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import orjson
+import psycopg2
+
+from app.common.constants import EVENT_BUS, EVENT_BUS_CHANNEL, EVENT_BUS_RECONNECT_INTERVAL
+from app.database import unpooled_connection
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must be shorter than 8000 bytes
+NOTIFY_MAX_PAYLOAD = 8000
+
+# Event handled by this process alone, when it may have missed events of the others
+RESYNC = "resync"
+
+
+@dataclass
+class BusEvent:
+    """Event received from the bus."""
+
+    kind: str
+    data: dict
+    local: bool  # Published by this process
+    time: datetime  # Publication time (clock of the publishing process)
+
+
+EventHandler = Callable[[BusEvent], Awaitable[None]]
+
+
+class EventBus:
+    """
+    Base of the event buses.
+
+    Handlers subscribe to kinds of events; a published event is handled at
+    once by the handlers of the publishing process, then by the ones of the
+    other processes (if any), in publication order. Event data must be JSON
+    serialisable: handlers get it as decoded from JSON, wherever they run.
+    """
+
+    def __init__(self) -> None:
+        self.origin = uuid.uuid4().hex  # ID of this process on the bus
+        self._handlers: dict[str, list[EventHandler]] = {}
+        self.published = 0
+        self.received = 0  # From the other processes
+        self.failed = 0  # Publications to the other processes, or handlers, that failed
+
+    async def start(self) -> None:
+        """Connect to the other processes."""
+
+    async def stop(self) -> None:
+        """Disconnect from the other processes."""
+
+    def stats(self) -> dict:
+        """Get the bus counters."""
+        return {
+            "backend": EVENT_BUS,
+            "published": self.published,
+            "received": self.received,
+            "failed": self.failed,
+        }
+
+    def subscribe(self, kind: str, handler: EventHandler) -> None:
+        """Register a handler of a kind of events."""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    async def publish(self, kind: str, data: dict) -> None:
+        """Publish an event to the handlers of every process."""
+        payload = orjson.dumps(self._local_event(kind, data))
+        self.published += 1
+        await self._dispatch(orjson.loads(payload))
+        self._send(payload)
+
+    def _send(self, payload: bytes) -> None:
+        """Send an event to the other processes."""
+
+    def _local_event(self, kind: str, data: dict) -> dict:
+        """Build an event published by this process."""
+        return {"kind": kind, "origin": self.origin, "time": datetime.now(timezone.utc).isoformat(), "data": data}
+
+    async def _dispatch(self, event: dict) -> None:
+        """Run the handlers of an event (a failing handler does not prevent the others)."""
+        bus_event = BusEvent(
+            kind=event["kind"],
+            data=event["data"],
+            local=event["origin"] == self.origin,
+            time=datetime.fromisoformat(event["time"]),
+        )
+        for handler in self._handlers.get(bus_event.kind, ()):
+            try:
+                await handler(bus_event)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error in {bus_event.kind} event handler: {e}", exc_info=True)
+
+
+class InProcessEventBus(EventBus):
+    """Event bus of a single process (events are only handled by the publishing one)."""
+
+
+class PostgresEventBus(EventBus):
+    """
+    Event bus between the processes sharing the database, over Postgres LISTEN/NOTIFY.
+
+    Each process holds two connections outside of the pool: one listening on
+    EVENT_BUS_CHANNEL, read by the event loop as notifications arrive, and
+    one sending the notifications, in publication order, from a worker thread.
+    Postgres delivers them to every listener in the same order. Events
+    published while the listener is disconnected are missed by this process:
+    it reconnects every EVENT_BUS_RECONNECT_INTERVAL seconds, then handles a
+    RESYNC event to rebuild its in-memory state from the database.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._listener = None
+        self._sender = None
+        self._queue: asyncio.Queue[dict] = asyncio.Queue()
+        self._outbox: asyncio.Queue[bytes] = asyncio.Queue()
+        self._consumer: asyncio.Task | None = None
+        self._delivery: asyncio.Task | None = None
+        self._reconnect: asyncio.Task | None = None
+        self.resyncs = 0
+
+    async def start(self) -> None:
+        """Connect to the database and listen to the channel."""
+        if self._consumer is None:
+            self._consumer = asyncio.create_task(self._consume())
+            self._delivery = asyncio.create_task(self._deliver())
+            try:
+                self._listen()
+            except psycopg2.Error as e:
+                logger.error(f"Event bus listener connection failed: {e}")
+                self._reconnect = asyncio.create_task(self._reconnect_listener())
+            logger.info(f"Event bus listening on {EVENT_BUS_CHANNEL}")
+
+    async def stop(self) -> None:
+        """Stop listening, send the pending notifications, and close the connections."""
+        if self._delivery is not None:
+            try:
+                await asyncio.wait_for(self._outbox.join(), EVENT_BUS_RECONNECT_INTERVAL)
+            except asyncio.TimeoutError:
+                logger.error(f"Event bus stopped with {self._outbox.qsize()} notifications not sent")
+        for task in (self._reconnect, self._consumer, self._delivery):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._reconnect = self._consumer = self._delivery = None
+        self._close_listener()
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+
+    def stats(self) -> dict:
+        """Get the bus counters."""
+        return {
+            **super().stats(),
+            "listening": self._listener is not None,
+            "pending": self._outbox.qsize(),
+            "resyncs": self.resyncs,
+        }
+
+    def _send(self, payload: bytes) -> None:
+        """Queue the notification of an event to the other processes."""
+        if len(payload) >= NOTIFY_MAX_PAYLOAD:
+            self.failed += 1
+            logger.error(f"Event of {len(payload)} bytes too large for the event bus, not sent")
+            return
+        self._outbox.put_nowait(payload)
+
+    async def _deliver(self) -> None:
+        """Send the queued notifications, one at a time (the database calls block, they run in a thread)."""
+        while True:
+            payload = await self._outbox.get()
+            try:
+                await asyncio.to_thread(self._notify, payload)
+            finally:
+                self._outbox.task_done()
+
+    def _notify(self, payload: bytes) -> None:
+        """Notify the other processes (the connection is reopened once if it was lost)."""
+        for attempt in range(2):
+            try:
+                if self._sender is None:
+                    self._sender = unpooled_connection()
+                with self._sender.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (EVENT_BUS_CHANNEL, payload.decode()))
+                return
+            except psycopg2.Error as e:
+                if self._sender is not None:
+                    self._sender.close()
+                    self._sender = None
+                if attempt:
+                    self.failed += 1
+                    logger.error(f"Event bus notification failed: {e}")
+
+    def _listen(self) -> None:
+        """Open the listener connection, and read it from the event loop."""
+        self._listener = unpooled_connection()
+        with self._listener.cursor() as cursor:
+            cursor.execute(f"LISTEN {EVENT_BUS_CHANNEL}")
+        asyncio.get_running_loop().add_reader(self._listener.fileno(), self._on_notify)
+
+    def _close_listener(self) -> None:
+        """Stop reading the listener connection, and close it."""
+        if self._listener is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._listener.fileno())
+            except Exception:
+                pass
+            self._listener.close()
+            self._listener = None
+
+    def _on_notify(self) -> None:
+        """Queue the notifications of the other processes (listener connection readable)."""
+        try:
+            self._listener.poll()
+        except psycopg2.Error as e:
+            logger.error(f"Event bus listener connection lost: {e}")
+            self._close_listener()
+            self._reconnect = asyncio.create_task(self._reconnect_listener())
+            return
+        for notify in self._listener.notifies:
+            event = orjson.loads(notify.payload)
+            if event["origin"] != self.origin:
+                self._queue.put_nowait(event)
+        self._listener.notifies.clear()
+
+    async def _reconnect_listener(self) -> None:
+        """Reopen the listener connection until it succeeds."""
+        while self._listener is None:
+            await asyncio.sleep(EVENT_BUS_RECONNECT_INTERVAL)
+            try:
+                self._listen()
+                logger.info("Event bus listener reconnected")
+            except psycopg2.Error as e:
+                self._listener = None
+                logger.error(f"Event bus listener connection failed: {e}")
+                continue
+            # After the events received before the connection was lost
+            self.resyncs += 1
+            self._queue.put_nowait(self._local_event(RESYNC, {}))
+
+    async def _consume(self) -> None:
+        """Handle the events of the other processes, one at a time."""
+        while True:
+            event = await self._queue.get()
+            if event["origin"] != self.origin:
+                self.received += 1
+            await self._dispatch(event)
+
+
+def create_event_bus() -> EventBus:
+    """Create the event bus of the EVENT_BUS backend ("postgres" or "memory")."""
+    if EVENT_BUS == "memory":
+        return InProcessEventBus()
+    return PostgresEventBus()
+
+
+# Global event bus instance
+event_bus = create_event_bus()
@@ -0,0 +1,160 @@
+"""
+Application events, published on the event bus and applied by every backend process.
+
+The in-memory state derived from the database (history cache, resource
+versions, anomaly detection states, live state) and the WebSocket clients
+are per process: the writes publish events, whose handlers update them and
+broadcast to the clients in each process.
+"""
+
+import asyncio
+from dataclasses import asdict
+from datetime import datetime
+
+from app.common.anomalies import Anomaly, anomaly_detector
+from app.common.event_bus import RESYNC, BusEvent, event_bus
+from app.common.forecast import trend_forecaster
+from app.common.history_cache import history_cache
+from app.common.versions import ENTITIES, READINGS, plant_key, versions
+from app.database import init_live_state
+from app.schemas.metrics import MetricsResponse
+from app.tasks.module_heartbeat import module_heartbeat_checker
+from app.tasks.plant_purge import plant_purger
+from app.websocket import ws_manager
+
+# Plant IDs per event (event bus payloads are limited to 8 kB)
+PLANT_IDS_PER_EVENT = 1000
+
+
+async def publish_reading(
+    plant_id: int | None,
+    timestamp: datetime,
+    values: dict[str, float] | None = None,
+    metrics: MetricsResponse | None = None,
+    anomalies: list[Anomaly] | None = None,
+) -> None:
+    """
+    Publish a stored reading.
+
+    Args:
+        plant_id (int | None): Plant of the reading, None for a module without plant.
+        timestamp (datetime): Time of the reading.
+        values (dict[str, float] | None): Stored values, by metric column.
+        metrics (MetricsResponse | None): Reading as received, for PLANT_METRICS.
+        anomalies (list[Anomaly] | None): Anomalies detected on the reading by the ingesting process.
+    """
+    await event_bus.publish("reading", {
+        "plantId": plant_id,
+        "timestamp": timestamp.isoformat(),
+        "values": values,
+        "metrics": metrics.model_dump(mode="json") if metrics else None,
+        "anomalies": [{**asdict(anomaly), "timestamp": anomaly.timestamp.isoformat()} for anomaly in anomalies or ()],
+    })
+
+
+async def publish_module_online(module_id: str, last_seen: datetime) -> None:
+    """Publish that a module came back online."""
+    await event_bus.publish("module_online", {"moduleId": module_id, "lastSeen": last_seen.isoformat()})
+
+
+async def publish_entity_change(entity: str, action: str, entity_id: int | str, module_changed: bool = False) -> None:
+    """
+    Publish a change of a plant or module.
+
+    Args:
+        entity (str): "plant" or "module".
+        action (str): "create", "update" or "delete".
+        entity_id (int | str): ID of the entity.
+        module_changed (bool): The plant was coupled to another module.
+    """
+    await event_bus.publish("entity_change", {
+        "entity": entity,
+        "action": action,
+        "id": entity_id,
+        "moduleChanged": module_changed,
+    })
+
+
+async def publish_metrics_purged(plant_ids: list[int]) -> None:
+    """Publish that old metrics of plants were deleted (retention)."""
+    for start in range(0, len(plant_ids), PLANT_IDS_PER_EVENT):
+        await event_bus.publish("metrics_purged", {"plantIds": plant_ids[start:start + PLANT_IDS_PER_EVENT]})
+
+
+async def publish_process_started() -> None:
+    """Publish that this process started (once connected to the bus)."""
+    await event_bus.publish("process_started", {})
+
+
+async def _on_reading(event: BusEvent) -> None:
+    """Update the caches with a reading, and broadcast it."""
+    data = event.data
+    if data["plantId"] is None:
+        versions.bump(READINGS, at=event.time)
+        return
+
+    plant_id = data["plantId"]
+    timestamp = datetime.fromisoformat(data["timestamp"])
+    # The ingesting process already folded the reading into its anomaly detection states
+    if not event.local:
+        anomaly_detector.update(plant_id, timestamp, data["values"])
+    history_cache.add_reading(plant_id, timestamp, data["values"])
+    versions.bump(READINGS, plant_key(plant_id), at=event.time)
+
+    await ws_manager.emit_plant_metrics(plant_id, MetricsResponse.model_validate(data["metrics"]))
+    for anomaly in data["anomalies"]:
+        await ws_manager.emit_anomaly(Anomaly(**{**anomaly, "timestamp": datetime.fromisoformat(anomaly["timestamp"])}))
+
+
+async def _on_module_online(event: BusEvent) -> None:
+    """Mark a module online, and broadcast it."""
+    module_id = event.data["moduleId"]
+    module_heartbeat_checker.mark_module_online(module_id)
+    await ws_manager.emit_module_connectivity(module_id, True, datetime.fromisoformat(event.data["lastSeen"]))
+
+
+async def _on_metrics_purged(event: BusEvent) -> None:
+    """Bump the versions of the plants whose old metrics were deleted."""
+    versions.bump(*(plant_key(plant_id) for plant_id in event.data["plantIds"]), at=event.time)
+
+
+async def _on_process_started(event: BusEvent) -> None:
+    """Align the resource versions of every process on the start of a new one."""
+    versions.raise_floor(event.time)
+
+
+async def _on_resync(event: BusEvent) -> None:
+    """Rebuild the state derived from the events this process may have missed (listener reconnected)."""
+    # The anomaly detection states catch up with the next readings
+    history_cache.clear()
+    trend_forecaster.clear()
+    versions.raise_floor(event.time)
+    await asyncio.to_thread(init_live_state)
+
+
+async def _on_entity_change(event: BusEvent) -> None:
+    """Invalidate the caches of a changed entity, and broadcast the change."""
+    entity, action, entity_id = event.data["entity"], event.data["action"], event.data["id"]
+    if entity == "plant":
+        if action == "delete":
+            # Drop its cached history, anomaly detection states and forecast, and purge it (leader process)
+            history_cache.invalidate(entity_id)
+            anomaly_detector.forget(entity_id)
+            trend_forecaster.forget(entity_id)
+            plant_purger.schedule(entity_id)
+        elif event.data["moduleChanged"]:
+            # The readings of another module start new anomaly detection states
+            anomaly_detector.forget(entity_id)
+        versions.bump(ENTITIES, plant_key(entity_id), at=event.time)
+    else:
+        versions.bump(ENTITIES, at=event.time)
+
+    await ws_manager.emit_entity_change(entity, action, entity_id)
+
+
+event_bus.subscribe("reading", _on_reading)
+event_bus.subscribe("module_online", _on_module_online)
+event_bus.subscribe("entity_change", _on_entity_change)
+event_bus.subscribe("metrics_purged", _on_metrics_purged)
+event_bus.subscribe("process_started", _on_process_started)
+event_bus.subscribe(RESYNC, _on_resync)
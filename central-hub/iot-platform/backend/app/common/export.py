@@ -0,0 +1,178 @@
+"""Streaming export of raw metrics (CSV, NDJSON, Parquet)."""
+
+import csv
+import heapq
+import io
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime
+from importlib.util import find_spec
+from itertools import islice
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.common.archive import read_archive
+from app.common.constants import EXPORT_CHUNK_ROWS
+from app.database import SessionLocal
+from app.models.metrics import Metrics
+from app.models.plant import Plant
+
+# Export formats: (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+EXPORT_COLUMNS = ("plantId", "timestamp", "soilMoist", "humidity", "light", "temp")
+
+
+def parquet_available() -> bool:
+    """Check if the optional Parquet dependency (pyarrow) is installed."""
+    return find_spec("pyarrow") is not None
+
+
+def export_metrics(
+    export_format: str,
+    plant_ids: list[int] | None,
+    from_time: datetime | None,
+    to_time: datetime,
+) -> Iterator[bytes]:
+    """
+    Stream the raw metrics of some plants over a window, ordered by plant and time.
+
+    Rows are read with a server-side cursor, EXPORT_CHUNK_ROWS at a time, and
+    each chunk is encoded and yielded as soon as it is fetched, so memory stays
+    constant whatever the number of rows. The archived metrics of each plant
+    are merged in. The generator owns its session, as it outlives the request
+    handler.
+
+    Args:
+        export_format (str): One of EXPORT_FORMATS.
+        plant_ids (list[int] | None): Plants to export (default: all plants).
+        from_time (datetime | None): Start of the window (default: beginning of the data).
+        to_time (datetime): End of the window (inclusive).
+
+    Yields:
+        bytes: Encoded chunks of the export file.
+    """
+    session = SessionLocal()
+    try:
+        if plant_ids is None:
+            plant_ids = session.execute(select(Plant.id)).scalars().all()
+        partitions = _chunks(_export_rows(session, sorted(plant_ids), from_time, to_time), EXPORT_CHUNK_ROWS)
+        yield from _WRITERS[export_format](partitions)
+    finally:
+        session.close()
+
+
+def _export_rows(
+    session: Session,
+    plant_ids: list[int],
+    from_time: datetime | None,
+    to_time: datetime,
+) -> Iterator[tuple]:
+    """Get the (plant_id, timestamp, soil_moist, humidity, light, temp) rows of the plants, archive included."""
+    for plant_id in plant_ids:
+        query = (
+            select(Metrics.timestamp, Metrics.id, Metrics.soil_moist, Metrics.humidity, Metrics.light, Metrics.temp)
+            .where(Metrics.plant_id == plant_id, Metrics.timestamp <= to_time)
+            .order_by(Metrics.timestamp, Metrics.id)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+        if from_time is not None:
+            query = query.where(Metrics.timestamp >= from_time)
+
+        rows = heapq.merge(read_archive(plant_id, from_time, to_time), session.execute(query), key=lambda row: row[:2])
+        for timestamp, _, *values in rows:
+            yield (plant_id, timestamp, *values)
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    """Split rows into lists of `size` rows (the last one may be shorter)."""
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _csv_chunks(partitions: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """Encode the rows as CSV, with a header line."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows((plant_id, timestamp.isoformat(), *values) for plant_id, timestamp, *values in rows)
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(partitions: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """Encode the rows as newline-delimited JSON objects."""
+    for rows in partitions:
+        yield b"".join(
+            orjson.dumps(dict(zip(EXPORT_COLUMNS, (plant_id, timestamp.isoformat(), *values)))) + b"\n"
+            for plant_id, timestamp, *values in rows
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands over the bytes written so far."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        """Get (and forget) the bytes written since the last call."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_chunks(partitions: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """Encode the rows as a Parquet file, one row group per chunk (requires pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("plantId", pa.int32()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("soilMoist", pa.float64()),
+        ("humidity", pa.float64()),
+        ("light", pa.float64()),
+        ("temp", pa.float64()),
+    ])
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in partitions:
+            columns = zip(*rows)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield sink.take()
+    yield sink.take()
+
+
+_WRITERS = {
+    "csv": _csv_chunks,
+    "ndjson": _ndjson_chunks,
+    "parquet": _parquet_chunks,
+}
@@ -0,0 +1,270 @@
+"""Trend forecast of the plant metrics (lines fitted on the latest rollup buckets, cached per plant)."""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.common.constants import (
+    FORECAST_BREAK,
+    FORECAST_HORIZON,
+    FORECAST_MIN_POINTS,
+    FORECAST_STABLE_SLOPE,
+    FORECAST_WINDOW,
+    FORECAST_WORKERS,
+    ROLLUP_INTERVAL,
+)
+from app.common.daily_stats import plant_thresholds, sensor_range
+from app.common.rollups import METRIC_COLUMNS, rollup_bucket
+from app.common.timeseries import fit_trends
+from app.common.versions import plant_key, versions
+from app.models.metrics_rollup import MetricsRollup
+from app.models.plant import Plant
+
+
+@dataclass
+class MetricForecast:
+    """Trend of one plant's metric, and when it crosses a threshold."""
+
+    current: float  # Average of the latest bucket
+    status: Literal["below", "inRange", "above"]
+    points: int  # Buckets of the fitted trend
+    slope: float | None = None  # Per hour, None without enough points
+    r2: float | None = None
+    trend: Literal["rising", "falling", "stable"] | None = None
+    threshold: Literal["min", "max"] | None = None  # Threshold crossed within FORECAST_HORIZON
+    reached_at: datetime | None = None
+
+
+@dataclass
+class PlantForecast:
+    """Forecast of a plant's metrics, valid while its version and the current bucket do not change."""
+
+    plant_id: int
+    computed_at: datetime
+    version: str
+    bucket: int
+    metrics: dict[str, MetricForecast] = field(default_factory=dict)
+
+
+@dataclass
+class _PlantBuckets:
+    """Closed rollup buckets of a plant within the window (epoch -> (count, averages))."""
+
+    closed: dict[int, tuple[int, list[float]]]
+    closed_until: int  # Buckets before this one are loaded
+
+
+class TrendForecaster:
+    """
+    Per-plant trend forecasts, cached and refreshed incrementally.
+
+    A line is fitted to each metric over the FORECAST_WINDOW latest rollup
+    buckets (from the last jump on, e.g. a watering), weighted by their number
+    of readings, and extrapolated to the plant's thresholds. Forecasts are
+    cached until the plant's readings or thresholds change or a new bucket
+    starts; a refresh only reads the rollup buckets that changed since the last
+    one. All the plants to refresh are fitted in one vectorised batch, in a
+    worker process (threads without start()).
+    """
+
+    def __init__(self) -> None:
+        self._pool: ProcessPoolExecutor | None = None
+        self._forecasts: dict[int, PlantForecast] = {}
+        self._buckets: dict[int, _PlantBuckets] = {}
+        self.hits = 0
+        self.fits = 0
+        self.fitted_plants = 0
+
+    def start(self) -> None:
+        """Start the worker pool."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=FORECAST_WORKERS)
+
+    def stop(self) -> None:
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        """Get the forecast counters."""
+        return {"plants": len(self._forecasts), "hits": self.hits, "fits": self.fits, "fittedPlants": self.fitted_plants}
+
+    def forget(self, plant_id: int) -> None:
+        """Drop the cached forecast and buckets of a plant."""
+        self._forecasts.pop(plant_id, None)
+        self._buckets.pop(plant_id, None)
+
+    def clear(self) -> None:
+        """Drop the cached forecasts and buckets of all the plants."""
+        self._forecasts.clear()
+        self._buckets.clear()
+
+    async def forecast(self, session: Session, plants: list[Plant]) -> list[PlantForecast]:
+        """Get the forecasts of plants, refreshing the stale ones."""
+        now = datetime.now(timezone.utc)
+        bucket = int(rollup_bucket(now).timestamp())
+        stale = []
+        for plant in plants:
+            cached = self._forecasts.get(plant.id)
+            if cached is not None and cached.bucket == bucket and cached.version == _version(plant.id):
+                self.hits += 1
+            else:
+                stale.append(plant)
+
+        if stale:
+            # Versions are read before the buckets, so that a concurrent reading makes the result stale
+            plant_versions = {plant.id: _version(plant.id) for plant in stale}
+            points = self._load_points(session, stale, bucket)
+            times, values, weights, breaks = _fit_arrays(points, now)
+            loop = asyncio.get_running_loop()
+            try:
+                slopes, intercepts, r2, fitted = await loop.run_in_executor(self._pool, fit_trends, times, values, weights, breaks)
+            except (Exception, asyncio.CancelledError):
+                # The buckets are marked as loaded, but no forecast uses them: reload them at the next refresh
+                for plant in stale:
+                    self._buckets.pop(plant.id, None)
+                raise
+            self.fits += 1
+            self.fitted_plants += len(stale)
+
+            for index, plant in enumerate(stale):
+                forecast = PlantForecast(plant_id=plant.id, computed_at=now, version=plant_versions[plant.id], bucket=bucket)
+                if points[plant.id]:
+                    latest = dict(zip(METRIC_COLUMNS, points[plant.id][-1][2]))
+                    series = slice(index * len(METRIC_COLUMNS), (index + 1) * len(METRIC_COLUMNS))
+                    for column, slope, intercept, score, count in zip(
+                        METRIC_COLUMNS, slopes[series], intercepts[series], r2[series], fitted[series]
+                    ):
+                        forecast.metrics[column] = _metric_forecast(
+                            column, plant, latest[column], slope, intercept, score, int(count), now
+                        )
+                self._forecasts[plant.id] = forecast
+
+        return [self._forecasts[plant.id] for plant in plants]
+
+    def _load_points(self, session: Session, plants: list[Plant], bucket: int) -> dict[int, list[tuple]]:
+        """
+        Read the rollup buckets of plants changed since their last refresh.
+
+        Returns:
+            dict: Plant ID -> (epoch, count, averages) of the buckets of the window, oldest first.
+        """
+        window_start = bucket - FORECAST_WINDOW
+        by_since: dict[int, list[int]] = {}
+        for plant in plants:
+            entry = self._buckets.get(plant.id)
+            if entry is None or entry.closed_until < window_start:
+                entry = self._buckets[plant.id] = _PlantBuckets(closed={}, closed_until=window_start)
+            by_since.setdefault(entry.closed_until, []).append(plant.id)
+
+        current: dict[int, tuple] = {}
+        for since, plant_ids in by_since.items():
+            rows = session.execute(
+                select(MetricsRollup).where(
+                    MetricsRollup.plant_id.in_(plant_ids),
+                    MetricsRollup.bucket >= datetime.fromtimestamp(since, tz=timezone.utc),
+                )
+            ).scalars().all()
+            for row in rows:
+                epoch = int(row.bucket.timestamp())
+                averages = [getattr(row, f"{column}_sum") / row.count for column in METRIC_COLUMNS]
+                if epoch < bucket:
+                    self._buckets[row.plant_id].closed[epoch] = (row.count, averages)
+                else:
+                    current[row.plant_id] = (epoch, row.count, averages)
+
+        points = {}
+        for plant in plants:
+            entry = self._buckets[plant.id]
+            entry.closed = {epoch: value for epoch, value in entry.closed.items() if epoch >= window_start}
+            entry.closed_until = bucket
+            points[plant.id] = [(epoch, count, averages) for epoch, (count, averages) in sorted(entry.closed.items())]
+            if plant.id in current:
+                points[plant.id].append(current[plant.id])
+        return points
+
+
+def _span(metric: str) -> float:
+    """Width of the sensor range of a metric."""
+    low, high = sensor_range(metric)
+    return high - low
+
+
+def _version(plant_id: int) -> str:
+    """Version of a plant's readings and details."""
+    return versions.validators(plant_key(plant_id))[0]
+
+
+def _fit_arrays(points: dict[int, list[tuple]], now: datetime) -> tuple[np.ndarray, ...]:
+    """
+    Lay out the buckets of plants as series for fit_trends (one per plant and metric).
+
+    Series are left-padded to the same length with zero weights; times are in
+    hours from now, at the middle of each bucket (of its elapsed part for the
+    current one).
+    """
+    now_ts = now.timestamp()
+    length = max((len(plant_points) for plant_points in points.values()), default=0)
+    metrics = len(METRIC_COLUMNS)
+    times = np.zeros((len(points) * metrics, length))
+    values = np.zeros((len(points) * metrics, length))
+    weights = np.zeros((len(points) * metrics, length))
+
+    for index, plant_points in enumerate(points.values()):
+        if not plant_points:
+            continue
+        series = slice(index * metrics, (index + 1) * metrics)
+        offset = length - len(plant_points)
+        epochs = np.array([epoch for epoch, _, _ in plant_points], dtype=float)
+        middles = np.minimum(epochs + ROLLUP_INTERVAL / 2, (epochs + now_ts) / 2)
+        times[series, offset:] = (middles - now_ts) / 3600
+        values[series, offset:] = np.array([averages for _, _, averages in plant_points]).T
+        weights[series, offset:] = [count for _, count, _ in plant_points]
+
+    spans = np.array([_span(column) for column in METRIC_COLUMNS])
+    breaks = np.tile(FORECAST_BREAK * spans, len(points))
+    return times, values, weights, breaks
+
+
+def _metric_forecast(
+    metric: str,
+    plant: Plant,
+    current: float,
+    slope: float,
+    intercept: float,
+    r2: float,
+    points: int,
+    now: datetime,
+) -> MetricForecast:
+    """Interpret the fitted line of a plant's metric against its thresholds."""
+    low, high = plant_thresholds(plant)[metric]
+    status = "below" if current < low else "above" if current > high else "inRange"
+    forecast = MetricForecast(current=current, status=status, points=points)
+    if points < FORECAST_MIN_POINTS or np.isnan(slope):
+        return forecast
+
+    forecast.slope, forecast.r2 = float(slope), float(r2)
+    if abs(slope) < FORECAST_STABLE_SLOPE * _span(metric):
+        forecast.trend = "stable"
+        return forecast
+    forecast.trend = "rising" if slope > 0 else "falling"
+
+    # Time for the line (its value now is the intercept) to reach the threshold it heads to
+    if status == "inRange":
+        threshold, target = ("max", high) if slope > 0 else ("min", low)
+        hours = max((target - intercept) / slope, 0.0)
+        if hours * 3600 <= FORECAST_HORIZON:
+            forecast.threshold = threshold
+            forecast.reached_at = now + timedelta(hours=float(hours))
+    return forecast
+
+
+# Global trend forecaster instance
+trend_forecaster = TrendForecaster()
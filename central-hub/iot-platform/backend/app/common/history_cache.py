@@ -0,0 +1,197 @@
+"""In-process cache of plant history data (columns), aligned on bucket boundaries."""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+from app.common.constants import HISTORY_CACHE_MAX_POINTS, HISTORY_GAP_THRESHOLD
+from app.common.timeseries import fill_gaps
+from app.common.utils import as_epoch
+
+# Metrics in the order of the bucket sums: (column, response field, rounding digits)
+METRICS = (("soil_moist", "soilMoist", 2), ("temp", "temp", 2), ("light", "light", 0), ("humidity", "humidity", 2))
+
+
+@dataclass
+class HistoryCacheEntry:
+    """Cached history data points of one plant and range."""
+
+    columns: dict[str, list]  # "timestamp" (datetimes or epoch seconds), then one column per metric
+    interval: int
+    raw: bool  # Actual measurements (hour range) instead of bucket averages
+    expires_at: float
+    last_count: int = 0  # Bucket averages: number of readings in the last bucket
+    last_sums: list[float] = field(default_factory=list)  # Bucket averages: sums of the last bucket
+    last_timestamp: datetime | None = None  # Bucket averages: latest reading counted in the last bucket
+
+
+class HistoryCache:
+    """
+    LRU/TTL cache of history data points keyed by (plant_id, time_range, aligned bucket start).
+
+    Entries live for one bucket interval and are updated in place by new
+    readings (only the last bucket / the tail changes), so a reading never
+    drops an entry. The total number of cached points is capped.
+    """
+
+    def __init__(self, max_points: int = HISTORY_CACHE_MAX_POINTS) -> None:
+        self._entries: OrderedDict[tuple[int, str, int], HistoryCacheEntry] = OrderedDict()
+        self._max_points = max_points
+        self._points = 0
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.evictions = 0
+
+    def get(self, plant_id: int, time_range: str, aligned_start: int, start_time: datetime) -> dict[str, list] | None:
+        """Get the cached data columns, or None on a miss."""
+        key = (plant_id, time_range, aligned_start)
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        # Actual measurements: skip the ones that slid out of the range since caching
+        # (with the null slots that followed them)
+        skip = 0
+        if entry.raw:
+            timestamps, soil_moist = entry.columns["timestamp"], entry.columns["soilMoist"]
+            start_ts = start_time.timestamp()
+            while skip < len(timestamps) and (
+                as_epoch(timestamps[skip]) < start_ts or (skip > 0 and soil_moist[skip] is None)
+            ):
+                skip += 1
+        return {name: column[skip:] for name, column in entry.columns.items()}
+
+    def put(
+        self,
+        plant_id: int,
+        time_range: str,
+        aligned_start: int,
+        interval: int,
+        columns: dict[str, list],
+        raw: bool,
+        last_count: int = 0,
+        last_sums: list[float] | None = None,
+        last_timestamp: datetime | None = None,
+    ) -> None:
+        """Cache the data columns of a plant and range for one bucket interval."""
+        key = (plant_id, time_range, aligned_start)
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = HistoryCacheEntry(
+            columns={name: list(column) for name, column in columns.items()},
+            interval=interval,
+            raw=raw,
+            expires_at=time.monotonic() + interval,
+            last_count=last_count,
+            last_sums=list(last_sums or [0.0] * len(METRICS)),
+            last_timestamp=last_timestamp,
+        )
+        self._points += len(columns["timestamp"])
+
+        # Enforce the memory cap (least recently used first)
+        while self._points > self._max_points and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def add_reading(self, plant_id: int, timestamp: datetime, values: dict[str, float]) -> None:
+        """
+        Fold a new reading into the cached entries of a plant.
+
+        Readings already read from the database by an entry (whose event was
+        handled after the entry was cached) are skipped.
+        """
+        epoch = int(timestamp.timestamp())
+
+        for key, entry in list(self._entries.items()):
+            if key[0] != plant_id or self._includes(entry, timestamp):
+                continue
+
+            if entry.raw:
+                self._append_measurement(entry, timestamp, epoch, values)
+            else:
+                timestamps = entry.columns["timestamp"]
+                if not timestamps or int(as_epoch(timestamps[-1])) != epoch - epoch % entry.interval:
+                    # The reading belongs to a bucket this entry does not cover (stale entry)
+                    self._remove(key)
+                    continue
+                self._update_last_bucket(entry, timestamp, values)
+            self.updates += 1
+
+        # Appended points count towards the cap
+        while self._points > self._max_points and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, plant_id: int) -> None:
+        """Drop all the cached entries of a plant."""
+        for key in [key for key in self._entries if key[0] == plant_id]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all the cached entries."""
+        self._entries.clear()
+        self._points = 0
+
+    def stats(self) -> dict:
+        """Get the cache counters."""
+        return {
+            "entries": len(self._entries),
+            "points": self._points,
+            "maxPoints": self._max_points,
+            "hits": self.hits,
+            "misses": self.misses,
+            "updates": self.updates,
+            "evictions": self.evictions,
+        }
+
+    @staticmethod
+    def _includes(entry: HistoryCacheEntry, timestamp: datetime) -> bool:
+        """Check whether an entry already includes a reading (the readings of a plant come in time order)."""
+        if entry.raw:
+            timestamps = entry.columns["timestamp"]
+            return bool(timestamps) and timestamp.timestamp() <= as_epoch(timestamps[-1])
+        return entry.last_timestamp is not None and timestamp <= entry.last_timestamp
+
+    def _remove(self, key: tuple[int, str, int]) -> None:
+        """Remove an entry and release its points."""
+        entry = self._entries.pop(key)
+        self._points -= len(entry.columns["timestamp"])
+
+    def _append_measurement(self, entry: HistoryCacheEntry, timestamp: datetime, epoch: int, values: dict[str, float]) -> None:
+        """Append a measurement to an actual measurements entry, with null slots for a gap."""
+        columns = entry.columns
+        if columns["timestamp"]:
+            last_epoch = int(as_epoch(columns["timestamp"][-1]))
+            _, _, _, null_epochs = fill_gaps(np.array([last_epoch, epoch]), HISTORY_GAP_THRESHOLD, entry.interval)
+            columns["timestamp"].extend(null_epochs.tolist())
+            for _, name, _ in METRICS:
+                columns[name].extend([None] * len(null_epochs))
+            self._points += len(null_epochs)
+
+        columns["timestamp"].append(timestamp)
+        for column, name, digits in METRICS:
+            columns[name].append(round(values[column], digits))
+        self._points += 1
+
+    def _update_last_bucket(self, entry: HistoryCacheEntry, timestamp: datetime, values: dict[str, float]) -> None:
+        """Fold a reading into the average of the last bucket of an entry."""
+        entry.last_timestamp = timestamp
+        entry.last_count += 1
+        entry.last_sums = [total + values[column] for total, (column, _, _) in zip(entry.last_sums, METRICS)]
+        for total, (_, name, digits) in zip(entry.last_sums, METRICS):
+            entry.columns[name][-1] = round(total / entry.last_count, digits)
+
+
+# Global history cache instance
+history_cache = HistoryCache()
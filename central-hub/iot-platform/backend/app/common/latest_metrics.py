@@ -0,0 +1,49 @@
+"""Latest metrics snapshot maintenance (last reading of each plant)."""
+
+from datetime import datetime
+from sqlalchemy import exists, select, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.common.rollups import METRIC_COLUMNS
+from app.models.metrics import Metrics
+from app.models.plant import Plant
+from app.models.plant_latest_metrics import PlantLatestMetrics
+
+
+def upsert_latest_metrics(session: Session, plant_id: int, timestamp: datetime, values: dict[str, float]) -> None:
+    """Record a reading as the latest one of its plant, unless a newer one is stored (not committed)."""
+    stmt = insert(PlantLatestMetrics).values(plant_id=plant_id, timestamp=timestamp, **values)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["plant_id"],
+        set_={column: getattr(stmt.excluded, column) for column in (*METRIC_COLUMNS, "timestamp")},
+        where=PlantLatestMetrics.timestamp <= stmt.excluded.timestamp,
+    ))
+
+
+def backfill_latest_metrics(session: Session) -> int:
+    """
+    Create the missing snapshots from the raw metrics (not committed).
+
+    Only plants without a snapshot are looked up, each with a single index
+    probe on (plant_id, timestamp).
+
+    Returns:
+        int: Number of snapshots written.
+    """
+    latest = (
+        select(Metrics.plant_id, Metrics.timestamp, *(getattr(Metrics, column) for column in METRIC_COLUMNS))
+        .where(Metrics.plant_id == Plant.id)
+        .order_by(Metrics.timestamp.desc(), Metrics.id.desc())
+        .limit(1)
+        .lateral()
+    )
+    query = (
+        select(latest)
+        .select_from(Plant)
+        .join(latest, true())
+        .where(Plant.deleted_at.is_(None), ~exists().where(PlantLatestMetrics.plant_id == Plant.id))
+    )
+
+    stmt = insert(PlantLatestMetrics).from_select([c.name for c in latest.c], query)
+    return session.execute(stmt.on_conflict_do_nothing(index_elements=["plant_id"])).rowcount
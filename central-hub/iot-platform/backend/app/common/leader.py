@@ -0,0 +1,78 @@
+"""Leader election between the backend processes (Postgres advisory lock)."""
+
+import asyncio
+import logging
+import threading
+import zlib
+
+import psycopg2
+
+from app.common.constants import LEADER_LOCK_TIMEOUT
+from app.database import unpooled_connection
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """
+    Session-level Postgres advisory lock electing one leader among the processes.
+
+    The lock is held by a connection of its own, outside of the pool. When the
+    leader stops, or its connection is lost (crash, network failure), Postgres
+    releases the lock, and the next process calling acquire() takes over.
+    The checks run in a worker thread, one at a time, and give up after
+    LEADER_LOCK_TIMEOUT seconds (as a lost connection).
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._key = zlib.crc32(name.encode())
+        self._connection = None
+        self._check_lock = threading.Lock()
+        self.leader = False
+
+    async def acquire(self) -> bool:
+        """
+        Take the lock if it is free, or check that it is still held.
+
+        Returns:
+            bool: Whether this process is the leader.
+        """
+        return await asyncio.to_thread(self._acquire)
+
+    def _acquire(self) -> bool:
+        """Take or check the lock (blocking, one call at a time)."""
+        with self._check_lock:
+            was_leader = self.leader
+            try:
+                if self._connection is None:
+                    self._connection = unpooled_connection(timeout=LEADER_LOCK_TIMEOUT)
+                with self._connection.cursor() as cursor:
+                    if self.leader:
+                        cursor.execute("SELECT 1")
+                    else:
+                        cursor.execute("SELECT pg_try_advisory_lock(%s)", (self._key,))
+                        self.leader = cursor.fetchone()[0]
+            except psycopg2.Error as e:
+                logger.error(f"Leader lock {self.name} connection lost: {e}")
+                self._close()
+
+            if self.leader != was_leader:
+                logger.info(f"{'Acquired' if self.leader else 'Lost'} leader lock {self.name}")
+            return self.leader
+
+    def release(self) -> None:
+        """Release the lock (if held), closing its connection."""
+        with self._check_lock:
+            self._close()
+
+    def _close(self) -> None:
+        """Close the lock connection, which releases the lock (not thread-safe)."""
+        self.leader = False
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+# Global leader lock of the background tasks (heartbeat sweeps, retention, archive, purge, partitions, checkpoints)
+leader_lock = LeaderLock("background_tasks")
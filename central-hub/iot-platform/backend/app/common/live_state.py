@@ -0,0 +1,77 @@
+"""In-memory live state (latest metrics of the plants, connectivity of the modules), for the WebSocket snapshots."""
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.common.utils import as_utc, is_module_online
+from app.models.module import Module
+from app.models.plant import Plant
+from app.models.plant_latest_metrics import PlantLatestMetrics
+from app.schemas.metrics import MetricsResponse
+from app.schemas.websocket import ModuleConnectivityUpdate
+
+
+class LiveState:
+    """
+    Latest metrics of each plant and connectivity of each module.
+
+    Loaded from the database at startup, then kept up to date by the
+    WebSocket events that change it (see app.websocket), so that the snapshot
+    sent to a connecting client never queries the database.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: dict[int, MetricsResponse] = {}
+        self.connectivity: dict[str, ModuleConnectivityUpdate] = {}
+
+    def load(self, session: Session) -> int:
+        """
+        Load the latest metrics of the plants and the connectivity of the modules (newer values are kept).
+
+        Loaded at startup, and again when events may have been missed (see app.common.events).
+
+        Returns:
+            int: Number of plants and modules loaded.
+        """
+        rows = session.execute(
+            select(PlantLatestMetrics)
+            .join(Plant, Plant.id == PlantLatestMetrics.plant_id)
+            .where(Plant.deleted_at.is_(None))
+        ).scalars().all()
+        for row in rows:
+            self.set_metrics(row.plant_id, MetricsResponse(
+                timestamp=as_utc(row.timestamp),
+                soilMoist=row.soil_moist,
+                humidity=row.humidity,
+                light=row.light,
+                temp=row.temp,
+            ))
+
+        modules = session.execute(select(Module)).scalars().all()
+        for module in modules:
+            current = self.connectivity.get(module.id)
+            if current is None or (module.last_seen is not None and (
+                current.lastSeen is None or as_utc(current.lastSeen) < as_utc(module.last_seen)
+            )):
+                self.connectivity[module.id] = ModuleConnectivityUpdate(
+                    isOnline=is_module_online(module), lastSeen=module.last_seen
+                )
+        return len(rows) + len(modules)
+
+    def set_metrics(self, plant_id: int, metrics: MetricsResponse) -> None:
+        """Record the metrics of a plant, unless newer ones are recorded."""
+        current = self.metrics.get(plant_id)
+        if current is None or current.timestamp <= metrics.timestamp:
+            self.metrics[plant_id] = metrics
+
+    def set_connectivity(self, module_id: str, connectivity: ModuleConnectivityUpdate) -> None:
+        """Record the connectivity of a module."""
+        self.connectivity[module_id] = connectivity
+
+    def forget_plant(self, plant_id: int) -> None:
+        """Drop the metrics of a plant (deleted plant)."""
+        self.metrics.pop(plant_id, None)
+
+
+# Global live state instance
+live_state = LiveState()
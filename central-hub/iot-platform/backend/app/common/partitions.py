@@ -0,0 +1,161 @@
+"""Range partitioning of the metrics table by time (Postgres declarative partitioning)."""
+
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.common.constants import METRICS_PARTITIONING, METRICS_STORAGE
+from app.models.metrics import Metrics
+
+DEFAULT_PARTITION = "metrics_default"
+LEGACY_PARTITION = "metrics_legacy"  # Former unpartitioned table, attached as the oldest partition
+
+_BOUNDS_PATTERN = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+# Advisory lock serialising the partition changes of the backend processes
+_LOCK_KEY = zlib.crc32(b"metrics_partitions")
+
+
+@dataclass
+class MetricsPartition:
+    """Partition of the metrics table, covering [start, end) (None: unbounded)."""
+
+    name: str
+    start: datetime | None
+    end: datetime | None
+    default: bool = False
+
+
+def lock_partitions(session: Session) -> None:
+    """Wait for the partition changes of the other processes, and hold them off until the end of the transaction."""
+    session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+
+
+def partition_granularity() -> str:
+    """Get the partitioning period (an already partitioned table defaults to months)."""
+    return METRICS_PARTITIONING or "month"
+
+
+def period_start(timestamp: datetime, granularity: str) -> datetime:
+    """Get the start of the partitioning period (UTC month or ISO week) containing a timestamp."""
+    day = timestamp.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_period(start: datetime, granularity: str) -> datetime:
+    """Get the start of the period following the one starting at `start`."""
+    if granularity == "week":
+        return start + timedelta(days=7)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def is_partitioned(session: Session) -> bool:
+    """Check if the metrics table is partitioned."""
+    return session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('metrics'))"
+    )).scalar_one()
+
+
+def list_partitions(session: Session) -> list[MetricsPartition]:
+    """Get the partitions of the metrics table, oldest first (default partition last)."""
+    rows = session.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass('metrics')"
+    )).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUNDS_PATTERN.search(bound)
+        if match is None:
+            partitions.append(MetricsPartition(name=name, start=None, end=None, default=True))
+        else:
+            start, end = (_parse_bound(value) for value in match.groups())
+            partitions.append(MetricsPartition(name=name, start=start, end=end))
+
+    oldest_first = datetime.min.replace(tzinfo=timezone.utc)
+    return sorted(partitions, key=lambda p: (p.default, p.start or oldest_first))
+
+
+def ensure_partitions(session: Session, granularity: str, now: datetime, ahead: int) -> list[str]:
+    """
+    Create the partitions of the current period and the `ahead` next ones, and the default partition (not committed).
+
+    Periods overlapping an existing partition (e.g. the legacy one) are skipped.
+
+    Returns:
+        list[str]: Names of the created partitions.
+    """
+    lock_partitions(session)
+    session.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF metrics DEFAULT"))
+    existing = [p for p in list_partitions(session) if not p.default]
+
+    created = []
+    start = period_start(now, granularity)
+    for _ in range(ahead + 1):
+        end = next_period(start, granularity)
+        overlaps = any(
+            (p.start is None or p.start < end) and (p.end is None or start < p.end)
+            for p in existing
+        )
+        if not overlaps:
+            name = f"metrics_p{start:%Y%m%d}"
+            session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF metrics "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            created.append(name)
+        start = end
+    return created
+
+
+def convert_to_partitioned(session: Session, granularity: str, now: datetime) -> None:
+    """
+    Turn the unpartitioned metrics table into a partitioned one (not committed).
+
+    The existing table is kept as is and attached as the partition holding
+    everything up to the end of the current period, so no row is copied; it is
+    dropped by the retention once all its data has expired.
+    """
+    latest = session.execute(select(func.max(Metrics.timestamp))).scalar()
+    legacy_end = next_period(period_start(max(now, latest or now), granularity), granularity)
+
+    # Free the names used by the partitioned table
+    session.execute(text(f"ALTER TABLE metrics RENAME TO {LEGACY_PARTITION}"))
+    session.execute(text(f"ALTER INDEX IF EXISTS metrics_pkey RENAME TO {LEGACY_PARTITION}_pkey"))
+    session.execute(text(f"ALTER INDEX IF EXISTS ix_metrics_plant_id RENAME TO ix_{LEGACY_PARTITION}_plant_id"))
+    session.execute(text(
+        f"ALTER INDEX IF EXISTS ix_metrics_plant_timestamp RENAME TO ix_{LEGACY_PARTITION}_plant_timestamp"
+    ))
+    session.execute(text(f"ALTER SEQUENCE IF EXISTS metrics_id_seq RENAME TO {LEGACY_PARTITION}_id_seq"))
+
+    if METRICS_STORAGE == "float":
+        # The former primary key (id) does not include the partition key: it is rebuilt on attach
+        session.execute(text(f"ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT IF EXISTS {LEGACY_PARTITION}_pkey"))
+
+    Metrics.__table__.create(session.connection())
+    session.execute(text(
+        f"SELECT setval('metrics_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM {LEGACY_PARTITION}), false)"
+    ))
+    session.execute(text(
+        f"ALTER TABLE metrics ATTACH PARTITION {LEGACY_PARTITION} "
+        f"FOR VALUES FROM (MINVALUE) TO ('{legacy_end.isoformat()}')"
+    ))
+
+
+def drop_partition(session: Session, name: str) -> None:
+    """Detach and drop a partition (not committed)."""
+    lock_partitions(session)
+    session.execute(text(f"ALTER TABLE metrics DETACH PARTITION {name}"))
+    session.execute(text(f"DROP TABLE {name}"))
+
+
+def _parse_bound(value: str) -> datetime | None:
+    """Parse a partition bound ('YYYY-MM-DD HH:MM:SS+TZ' literal or MINVALUE/MAXVALUE)."""
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
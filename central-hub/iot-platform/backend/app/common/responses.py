@@ -0,0 +1,36 @@
+"""Fast JSON responses for large payloads (rendered by orjson, without re-validation)."""
+
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# UTC datetimes are rendered with a "Z" suffix, as pydantic does
+_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    """Render the values orjson does not support natively (response models, by alias)."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson.
+
+    Returning it from an endpoint bypasses the validation and encoding of the
+    endpoint's response model (still used for the documentation): the content
+    must already match it, e.g. dicts built from database rows.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+def fast_json(content: Any, response: Response) -> FastJSONResponse:
+    """Build a fast JSON response, keeping the headers set on the endpoint's response (e.g. validators)."""
+    return FastJSONResponse(content, headers=response.headers)
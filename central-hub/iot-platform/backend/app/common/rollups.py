@@ -0,0 +1,86 @@
+"""Metrics rollups maintenance (ROLLUP_INTERVAL buckets per plant)."""
+
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import BigInteger, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.common.constants import ROLLUP_INTERVAL
+from app.models.metrics import Metrics
+from app.models.metrics_rollup import MetricsRollup
+
+METRIC_COLUMNS = ("soil_moist", "humidity", "light", "temp")
+
+
+def rollup_bucket(timestamp: datetime) -> datetime:
+    """Get the start of the rollup bucket containing a timestamp."""
+    ts = int(timestamp.timestamp())
+    return datetime.fromtimestamp(ts - ts % ROLLUP_INTERVAL, tz=timezone.utc)
+
+
+def upsert_rollup(session: Session, plant_id: int, timestamp: datetime, values: dict[str, float]) -> None:
+    """Fold a single reading into its rollup bucket (not committed)."""
+    row = {"plant_id": plant_id, "bucket": rollup_bucket(timestamp), "count": 1}
+    for column in METRIC_COLUMNS:
+        row[f"{column}_sum"] = row[f"{column}_min"] = row[f"{column}_max"] = values[column]
+
+    stmt = insert(MetricsRollup).values(**row)
+    updates = {"count": MetricsRollup.count + 1}
+    for column in METRIC_COLUMNS:
+        updates[f"{column}_sum"] = getattr(MetricsRollup, f"{column}_sum") + getattr(stmt.excluded, f"{column}_sum")
+        updates[f"{column}_min"] = func.least(getattr(MetricsRollup, f"{column}_min"), getattr(stmt.excluded, f"{column}_min"))
+        updates[f"{column}_max"] = func.greatest(getattr(MetricsRollup, f"{column}_max"), getattr(stmt.excluded, f"{column}_max"))
+
+    session.execute(stmt.on_conflict_do_update(index_elements=["plant_id", "bucket"], set_=updates))
+
+
+def rebuild_rollups(
+    session: Session,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    plant_id: int | None = None,
+) -> int:
+    """
+    Recompute the rollup buckets overlapping [start, end) from the raw metrics (not committed).
+
+    The range is widened to whole buckets so that partial buckets are never written.
+
+    Args:
+        session (Session): Database session.
+        start (datetime | None): Start of the range (default: beginning of the data).
+        end (datetime | None): End of the range (default: end of the data).
+        plant_id (int | None): Only rebuild the buckets of this plant (default: all plants).
+
+    Returns:
+        int: Number of rollup buckets written.
+    """
+    epoch = func.extract("epoch", Metrics.timestamp)
+    bucket = func.to_timestamp(cast(func.floor(epoch / ROLLUP_INTERVAL), BigInteger) * ROLLUP_INTERVAL)
+
+    aggregates = [Metrics.plant_id, bucket.label("bucket"), func.count().label("count")]
+    for column in METRIC_COLUMNS:
+        metric = getattr(Metrics, column)
+        aggregates += [
+            func.sum(metric).label(f"{column}_sum"),
+            func.min(metric).label(f"{column}_min"),
+            func.max(metric).label(f"{column}_max"),
+        ]
+
+    query = select(*aggregates).group_by(Metrics.plant_id, literal_column("bucket"))
+    if plant_id is not None:
+        query = query.where(Metrics.plant_id == plant_id)
+    if start is not None:
+        query = query.where(Metrics.timestamp >= rollup_bucket(start))
+    if end is not None:
+        # Round the end up to the next bucket boundary
+        end_bucket = rollup_bucket(end)
+        if end_bucket < end:
+            end_bucket += timedelta(seconds=ROLLUP_INTERVAL)
+        query = query.where(Metrics.timestamp < end_bucket)
+
+    stmt = insert(MetricsRollup).from_select([c.name for c in aggregates], query)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["plant_id", "bucket"],
+        set_={c.name: getattr(stmt.excluded, c.name) for c in aggregates[2:]},
+    )
+    return session.execute(stmt).rowcount
@@ -0,0 +1,150 @@
+"""Vectorised time-series helpers (NumPy)."""
+
+import numpy as np
+
+
+def fill_gaps(epochs: np.ndarray, gap_threshold: int, interval: int) -> tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute where null slots must be inserted between consecutive measurements.
+
+    Whenever two measurements are more than `gap_threshold` seconds apart,
+    `(gap // interval) - 1` null slots are inserted after the first one, spaced
+    every `interval` seconds from it.
+
+    Args:
+        epochs (np.ndarray): Sorted measurement timestamps, in whole seconds (int64).
+        gap_threshold (int): Gap (seconds) above which an outage is assumed.
+        interval (int): Spacing (seconds) of the inserted null slots.
+
+    Returns:
+        tuple: (total length, output positions of the measurements,
+                output positions of the null slots, epochs of the null slots)
+    """
+    gaps = np.diff(epochs)
+    missing = np.where(gaps > gap_threshold, gaps // interval - 1, 0)
+
+    # Each measurement is shifted by the number of null slots inserted before it
+    shifts = np.concatenate(([0], np.cumsum(missing)))
+    real_positions = np.arange(len(epochs)) + shifts
+    total_missing = int(shifts[-1])
+
+    # Null slot k (1-based) of measurement i sits k positions / k intervals after it
+    owners = np.repeat(np.arange(len(gaps)), missing)
+    slot_numbers = np.arange(total_missing) - np.repeat(shifts[:-1], missing) + 1
+    null_positions = real_positions[owners] + slot_numbers
+    null_epochs = epochs[owners] + slot_numbers * interval
+
+    return len(epochs) + total_missing, real_positions, null_positions, null_epochs
+
+
+def round_column(values, ndigits: int) -> list:
+    """Round a column of values with Python's `round` (keeps None as None)."""
+    return [round(value, ndigits) if value is not None else None for value in values]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Select the points kept by the Largest-Triangle-Three-Buckets downsampling.
+
+    `y` may hold several series (one per column): each one is scaled to its own
+    range and their triangle areas are summed, so a single set of points is kept
+    for all of them.
+
+    Args:
+        x (np.ndarray): Sorted x values (e.g. epoch seconds), shape (n,).
+        y (np.ndarray): Series values, shape (n,) or (n, k).
+        threshold (int): Maximum number of points to keep.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Scale each series to [0, 1] so that none of them dominates the areas
+    y = y.reshape(n, -1).astype(float)
+    low = y.min(axis=0)
+    span = y.max(axis=0) - low
+    y = (y - low) / np.where(span > 0, span, 1.0)
+    x = x.astype(float)
+
+    # First and last points are always kept, the others are split into buckets
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+
+        # Third vertex: average of the next bucket
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean(axis=0)
+
+        # Pick the point of the bucket forming the largest triangle with the previous pick
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end])[:, None] * (avg_y - y[a])
+        ).sum(axis=1)
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+
+    return selected
+
+
+def fit_trends(
+    times: np.ndarray,
+    values: np.ndarray,
+    weights: np.ndarray,
+    breaks: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit weighted least-squares lines to many series at once.
+
+    Each series is only fitted after its last break, i.e. the last change of
+    more than `breaks` between two consecutive points (e.g. a watering), so
+    that the lines follow the current trend. Points of zero weight (padding)
+    are ignored.
+
+    Args:
+        times (np.ndarray): Point times (e.g. hours), shape (s, n).
+        values (np.ndarray): Point values, shape (s, n).
+        weights (np.ndarray): Point weights (e.g. number of readings), shape (s, n).
+        breaks (np.ndarray): Change starting a new segment, per series, shape (s,).
+
+    Returns:
+        tuple: (slopes, intercepts, coefficients of determination, points fitted),
+               shape (s,) each; NaN where fewer than 2 distinct times are fitted.
+    """
+    s, n = values.shape
+    present = weights > 0
+    if n == 0:
+        empty = np.full(s, np.nan)
+        return empty, empty.copy(), empty.copy(), np.zeros(s, dtype=np.int64)
+
+    # Compare each point with the previous present one (padding repeats it)
+    index = np.where(present, np.arange(n), -1)
+    previous = np.maximum.accumulate(index, axis=1)
+    filled = np.take_along_axis(values, np.maximum(previous, 0), axis=1)
+    jumps = present[:, 1:] & (previous[:, :-1] >= 0) & (np.abs(values[:, 1:] - filled[:, :-1]) > breaks[:, None])
+
+    # Keep the points from the last jump on
+    last_jump = np.where(jumps.any(axis=1), n - 1 - np.argmax(jumps[:, ::-1], axis=1), 0)
+    w = np.where(np.arange(n) >= last_jump[:, None], weights, 0.0).astype(float)
+    y = np.where(w > 0, values, 0.0)
+
+    total = w.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_mean = (w * times).sum(axis=1) / total
+        y_mean = (w * y).sum(axis=1) / total
+        dt = times - t_mean[:, None]
+        dy = y - y_mean[:, None]
+        s_tt = (w * dt * dt).sum(axis=1)
+        s_ty = (w * dt * dy).sum(axis=1)
+        s_yy = (w * dy * dy).sum(axis=1)
+        slopes = np.where(s_tt > 0, s_ty / s_tt, np.nan)
+        intercepts = y_mean - slopes * t_mean
+        r2 = np.where(s_yy > 0, s_ty * s_ty / (s_tt * s_yy), 1.0)
+    return slopes, intercepts, np.where(np.isnan(slopes), np.nan, r2), (w > 0).sum(axis=1)
@@ -8,10 +8,22 @@ from app.common.constants import MODULE_HB_TIMEOUT
 if TYPE_CHECKING:
     from app.models.module import Module
 
-def is_module_online(module: Module) -> bool:
-    """Check if module is online."""
+def is_module_online(module: Module, at: datetime | None = None) -> bool:
+    """Check if module is online (now, or at the given time)."""
     if not module.last_seen:
         return False
         
-    return (datetime.now(timezone.utc) - module.last_seen).total_seconds() <= MODULE_HB_TIMEOUT
+    elapsed = (at or datetime.now(timezone.utc)) - module.last_seen
+    return elapsed.total_seconds() <= MODULE_HB_TIMEOUT
 
+def as_utc(value: datetime) -> datetime:
+    """Interpret a naive datetime as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def as_epoch(value: datetime | float) -> float:
+    """Get the epoch seconds of a datetime (epoch seconds are returned as is)."""
+    return value.timestamp() if isinstance(value, datetime) else value
+
+def as_datetime(value: datetime | float) -> datetime:
+    """Get the UTC datetime of epoch seconds (datetimes are returned as is)."""
+    return value if isinstance(value, datetime) else datetime.fromtimestamp(value, tz=timezone.utc)
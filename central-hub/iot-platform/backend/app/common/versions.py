@@ -0,0 +1,168 @@
+"""Resource versions for conditional GETs (ETag / Last-Modified)."""
+
+import zlib
+from bisect import bisect_left
+from collections.abc import Hashable, Iterable
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response, status
+
+from app.common.constants import MODULE_HB_TIMEOUT
+from app.common.utils import as_utc
+
+# Version keys
+ENTITIES = "entities"  # Structural changes: plants, module coupling and connectivity
+READINGS = "readings"  # Any ingested reading (last metrics, module last seen)
+
+
+def plant_key(plant_id: int) -> tuple[str, int]:
+    """Version key of a single plant (its readings and details)."""
+    return ("plant", plant_id)
+
+
+class ResourceVersions:
+    """
+    In-memory resource versions, bumped by the write events and read by conditional GETs.
+
+    A version is the publication time of the event which last changed the key
+    (see app.common.event_bus), so that the processes which handled the same
+    events give the same ETags, whichever one a client revalidates against.
+    An event older than the current version (published concurrently, or by a
+    process with a late clock) moves it forward by a microsecond: the version
+    always changes, at worst the processes disagree until the next event.
+
+    Keys not changed since the process started are versioned by its start
+    time, raised to the same floor in every process when a process starts
+    (it cannot know the versions of the others).
+    """
+
+    def __init__(self) -> None:
+        self._started = self._floor = datetime.now(timezone.utc)
+        self._versions: dict[Hashable, tuple[datetime, datetime]] = {}  # Key -> (version, local modification time)
+
+    def bump(self, *keys: Hashable, at: datetime) -> None:
+        """
+        Change the version of the given keys.
+
+        Args:
+            keys (Hashable): Version keys changed by the event.
+            at (datetime): Publication time of the event.
+        """
+        now = datetime.now(timezone.utc)
+        for key in keys:
+            version, _ = self._versions.get(key, (self._floor, self._started))
+            self._versions[key] = (at if at > version else version + timedelta(microseconds=1), now)
+
+    def raise_floor(self, at: datetime) -> None:
+        """Raise all the versions to at least the given time (process start, resync), keeping the later ones."""
+        self._floor = max(self._floor, at)
+        for key, (version, modified) in self._versions.items():
+            self._versions[key] = (max(version, at), modified)
+
+    def validators(self, *keys: Hashable, variant: str = "") -> tuple[str, datetime | None]:
+        """
+        Get the (ETag, Last-Modified) of a resource depending on the given keys.
+
+        Args:
+            keys (Hashable): Version keys the resource depends on.
+            variant (str): Representation variant (e.g. query parameters).
+
+        Returns:
+            tuple: (weak ETag, last modification time, None for a variant: it also depends on more than the keys)
+        """
+        parts = []
+        last_modified = self._started
+        for key in keys:
+            version, modified = self._versions.get(key, (self._floor, self._started))
+            parts.append(f"{int(version.timestamp() * 1_000_000):x}")
+            last_modified = max(last_modified, modified)
+        if variant:
+            parts.append(f"{zlib.crc32(variant.encode()):08x}")
+            return f'W/"{"-".join(parts)}"', None
+        return f'W/"{"-".join(parts)}"', last_modified
+
+
+class ConnectivityExpiries:
+    """
+    Times at which the modules shown by a resource go offline, for its conditional GETs.
+
+    A module goes offline MODULE_HB_TIMEOUT seconds after it was last seen,
+    with no event changing the versions (until the next heartbeat sweep). The
+    expiry times of the modules of a resource are recorded with the ETag of its
+    last full response: while that ETag is unchanged, the number of expiries
+    passed identifies the connectivity shown, as a variant of the ETag.
+    """
+
+    def __init__(self) -> None:
+        self._expiries: dict[tuple[Hashable, ...], tuple[str, list[datetime]]] = {}
+
+    def variant(self, etag: str, *keys: Hashable, at: datetime | None = None) -> str | None:
+        """
+        Get the connectivity variant of a resource at a time (default: now).
+
+        Args:
+            etag (str): ETag of the versions of the resource.
+            keys (Hashable): Version keys the resource depends on.
+            at (datetime | None): Time of the connectivity.
+
+        Returns:
+            str | None: Variant, None if unknown (no full response since the versions changed).
+        """
+        recorded = self._expiries.get(keys)
+        if recorded is None or recorded[0] != etag:
+            return None
+        return f"online:{bisect_left(recorded[1], at or datetime.now(timezone.utc))}"
+
+    def record(
+        self, etag: str, *keys: Hashable, last_seen: Iterable[datetime | None], at: datetime
+    ) -> str:
+        """
+        Record the modules of a full response, built from the database at a time.
+
+        Returns:
+            str: Connectivity variant of the response.
+        """
+        timeout = timedelta(seconds=MODULE_HB_TIMEOUT)
+        expiries = sorted(as_utc(time) + timeout for time in last_seen if time is not None)
+        self._expiries[keys] = (etag, expiries)
+        return self.variant(etag, *keys, at=at)
+
+
+def not_modified(request: Request, response: Response, etag: str, last_modified: datetime | None) -> Response | None:
+    """
+    Set the validators on the response, and check the client's conditional headers.
+
+    Last-Modified has a one second resolution: it is only sent once the
+    resource has not changed for the rest of its second, so that a client copy
+    dated with it includes every change up to the end of that second.
+
+    Returns:
+        Response | None: A 304 response if the client copy is still fresh, else None.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None and last_modified.replace(microsecond=0) < datetime.now(timezone.utc).replace(microsecond=0):
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    # If-None-Match takes precedence over If-Modified-Since (weak comparison)
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        fresh = "*" in tags or etag.removeprefix("W/") in tags
+    elif if_modified_since is not None and last_modified is not None:
+        try:
+            fresh = last_modified < parsedate_to_datetime(if_modified_since) + timedelta(seconds=1)
+        except (TypeError, ValueError):
+            fresh = False
+    else:
+        fresh = False
+
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers) if fresh else None
+
+
+# Global resource versions instance
+versions = ResourceVersions()
+
+# Global module expiries of the resources showing the connectivity
+connectivity_expiries = ConnectivityExpiries()
@@ -1,9 +1,13 @@
 """Database configuration and session management - PostgreSQL Only."""
 
 import os
-from collections.abc import Generator
+import zlib
+from collections.abc import Generator, Iterator
+from contextlib import contextmanager
 from unittest.mock import Base
-from sqlalchemy import create_engine, select
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import create_engine, select, text
 from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 
 
@@ -15,6 +19,38 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def unpooled_connection(timeout: float | None = None) -> psycopg2.extensions.connection:
+    """
+    Open an autocommit connection to the database, outside of the pool (long-lived: listeners, locks).
+
+    Args:
+        timeout (float | None): Seconds the connection, each statement and each network write
+            may take (default: no limit).
+    """
+    args, kwargs = engine.dialect.create_connect_args(engine.url)
+    if timeout is not None:
+        milliseconds = int(timeout * 1000)
+        kwargs.update(
+            connect_timeout=max(2, round(timeout)),  # libpq: whole seconds, at least 2
+            options=f"{kwargs.get('options', '')} -c statement_timeout={milliseconds}".strip(),
+            tcp_user_timeout=milliseconds,
+        )
+    connection = psycopg2.connect(*args, **kwargs)
+    connection.autocommit = True
+    return connection
+
+@contextmanager
+def initialization_lock() -> Iterator[None]:
+    """Hold an advisory lock while initializing the database, so that the backend processes do it one at a time."""
+    connection = unpooled_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (zlib.crc32(b"database_initialization"),))
+        yield
+    finally:
+        # Closing the session releases the lock
+        connection.close()
+
 # Base class for declarative models
 class Base(DeclarativeBase):
     pass
@@ -24,6 +60,19 @@ def create_tables() -> None:
     """Create all database tables."""
     Base.metadata.create_all(engine)
 
+# Schema changes on existing tables, which create_all does not apply (must be idempotent)
+SCHEMA_MIGRATIONS = [
+    # Plants soft deletion
+    "ALTER TABLE plants ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE plants ALTER COLUMN module_id DROP NOT NULL",
+]
+
+def migrate_schema() -> None:
+    """Apply the schema migrations to the existing tables."""
+    with engine.begin() as connection:
+        for statement in SCHEMA_MIGRATIONS:
+            connection.execute(text(statement))
+
 def get_session() -> Generator[Session, None, None]:
     """Get database session."""
     session = SessionLocal()
@@ -87,5 +136,108 @@ def init_modules() -> None:
         for module in sample_modules:
             session.add(module)
         session.commit()
+    finally:
+        session.close()
+
+def init_rollups() -> None:
+    """Build the metrics rollups from the existing metrics if they have never been built."""
+    from app.common.rollups import rebuild_rollups
+    from app.models.metrics import Metrics
+    from app.models.metrics_rollup import MetricsRollup
+
+    session = SessionLocal()
+    try:
+        if session.execute(select(MetricsRollup)).scalars().first() is not None:
+            return
+        if session.execute(select(Metrics)).scalars().first() is None:
+            return
+
+        rebuild_rollups(session)
+        session.commit()
+    finally:
+        session.close()
+
+def init_latest_metrics() -> None:
+    """Create the latest metrics snapshots of the plants that have readings but no snapshot."""
+    from app.common.latest_metrics import backfill_latest_metrics
+
+    session = SessionLocal()
+    try:
+        backfill_latest_metrics(session)
+        session.commit()
+    finally:
+        session.close()
+
+def init_live_state() -> None:
+    """Load the live state of the plants and modules served to the WebSocket clients."""
+    from app.common.live_state import live_state
+
+    session = SessionLocal()
+    try:
+        live_state.load(session)
+    finally:
+        session.close()
+
+def init_daily_stats() -> None:
+    """Build the daily statistics of the plants from the existing metrics if they have never been built."""
+    from app.common.archive import archived_plant_ids
+    from app.common.daily_stats import rebuild_daily_stats
+    from app.models.metrics import Metrics
+    from app.models.plant import Plant
+    from app.models.plant_daily_stats import PlantDailyStats
+
+    session = SessionLocal()
+    try:
+        if session.execute(select(PlantDailyStats)).scalars().first() is not None:
+            return
+        if session.execute(select(Metrics)).scalars().first() is None and not archived_plant_ids():
+            return
+
+        for plant in session.execute(select(Plant).where(Plant.deleted_at.is_(None))).scalars().all():
+            rebuild_daily_stats(session, plant)
+            session.commit()
+    finally:
+        session.close()
+
+def check_metrics_storage() -> None:
+    """Check that the metrics table uses the METRICS_STORAGE schema (no data is migrated at startup)."""
+    from app.common.compact_metrics import stored_schema
+    from app.common.constants import METRICS_STORAGE
+
+    session = SessionLocal()
+    try:
+        schema = stored_schema(session)
+    finally:
+        session.close()
+    if schema != METRICS_STORAGE:
+        raise RuntimeError(
+            f"The metrics table uses the {schema} schema, not METRICS_STORAGE={METRICS_STORAGE} "
+            f"(migrate it with scripts/migrate_metrics_compact.py while the backend is stopped)"
+        )
+
+def init_metrics_partitions() -> None:
+    """Partition the metrics table if enabled, and create its upcoming partitions."""
+    from datetime import datetime, timezone
+    from app.common.constants import METRICS_PARTITIONING, METRICS_PARTITIONS_AHEAD
+    from app.common.partitions import (
+        convert_to_partitioned,
+        ensure_partitions,
+        is_partitioned,
+        lock_partitions,
+        partition_granularity,
+    )
+
+    session = SessionLocal()
+    try:
+        # One process at a time (the others find the table converted and the partitions created)
+        lock_partitions(session)
+        now = datetime.now(timezone.utc)
+        if not is_partitioned(session):
+            if not METRICS_PARTITIONING:
+                return
+            convert_to_partitioned(session, METRICS_PARTITIONING, now)
+
+        ensure_partitions(session, partition_granularity(), now, METRICS_PARTITIONS_AHEAD)
+        session.commit()
     finally:
         session.close()
\ No newline at end of file
@@ -6,12 +6,33 @@ import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import AsyncGenerator
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 load_dotenv()
 
-from app.database import create_tables, init_admin_user, init_modules, init_settings
+from app.auth.jwt import verify_jwt_user
+from app.common.constants import RESPONSE_GZIP_LEVEL, RESPONSE_GZIP_MIN_SIZE
+from app.common.event_bus import event_bus
+from app.common.events import publish_process_started
+from app.common.forecast import trend_forecaster
+from app.common.history_cache import history_cache
+from app.common.leader import leader_lock
+from app.database import (
+    check_metrics_storage,
+    create_tables,
+    init_admin_user,
+    init_daily_stats,
+    init_latest_metrics,
+    init_live_state,
+    init_metrics_partitions,
+    init_modules,
+    init_rollups,
+    init_settings,
+    initialization_lock,
+    migrate_schema,
+)
 from app.routers import (
     auth_router,
     ingestion_router,
@@ -19,8 +40,13 @@ from app.routers import (
     plants_router,
     settings_router,
 )
+from app.tasks.anomaly_checkpoint import anomaly_checkpointer
+from app.tasks.metrics_archive import metrics_archiver
+from app.tasks.metrics_partitions import metrics_partition_manager
+from app.tasks.metrics_retention import metrics_retention
 from app.tasks.module_heartbeat import module_heartbeat_checker
-from app.websocket import websocket_endpoint
+from app.tasks.plant_purge import plant_purger
+from app.websocket import websocket_endpoint, ws_manager
 
 
 # Load project metadata from pyproject.toml
@@ -35,25 +61,78 @@ PROJECT_DESCRIPTION = pyproject_data["project"]["description"]
 # App lifespan handler
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    # Create database tables
-    create_tables()
+    # Initialize the database (one backend process at a time)
+    with initialization_lock():
+        # Create database tables
+        create_tables()
+
+        # Apply the schema changes to existing tables
+        migrate_schema()
+
+        # Check the schema of the metrics table (see scripts/migrate_metrics_compact.py)
+        check_metrics_storage()
+
+        # Partition the metrics table (if enabled) and create its upcoming partitions
+        init_metrics_partitions()
+
+        # Initialize settings
+        init_settings()
+
+        # Initialize admin user from environment
+        init_admin_user()
+
+        # Initialize sample modules
+        init_modules()
+
+        # Build metrics rollups for existing data
+        init_rollups()
+
+        # Build the latest metrics snapshots for existing data
+        init_latest_metrics()
+
+        # Build the plants daily statistics for existing data
+        init_daily_stats()
 
-    # Initialize settings
-    init_settings()
+        # Load the live state of the plants and modules (WebSocket snapshots)
+        init_live_state()
 
-    # Initialize admin user from environment
-    init_admin_user()
+    # Connect the event bus between the backend processes, and align the resource versions of all of them
+    await event_bus.start()
+    await publish_process_started()
 
-    # Initialize sample modules
-    init_modules()
+    # Start the trend forecast worker pool
+    trend_forecaster.start()
+
+    # Load the anomaly detection states, and start their checkpoint
+    await anomaly_checkpointer.start()
 
     # Start heartbeat checker
     await module_heartbeat_checker.start()
 
+    # Start metrics partition manager
+    await metrics_partition_manager.start()
+
+    # Start metrics retention
+    await metrics_retention.start()
+
+    # Start metrics archive
+    await metrics_archiver.start()
+
+    # Start deleted plants purge
+    await plant_purger.start()
+
     yield
 
     # Shutdown
+    await plant_purger.stop()
+    await metrics_archiver.stop()
+    await metrics_retention.stop()
+    await metrics_partition_manager.stop()
     await module_heartbeat_checker.stop()
+    await anomaly_checkpointer.stop()
+    leader_lock.release()
+    trend_forecaster.stop()
+    await event_bus.stop()
 
 # Environment configuration
 env = os.getenv("ENV", "dev")
@@ -79,6 +158,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression of the large responses (history, lists, exports)
+if RESPONSE_GZIP_MIN_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=RESPONSE_GZIP_MIN_SIZE, compresslevel=RESPONSE_GZIP_LEVEL)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(modules_router)
@@ -98,3 +181,17 @@ async def root() -> dict:
         "description": app.description,
         "status": "healthy"
     }
+
+# Runtime statistics endpoint
+@app.get("/stats", dependencies=[Depends(verify_jwt_user)])
+async def stats() -> dict:
+    return {
+        "historyCache": history_cache.stats(),
+        "retention": metrics_retention.stats(),
+        "archive": metrics_archiver.stats(),
+        "anomalies": anomaly_checkpointer.stats(),
+        "forecast": trend_forecaster.stats(),
+        "websocket": ws_manager.stats(),
+        "eventBus": event_bus.stats(),
+        "heartbeat": module_heartbeat_checker.stats(),
+    }
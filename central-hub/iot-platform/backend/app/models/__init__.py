@@ -3,6 +3,10 @@
 from app.models.module import Module
 from app.models.plant import Plant
 from app.models.metrics import Metrics
+from app.models.metrics_rollup import MetricsRollup
+from app.models.plant_anomaly_state import PlantAnomalyState
+from app.models.plant_daily_stats import PlantDailyStats
+from app.models.plant_latest_metrics import PlantLatestMetrics
 from app.models.settings import Settings
 from app.models.user import User
 
@@ -11,5 +15,9 @@ __all__ = [
     "Module",
     "Plant",
     "Metrics",
+    "MetricsRollup",
+    "PlantAnomalyState",
+    "PlantDailyStats",
+    "PlantLatestMetrics",
     "Settings",
 ]
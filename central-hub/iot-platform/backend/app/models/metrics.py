@@ -1,30 +1,167 @@
 """Metrics model for storing plant measurements (time series)."""
 
-from sqlalchemy import CheckConstraint, Column, DateTime, Float, ForeignKey, Index, Integer
+from sqlalchemy import (
+    BigInteger,
+    CheckConstraint,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    PrimaryKeyConstraint,
+    SmallInteger,
+    Table,
+    cast,
+    func,
+)
+from sqlalchemy.ext.hybrid import hybrid_property
 
-from app.common.constants import SENSOR_THRESHOLDS
+from app.common.constants import METRICS_PARTITIONING, METRICS_STORAGE, SENSOR_THRESHOLDS
 from app.database import Base
 
+# Storage schemas of the metrics table (see scripts/migrate_metrics_compact.py)
+METRICS_STORAGES = ("float", "compact")
+if METRICS_STORAGE not in METRICS_STORAGES:
+    raise ValueError(f"Unknown METRICS_STORAGE {METRICS_STORAGE!r} (expected one of {', '.join(METRICS_STORAGES)})")
+
+# Fixed-point scale of the percentage and temperature columns (hundredths)
+VALUE_SCALE = 100
+
+# Metrics in the compact schema: (value, stored column, fixed-point scale, sensor)
+COMPACT_COLUMNS = (
+    ("soil_moist", "soil_moist_centi", VALUE_SCALE, "SOIL_MOIST"),
+    ("humidity", "humidity_centi", VALUE_SCALE, "HUMIDITY"),
+    ("light", "light_lux", 1, "LIGHT"),
+    ("temp", "temp_centi", VALUE_SCALE, "TEMP"),
+)
+
+
+def _stored_bounds(sensor: str, scale: int) -> tuple[int | float, int | float]:
+    """Get the (min, max) stored values of a sensor range at a fixed-point scale."""
+    return SENSOR_THRESHOLDS[sensor]["MIN"] * scale, SENSOR_THRESHOLDS[sensor]["MAX"] * scale
+
+
+def _bounds_check(column: str, sensor: str, scale: int = 1) -> CheckConstraint:
+    """Check constraint keeping a stored column within its sensor range."""
+    low, high = _stored_bounds(sensor, scale)
+    return CheckConstraint(f'{column} >= {low:g} AND {column} <= {high:g}', name=f'check_{column}_bounds')
 
-class Metrics(Base):
-    """Metrics database model (time series data)."""
 
-    __tablename__ = "metrics"
+def _partitioning(partitioned: bool) -> dict:
+    """Range partitioning by time (partitions are managed in app.common.partitions)."""
+    return {'postgresql_partition_by': 'RANGE (timestamp)'} if partitioned else {}
 
-    __table_args__ = (
-        CheckConstraint(f'soil_moist >= {SENSOR_THRESHOLDS["SOIL_MOIST"]["MIN"]} AND soil_moist <= {SENSOR_THRESHOLDS["SOIL_MOIST"]["MAX"]}', name='check_soil_moist_bounds'),
-        CheckConstraint(f'humidity >= {SENSOR_THRESHOLDS["HUMIDITY"]["MIN"]} AND humidity <= {SENSOR_THRESHOLDS["HUMIDITY"]["MAX"]}', name='check_humidity_bounds'),
-        CheckConstraint(f'light >= {SENSOR_THRESHOLDS["LIGHT"]["MIN"]} AND light <= {SENSOR_THRESHOLDS["LIGHT"]["MAX"]}', name='check_light_bounds'),
-        CheckConstraint(f'temp >= {SENSOR_THRESHOLDS["TEMP"]["MIN"]} AND temp <= {SENSOR_THRESHOLDS["TEMP"]["MAX"]}', name='check_temp_bounds'),
-        Index('ix_metrics_plant_timestamp', 'plant_id', 'timestamp')
+
+def float_table(metadata: MetaData, partitioned: bool) -> Table:
+    """Metrics table with a float column per metric ("float" storage)."""
+    return Table(
+        "metrics",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("plant_id", Integer, ForeignKey("plants.id"), index=True, nullable=False),
+        Column("soil_moist", Float, nullable=False),
+        Column("humidity", Float, nullable=False),
+        Column("light", Float, nullable=False),
+        Column("temp", Float, nullable=False),
+        # Part of the primary key, as required for a partitioned table
+        Column("timestamp", DateTime(timezone=True), primary_key=True, nullable=False),
+        *(_bounds_check(value, sensor) for value, _, _, sensor in COMPACT_COLUMNS),
+        Index('ix_metrics_plant_timestamp', 'plant_id', 'timestamp'),
+        **_partitioning(partitioned),
     )
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    plant_id = Column(Integer, ForeignKey("plants.id"), index=True, nullable=False)
 
-    soil_moist = Column(Float, nullable=False)
-    humidity = Column(Float, nullable=False)
-    light = Column(Float, nullable=False)
-    temp = Column(Float, nullable=False)
+def compact_table(metadata: MetaData, partitioned: bool) -> Table:
+    """
+    Metrics table in the compact schema ("compact" storage).
+
+    Rows are keyed and ordered by (plant_id, timestamp), and stored in narrow
+    columns: hundredths in smallints for the percentages and the temperature,
+    and whole lux in an integer for the light.
+    """
+    return Table(
+        "metrics",
+        metadata,
+        # Columns are ordered by decreasing alignment to avoid padding
+        Column("id", BigInteger, autoincrement=True, nullable=False),
+        Column("timestamp", DateTime(timezone=True), nullable=False),
+        Column("plant_id", Integer, ForeignKey("plants.id"), nullable=False),
+        Column("light_lux", Integer, nullable=False),
+        Column("soil_moist_centi", SmallInteger, nullable=False),
+        Column("humidity_centi", SmallInteger, nullable=False),
+        Column("temp_centi", SmallInteger, nullable=False),
+        PrimaryKeyConstraint('plant_id', 'timestamp', 'id', name='metrics_pkey'),
+        *(_bounds_check(column, sensor, scale) for _, column, scale, sensor in COMPACT_COLUMNS),
+        **_partitioning(partitioned),
+    )
+
+
+def scaled_value(name: str, column: str, scale: int, sensor: str) -> hybrid_property:
+    """
+    Expose a fixed-point column as a float value, both on instances and in SQL expressions.
+
+    Values written are rounded to the scale and clamped to the sensor range, as
+    the bounds check of the column requires.
+
+    Args:
+        name (str): Name of the value (label of the SQL expression).
+        column (str): Name of the mapped storage column.
+        scale (int): Fixed-point scale of the storage column.
+        sensor (str): Sensor of the value (SENSOR_THRESHOLDS key).
+
+    Returns:
+        hybrid_property: Attribute reading and writing the unscaled value.
+    """
+    low, high = _stored_bounds(sensor, scale)
+
+    def get_value(self) -> float | None:
+        stored = getattr(self, column)
+        return None if stored is None else stored / scale
+
+    def set_value(self, value: float) -> None:
+        setattr(self, column, int(min(max(round(value * scale), low), high)))
+
+    def value_expression(cls):
+        stored = cast(getattr(cls, column), Float)
+        return (stored / float(scale) if scale != 1 else stored).label(name)
+
+    return hybrid_property(get_value, set_value, expr=value_expression)
+
+
+class Metrics(Base):
+    """
+    Metrics database model (time series data).
+
+    The table uses the METRICS_STORAGE schema: a float column per metric, or
+    the compact one (see compact_table), whose float values are exposed
+    through the `soil_moist`, `humidity`, `light` and `temp` attributes, so
+    that queries and instances are the same with both.
+    """
+
+    if METRICS_STORAGE == "compact":
+        __table__ = compact_table(Base.metadata, bool(METRICS_PARTITIONING))
+
+        soil_moist = scaled_value("soil_moist", "soil_moist_centi", VALUE_SCALE, "SOIL_MOIST")
+        humidity = scaled_value("humidity", "humidity_centi", VALUE_SCALE, "HUMIDITY")
+        light = scaled_value("light", "light_lux", 1, "LIGHT")
+        temp = scaled_value("temp", "temp_centi", VALUE_SCALE, "TEMP")
+    else:
+        __table__ = float_table(Base.metadata, bool(METRICS_PARTITIONING))
+
+
+def fixed_point_values() -> dict:
+    """
+    Get the metrics values in the fixed-point columns of the compact schema (e.g. for the archive).
 
-    timestamp = Column(DateTime(timezone=True), nullable=False)
\ No newline at end of file
+    Returns:
+        dict: Compact column name -> SQL expression of its value (the stored column in compact storage).
+    """
+    if METRICS_STORAGE == "compact":
+        return {column: getattr(Metrics, column) for _, column, _, _ in COMPACT_COLUMNS}
+    types = compact_table(MetaData(), False).c
+    return {
+        column: cast(func.round(getattr(Metrics, value) * scale), types[column].type).label(column)
+        for value, column, scale, _ in COMPACT_COLUMNS
+    }
@@ -0,0 +1,32 @@
+"""Metrics rollup model (pre-aggregated time series)."""
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer
+
+from app.database import Base
+
+
+class MetricsRollup(Base):
+    """Metrics rollup database model (one row per plant and ROLLUP_INTERVAL bucket)."""
+
+    __tablename__ = "metrics_rollups"
+
+    plant_id = Column(Integer, ForeignKey("plants.id"), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Bucket start, aligned on ROLLUP_INTERVAL
+
+    count = Column(Integer, nullable=False)
+
+    soil_moist_sum = Column(Float, nullable=False)
+    soil_moist_min = Column(Float, nullable=False)
+    soil_moist_max = Column(Float, nullable=False)
+
+    humidity_sum = Column(Float, nullable=False)
+    humidity_min = Column(Float, nullable=False)
+    humidity_max = Column(Float, nullable=False)
+
+    light_sum = Column(Float, nullable=False)
+    light_min = Column(Float, nullable=False)
+    light_max = Column(Float, nullable=False)
+
+    temp_sum = Column(Float, nullable=False)
+    temp_min = Column(Float, nullable=False)
+    temp_max = Column(Float, nullable=False)
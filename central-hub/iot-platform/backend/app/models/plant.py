@@ -1,6 +1,6 @@
 """Plant model with inline thresholds."""
 
-from sqlalchemy import CheckConstraint, Column, Float, ForeignKey, Integer, String
+from sqlalchemy import CheckConstraint, Column, DateTime, Float, ForeignKey, Integer, String
 
 from app.common.constants import SENSOR_THRESHOLDS
 from app.database import Base
@@ -24,7 +24,7 @@ class Plant(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False)
-    module_id = Column(String(50), ForeignKey("modules.id"), unique=True, index=True, nullable=False)
+    module_id = Column(String(50), ForeignKey("modules.id"), unique=True, index=True, nullable=True)  # None once deleted
 
     # Soil moisture thresholds (percentage)
     min_soil_moist = Column(Float, nullable=False)
@@ -41,3 +41,6 @@ class Plant(Base):
     # Temperature thresholds (Celsius)
     min_temp = Column(Float, nullable=False)
     max_temp = Column(Float, nullable=False)
+
+    # Soft deletion (the plant and its metrics are purged in the background)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
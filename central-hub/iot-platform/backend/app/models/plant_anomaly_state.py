@@ -0,0 +1,28 @@
+"""Anomaly detection state model (checkpoint of the rolling statistics of each plant and metric)."""
+
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String
+
+from app.database import Base
+
+
+class PlantAnomalyState(Base):
+    """Anomaly detection state database model (one row per plant and metric, written periodically)."""
+
+    __tablename__ = "plant_anomaly_state"
+
+    plant_id = Column(Integer, ForeignKey("plants.id"), primary_key=True)
+    metric = Column(String(20), primary_key=True)  # One of the rollups METRIC_COLUMNS
+
+    count = Column(Integer, nullable=False)
+    mean = Column(Float, nullable=False)
+    variance = Column(Float, nullable=False)
+    rate_mean = Column(Float, nullable=False)  # Rate of change, per minute
+    rate_variance = Column(Float, nullable=False)
+
+    last_value = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)
+    repeats = Column(Integer, nullable=False)  # Consecutive readings equal to the last one
+
+    stuck = Column(Boolean, nullable=False)
+    dropout = Column(Boolean, nullable=False)
+    last_spike = Column(DateTime(timezone=True), nullable=True)
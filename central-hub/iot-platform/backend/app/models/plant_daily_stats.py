@@ -0,0 +1,35 @@
+"""Daily statistics model (per plant, UTC day and metric)."""
+
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.database import Base
+
+
+class PlantDailyStats(Base):
+    """
+    Daily statistics database model (one row per plant, UTC day and metric, updated at ingestion).
+
+    Rows hold streaming accumulators: the mean and standard deviation derive
+    from the count, sum and sum of squares, the percentiles from the histogram
+    (STATS_HISTOGRAM_BINS bins over the sensor range), and the time spent out
+    of the plant's thresholds from the time each reading was held.
+    """
+
+    __tablename__ = "plant_daily_stats"
+
+    plant_id = Column(Integer, ForeignKey("plants.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    metric = Column(String(20), primary_key=True)  # One of the rollups METRIC_COLUMNS
+
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    sum_sq = Column(Float, nullable=False)
+    min = Column(Float, nullable=True)  # None until the first reading of the day
+    max = Column(Float, nullable=True)
+    histogram = Column(ARRAY(Integer), nullable=False)
+
+    # Seconds the readings of the day were held (until the next one, capped), below and above the thresholds
+    seconds_covered = Column(Float, nullable=False)
+    seconds_below = Column(Float, nullable=False)
+    seconds_above = Column(Float, nullable=False)
@@ -0,0 +1,20 @@
+"""Latest metrics snapshot model (last reading of each plant)."""
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer
+
+from app.database import Base
+
+
+class PlantLatestMetrics(Base):
+    """Latest metrics database model (one row per plant, upserted at ingestion)."""
+
+    __tablename__ = "plant_latest_metrics"
+
+    plant_id = Column(Integer, ForeignKey("plants.id"), primary_key=True)
+
+    soil_moist = Column(Float, nullable=False)
+    humidity = Column(Float, nullable=False)
+    light = Column(Float, nullable=False)
+    temp = Column(Float, nullable=False)
+
+    timestamp = Column(DateTime(timezone=True), nullable=False)
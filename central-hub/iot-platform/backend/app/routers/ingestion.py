@@ -13,18 +13,42 @@ load_dotenv()
 
 from app.common.discord_utils import send_discord_message
 from app.common.email_utils import send_email
+from app.common.anomalies import Anomaly, anomaly_detector
+from app.common.daily_stats import record_reading
+from app.common.events import publish_module_online, publish_reading
+from app.common.latest_metrics import upsert_latest_metrics
+from app.common.rollups import METRIC_COLUMNS, upsert_rollup
 from app.auth.api_key import verify_api_key
 from app.database import get_session
 from app.models.module import Module
 from app.models.plant import Plant
 from app.models.metrics import Metrics
+from app.models.plant_latest_metrics import PlantLatestMetrics
 from app.schemas.metrics import MetricsAddRequest, MetricsResponse
 from app.models.settings import Settings
-from app.websocket import ws_manager
 from app.tasks.module_heartbeat import module_heartbeat_checker
 
 router = APIRouter(prefix="/ingestion", tags=["Ingestion"])
 
+# Anomaly alerts: metric -> (label, unit)
+ANOMALY_LABELS = {
+    "soil_moist": ("Soil Moisture", "%"),
+    "humidity": ("Air Humidity", "%"),
+    "light": ("Light", " lx"),
+    "temp": ("Temperature", "°C"),
+}
+
+
+def _describe_anomaly(anomaly: Anomaly) -> str:
+    """Describe an anomaly for the alerts."""
+    label, unit = ANOMALY_LABELS[anomaly.metric]
+    value, expected = f"{anomaly.value:g}{unit}", f"{anomaly.expected:.1f}{unit}"
+    if anomaly.kind == "SPIKE":
+        return f"{label}: sudden change to {value} (usual: ~{expected})"
+    if anomaly.kind == "STUCK":
+        return f"{label}: sensor stuck at {value}"
+    return f"{label}: sensor dropout, read {value} (usual: ~{expected})"
+
 
 @router.post("/", status_code=204)
 async def ingest_sensor_data(
@@ -59,14 +83,17 @@ async def ingest_sensor_data(
         )
         session.add(metric)
 
-        # Broadcast PLANT_METRICS
-        await ws_manager.emit_plant_metrics(plant.id, MetricsResponse(
-            timestamp=now,
-            soilMoist=request.soilMoist,
-            humidity=request.humidity,
-            light=request.light,
-            temp=request.temp,
-        ))
+        # Fold the reading into its rollup bucket (at the stored precision, as the raw metrics are re-aggregated)
+        values = {column: getattr(metric, column) for column in METRIC_COLUMNS}
+        upsert_rollup(session, plant.id, now, values)
+
+        # Fold it into the plant's daily statistics (the previous reading is held until this one)
+        latest = session.get(PlantLatestMetrics, plant.id)
+        previous = (latest.timestamp, {column: getattr(latest, column) for column in METRIC_COLUMNS}) if latest else None
+        record_reading(session, plant, now, values, previous)
+
+        # Record it as the plant's latest reading
+        upsert_latest_metrics(session, plant.id, now, values)
 
         # Check thresholds and broadcast alert if necessary
         alerts = []
@@ -138,9 +165,44 @@ async def ingest_sensor_data(
 
     session.commit()
 
-    # Notify heartbeat checker that module is online
-    module_heartbeat_checker.mark_module_online(module.id)
-    
-    # Broadcast MODULE_CONNECTIVITY
-    await ws_manager.emit_module_connectivity(module.id, True, module.last_seen)
+    # Detect anomalies on the rolling statistics of the readings, once the reading is stored
+    anomalies = anomaly_detector.update(plant.id, now, values) if plant else []
+    if anomalies:
+        settings = session.execute(select(Settings)).scalars().first()
+        descriptions = [_describe_anomaly(anomaly) for anomaly in anomalies]
+
+        if settings and settings.alerts_discord_enabled and settings.discord_webhook_url:
+            discord_msg = f"**⚠️ Anomaly for {plant.name}**\n"
+            discord_msg += "".join(f"{description}\n" for description in descriptions)
+            send_discord_message(settings.discord_webhook_url, discord_msg)
+
+        if settings and settings.alerts_email_enabled and settings.receiver_email:
+            email_body = f"Anomaly for {plant.name}\n"
+            email_body += "Unusual sensor readings:\n\n"
+            email_body += "".join(f"- {description}\n" for description in descriptions)
+            send_email(
+                sender_email=os.getenv("EMAIL"),
+                sender_password=os.getenv("EMAIL_PASSWORD"),
+                receiver_email=settings.receiver_email,
+                subject=f"⚠️ Anomaly for {plant.name}",
+                body=email_body
+            )
+
+    # Update the cached history of the plant and the resource versions, and broadcast PLANT_METRICS and ANOMALY
+    # (in every process)
+    if plant:
+        await publish_reading(plant.id, now, values, MetricsResponse(
+            timestamp=now,
+            soilMoist=request.soilMoist,
+            humidity=request.humidity,
+            light=request.light,
+            temp=request.temp,
+        ), anomalies)
+    else:
+        await publish_reading(None, now)
+
+    # Notify heartbeat checker that module is online, and broadcast MODULE_CONNECTIVITY if it was offline
+    # (the lastSeen of the online modules is broadcast by the heartbeat sweeps)
+    if module_heartbeat_checker.mark_module_online(module.id):
+        await publish_module_online(module.id, module.last_seen)
     
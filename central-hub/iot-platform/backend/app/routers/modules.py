@@ -1,36 +1,53 @@
 """Modules router."""
 
+from datetime import datetime, timezone
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import delete, select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.common.events import publish_entity_change
 from app.common.utils import is_module_online
+from app.common.versions import ENTITIES, READINGS, connectivity_expiries, not_modified, versions
 from app.auth.jwt import verify_jwt_user
 from app.database import get_session
 from app.models.module import Module
 from app.models.plant import Plant
 from app.models.user import User
-from app.models.metrics import Metrics
 from app.schemas.module import ModuleConnectivityResponse, ModuleResponse
-from app.websocket import ws_manager
+from app.tasks.plant_purge import plant_purger
 
 router = APIRouter(prefix="/modules", tags=["Modules"])
 
 
 @router.get("", response_model=list[ModuleResponse])
 async def get_modules(
+    request: Request,
+    response: Response,
     session: Annotated[Session, Depends(get_session)],
     _current_user: Annotated[User, Depends(verify_jwt_user)],
 ) -> list[ModuleResponse]:
     """Get all modules with their connectivity status."""
+    # Conditional GET (the connectivity also changes with time, see ConnectivityExpiries)
+    keys = (ENTITIES, READINGS)
+    etag, _ = versions.validators(*keys)
+    if (variant := connectivity_expiries.variant(etag, *keys)) is not None:
+        if cached := not_modified(request, response, *versions.validators(*keys, variant=variant)):
+            return cached
+
     # Use LEFT JOIN to fetch modules and their coupled plants in a single query
+    now = datetime.now(timezone.utc)
     query = (
         select(Module, Plant)
         .outerjoin(Plant, Module.id == Plant.module_id)
     )
     results = session.execute(query).all()
 
+    last_seen = (module.last_seen for module, _ in results)
+    variant = connectivity_expiries.record(etag, *keys, last_seen=last_seen, at=now)
+    if cached := not_modified(request, response, *versions.validators(*keys, variant=variant)):
+        return cached
+
     # Build response from joined results
     return [
         ModuleResponse(
@@ -38,7 +55,7 @@ async def get_modules(
             coupled=module.coupled,
             coupledPlantId=plant.id if plant else None,
             connectivity=ModuleConnectivityResponse(
-                isOnline=is_module_online(module),
+                isOnline=is_module_online(module, now),
                 lastSeen=module.last_seen,
             ),
         )
@@ -46,13 +63,13 @@ async def get_modules(
     ]
 
 
-@router.delete("/{module_id}/coupling", status_code=204)
+@router.delete("/{module_id}/coupling", status_code=status.HTTP_202_ACCEPTED)
 async def uncouple_module(
     module_id: str,
     session: Annotated[Session, Depends(get_session)],
     _current_user: Annotated[User, Depends(verify_jwt_user)],
-) -> None:
-    """Uncouple a module by removing its associated plant."""
+) -> Response:
+    """Uncouple a module by removing its associated plant (its metrics are purged in the background)."""
     # Get module
     module = session.execute(select(Module).where(Module.id == module_id)).scalars().first()
     if not module:
@@ -65,19 +82,23 @@ async def uncouple_module(
     # Get associated plant
     plant: Plant = session.execute(select(Plant).where(Plant.module_id == module_id)).scalars().first()
 
-    # Delete plant and its metrics if exists
-    session.execute(delete(Metrics).where(Metrics.plant_id == plant.id))
-    session.delete(plant)
+    # Mark the plant deleted and release the module
+    plant.deleted_at = datetime.now(timezone.utc)
+    plant.module_id = None
+    session.add(plant)
 
     # Uncouple module
     module.coupled = False
     session.add(module)
     session.commit()
 
+    # Purge the plant metrics in the background
+    plant_purger.schedule(plant.id)
+
     # Broadcast ENTITY_CHANGE for module update (now available)
-    await ws_manager.emit_entity_change("module", "update", module_id)
+    await publish_entity_change("module", "update", module_id)
 
-    # Broadcast ENTITY_CHANGE for plant deletion if existed
-    await ws_manager.emit_entity_change("plant", "delete", plant.id)
+    # Broadcast ENTITY_CHANGE for plant deletion if existed (dropping its cached history)
+    await publish_entity_change("plant", "delete", plant.id)
 
-    
\ No newline at end of file
+    return Response(status_code=status.HTTP_202_ACCEPTED, headers={"Location": f"/plants/{plant.id}/purge"})
@@ -1,17 +1,58 @@
 """Plants router."""
 
+import base64
+import binascii
+import heapq
+import math
+from itertools import dropwhile, groupby, islice
 from typing import Annotated, Literal
-from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
-from sqlalchemy import and_, delete, or_, select, func
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import BigInteger, Float, Integer, and_, cast, select, func, true, tuple_
+from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.orm import Session
 
 from app.auth.jwt import verify_jwt_user
-from app.common.utils import is_module_online
+from app.common.archive import archive_buckets, count_archive, read_archive
+from app.common.constants import (
+    HISTORY_DEFAULT_MAX_POINTS,
+    HISTORY_GAP_THRESHOLD,
+    HISTORY_LTTB_MAX_ROWS,
+    HISTORY_MAX_POINTS,
+    HISTORY_ROLLUP_OVERSAMPLING,
+    METRICS_PAGE_DEFAULT_SIZE,
+    METRICS_PAGE_MAX_SIZE,
+    ROLLUP_INTERVAL,
+    SPARKLINE_RANGE,
+    STATS_DEFAULT_DAYS,
+    STATS_DEFAULT_PERCENTILES,
+    STATS_MAX_DAYS,
+)
+from app.common.daily_stats import histogram_percentiles
+from app.common.events import publish_entity_change
+from app.common.export import EXPORT_FORMATS, export_metrics, parquet_available
+from app.common.forecast import PlantForecast, trend_forecaster
+from app.common.history_cache import history_cache
+from app.common.responses import fast_json
+from app.common.timeseries import fill_gaps, lttb, round_column
+from app.common.utils import as_datetime, as_epoch, as_utc, is_module_online
+from app.common.versions import (
+    ENTITIES,
+    READINGS,
+    connectivity_expiries,
+    not_modified,
+    plant_key,
+    versions,
+)
 from app.database import get_session
 from app.models.module import Module
 from app.models.plant import Plant
 from app.models.metrics import Metrics
+from app.models.metrics_rollup import MetricsRollup
+from app.models.plant_daily_stats import PlantDailyStats
+from app.models.plant_latest_metrics import PlantLatestMetrics
 from app.models.user import User
 from app.schemas.plant import (
     ModuleInfoResponse,
@@ -19,94 +60,208 @@ from app.schemas.plant import (
     PlantResponse,
     PlantUpdateRequest,
     ThresholdRangeResponse,
+    PlantPurgeResponse,
     ThresholdsResponse,
 )
-from app.schemas.metrics import MetricsResponse, HistoryResponse, HistoryMetaResponse, HistoryMetricsResponse
+from app.schemas.metrics import (
+    DailyStatsResponse,
+    HistoryColumnarResponse,
+    HistoryMetaResponse,
+    HistoryResponse,
+    MetricForecastResponse,
+    MetricStatsResponse,
+    MetricsPageResponse,
+    MetricsResponse,
+    MultiForecastResponse,
+    MultiHistoryColumnarResponse,
+    MultiHistoryResponse,
+    PlantForecastResponse,
+    PlantStatsResponse,
+    RawMetricsResponse,
+    StatsSummaryResponse,
+)
 from app.schemas.module import ModuleConnectivityResponse
-from app.websocket import ws_manager
+from app.tasks.plant_purge import plant_purger
 
 router = APIRouter(prefix="/plants", tags=["Plants"])
 
+# History columns of a plant without data
+EMPTY_HISTORY = {"timestamp": [], "soilMoist": [], "temp": [], "light": [], "humidity": []}
+
+# Statistics and forecast metrics: stored metric name -> response field
+STATS_METRICS = {
+    "soil_moist": "soilMoist",
+    "humidity": "humidity",
+    "light": "light",
+    "temp": "temp",
+}
+
+# History presets: (time range, bucket interval in seconds)
+HISTORY_RANGES = {
+    "hour": (timedelta(hours=1), 30),
+    "day": (timedelta(days=1), 600),
+    "week": (timedelta(days=7), 3600),
+    "month": (timedelta(days=30), 14400),
+}
+
 
 @router.get("", response_model=list[PlantResponse])
 async def get_plants(
+    request: Request,
+    response: Response,
     session: Annotated[Session, Depends(get_session)],
     _current_user: Annotated[User, Depends(verify_jwt_user)],
 ) -> list[PlantResponse]:
     """Get all plants."""
-    # Subquery to get max timestamp per plant
-    latest_timestamps_subq = (
-        select(Metrics.plant_id, func.max(Metrics.timestamp).label("max_timestamp"))
-        .group_by(Metrics.plant_id)
-        .subquery()
-    )
+    # Conditional GET (the connectivity also changes with time, see ConnectivityExpiries)
+    keys = (ENTITIES, READINGS)
+    etag, _ = versions.validators(*keys)
+    if (variant := connectivity_expiries.variant(etag, *keys)) is not None:
+        if cached := not_modified(request, response, *versions.validators(*keys, variant=variant)):
+            return cached
 
-    # Get all plants with their latest metrics in a single query
+    # Get all plants with their latest metrics snapshot in a single query
+    now = datetime.now(timezone.utc)
     query = (
-        select(Plant, Metrics, Module)
-        .outerjoin(latest_timestamps_subq, Plant.id == latest_timestamps_subq.c.plant_id)
-        .outerjoin(
-            Metrics,
-            (Metrics.plant_id == latest_timestamps_subq.c.plant_id)
-            & (Metrics.timestamp == latest_timestamps_subq.c.max_timestamp),
-        )
+        select(Plant, PlantLatestMetrics, Module)
+        .outerjoin(PlantLatestMetrics, PlantLatestMetrics.plant_id == Plant.id)
         .outerjoin(Module, Plant.module_id == Module.id)
+        .where(Plant.deleted_at.is_(None))
     )
     results = session.execute(query).all()
 
-    return [
-        PlantResponse(
-            id=plant.id,
-            name=plant.name,
-            module=ModuleInfoResponse(
-                id=plant.module_id,
-                connectivity=ModuleConnectivityResponse(
-                    isOnline=is_module_online(module),
-                    lastSeen=module.last_seen,
-                ),
-            ),
-            lastMetricsUpdate=(
-                MetricsResponse(
-                    timestamp=val.timestamp.isoformat(),
-                    soilMoist=val.soil_moist,
-                    humidity=val.humidity,
-                    light=val.light,
-                    temp=val.temp,
-                )
-                if val
-                else None
-            ),
-            thresholds=ThresholdsResponse(
-                soilMoist=ThresholdRangeResponse(
-                    min=plant.min_soil_moist, max=plant.max_soil_moist
-                ),
-                humidity=ThresholdRangeResponse(
-                    min=plant.min_humidity, max=plant.max_humidity
-                ),
-                light=ThresholdRangeResponse(
-                    min=plant.min_light, max=plant.max_light
-                ),
-                temp=ThresholdRangeResponse(min=plant.min_temp, max=plant.max_temp),
-            ),
-        )
-        for plant, val, module in results
-    ]
+    last_seen = (module.last_seen for _, _, module in results if module)
+    variant = connectivity_expiries.record(etag, *keys, last_seen=last_seen, at=now)
+    if cached := not_modified(request, response, *versions.validators(*keys, variant=variant)):
+        return cached
+
+    # Built from database rows: constructed without validation, and rendered by orjson
+    return fast_json(
+        [_plant_response(plant, val, module, now) for plant, val, module in results], response
+    )
+
+@router.get("/history", response_model=MultiHistoryResponse | MultiHistoryColumnarResponse)
+async def get_plants_history(
+    response: Response,
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+    plant_ids: list[int] | None = Query(default=None, alias="plantIds"),
+    time_range: Literal["hour", "day", "week", "month", "sparkline"] = Query(default="sparkline"),
+    history_format: Literal["points", "columnar"] = Query(default="points", alias="format"),
+) -> MultiHistoryResponse:
+    """
+    Get the history of several plants (default: all plants) in a single query.
+
+    The `sparkline` range covers the last 24 hours with one point per rollup
+    bucket, read from the precomputed rollups. With `format=columnar`, the data
+    of each plant is returned as one array per metric.
+    """
+    # Resolve the plants (unknown IDs are ignored)
+    query = select(Plant.id).where(Plant.deleted_at.is_(None)).order_by(Plant.id)
+    if plant_ids is not None:
+        query = query.where(Plant.id.in_(plant_ids))
+    plant_ids = list(session.execute(query).scalars().all())
+
+    now = datetime.now(timezone.utc)
+    if time_range == "sparkline":
+        time_delta, interval = timedelta(seconds=SPARKLINE_RANGE), ROLLUP_INTERVAL
+    else:
+        time_delta, interval = HISTORY_RANGES[time_range]
+    start_time = now - time_delta
+    now_ts = int(now.timestamp())
+    aligned_start = (int(start_time.timestamp()) // interval) * interval
+
+    if not plant_ids:
+        history = {}
+    elif time_range == "sparkline":
+        history = _rollup_history(session, plant_ids, aligned_start, now_ts)
+    elif time_range == "hour":
+        history = _raw_history(session, plant_ids, start_time, interval)
+    else:
+        history = _bucketed_history(session, plant_ids, aligned_start, now_ts, interval)
+
+    # Bucket averages are on a regular grid, actual measurements are not
+    step = interval if time_range != "hour" else None
+    meta = HistoryMetaResponse(
+        range=time_range, aggregation=f"{interval}s", from_time=start_time, to_time=now
+    )
+    return fast_json({
+        "meta": meta,
+        "plants": [
+            {
+                "plantId": plant_id,
+                "data": _history_data(history.get(plant_id, EMPTY_HISTORY), history_format, step),
+            }
+            for plant_id in plant_ids
+        ],
+    }, response)
+
+@router.get("/forecast", response_model=MultiForecastResponse)
+async def get_plants_forecast(
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+    plant_ids: list[int] | None = Query(default=None, alias="plantIds"),
+) -> MultiForecastResponse:
+    """
+    Get the trend forecast of several plants (default: all plants).
+
+    Each metric gets the slope of its recent trend (rollup buckets of the last
+    hours, since the last jump such as a watering) and, when it heads out of
+    the plant's thresholds, when it is expected to cross them.
+    """
+    # Resolve the plants (unknown IDs are ignored)
+    query = select(Plant).where(Plant.deleted_at.is_(None)).order_by(Plant.id)
+    if plant_ids is not None:
+        query = query.where(Plant.id.in_(plant_ids))
+    plants = list(session.execute(query).scalars().all())
+
+    forecasts = await trend_forecaster.forecast(session, plants)
+    now = datetime.now(timezone.utc)
+    return MultiForecastResponse(
+        plants=[_forecast_response(forecast, now) for forecast in forecasts]
+    )
+
+@router.get("/export")
+async def export_plants_metrics(
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+    plant_ids: list[int] | None = Query(default=None, alias="plantIds"),
+    export_format: Literal["csv", "ndjson", "parquet"] = Query(default="csv", alias="format"),
+    from_time: datetime | None = Query(default=None, alias="from"),
+    to_time: datetime | None = Query(default=None, alias="to"),
+) -> StreamingResponse:
+    """Export the raw metrics of several plants (default: all plants) over a window, streamed."""
+    # Resolve the plants (unknown IDs are ignored)
+    query = select(Plant.id).where(Plant.deleted_at.is_(None))
+    if plant_ids is not None:
+        query = query.where(Plant.id.in_(plant_ids))
+    plant_ids = list(session.execute(query).scalars().all())
+
+    return _export_response(export_format, plant_ids, from_time, to_time, "plants")
 
 @router.get("/{plant_id}", response_model=PlantResponse)
 async def get_plant(
     plant_id: int,
+    request: Request,
+    response: Response,
     session: Annotated[Session, Depends(get_session)],
     _current_user: Annotated[User, Depends(verify_jwt_user)],
 ) -> PlantResponse:
     """Get a specific plant by ID."""
-    # Get plant and latest metrics
+    # Conditional GET (the connectivity also changes with time, see ConnectivityExpiries)
+    keys = (ENTITIES, plant_key(plant_id))
+    etag, _ = versions.validators(*keys)
+    if (variant := connectivity_expiries.variant(etag, *keys)) is not None:
+        if cached := not_modified(request, response, *versions.validators(*keys, variant=variant)):
+            return cached
+
+    # Get plant and latest metrics snapshot
+    now = datetime.now(timezone.utc)
     query = (
-        select(Plant, Metrics, Module)
-        .outerjoin(Metrics, Metrics.plant_id == Plant.id)
+        select(Plant, PlantLatestMetrics, Module)
+        .outerjoin(PlantLatestMetrics, PlantLatestMetrics.plant_id == Plant.id)
         .outerjoin(Module, Plant.module_id == Module.id)
-        .where(Plant.id == plant_id)
-        .order_by(Metrics.timestamp.desc())
-        .limit(1)
+        .where(Plant.id == plant_id, Plant.deleted_at.is_(None))
     )
     result = session.execute(query).first()
 
@@ -115,35 +270,12 @@ async def get_plant(
 
     plant, latest_val_db, module = result
 
-    # Map to schema
-    latest_metrics = None
-    if latest_val_db:
-        latest_metrics = MetricsResponse(
-            timestamp=latest_val_db.timestamp.isoformat(),
-            soilMoist=latest_val_db.soil_moist,
-            humidity=latest_val_db.humidity,
-            light=latest_val_db.light,
-            temp=latest_val_db.temp,
-        )
+    last_seen = [module.last_seen] if module else []
+    variant = connectivity_expiries.record(etag, *keys, last_seen=last_seen, at=now)
+    if cached := not_modified(request, response, *versions.validators(*keys, variant=variant)):
+        return cached
 
-    return PlantResponse(
-        id=plant.id,
-        name=plant.name,
-        module=ModuleInfoResponse(
-            id=plant.module_id,
-            connectivity=ModuleConnectivityResponse(
-                isOnline=is_module_online(module) if module else False,
-                lastSeen=module.last_seen if module else None,
-            ),
-        ),
-        lastMetricsUpdate=latest_metrics,
-        thresholds=ThresholdsResponse(
-            soilMoist=ThresholdRangeResponse(min=plant.min_soil_moist, max=plant.max_soil_moist),
-            humidity=ThresholdRangeResponse(min=plant.min_humidity, max=plant.max_humidity),
-            light=ThresholdRangeResponse(min=plant.min_light, max=plant.max_light),
-            temp=ThresholdRangeResponse(min=plant.min_temp, max=plant.max_temp),
-        ),
-    )
+    return fast_json(_plant_response(plant, latest_val_db, module, now), response)
 
 @router.post("", status_code=status.HTTP_201_CREATED)
 async def create_plant(
@@ -181,10 +313,10 @@ async def create_plant(
     session.refresh(plant)
 
     # Broadcast ENTITY_CHANGE for plant creation
-    await ws_manager.emit_entity_change("plant", "create", plant.id)
+    await publish_entity_change("plant", "create", plant.id)
 
     # Broadcast ENTITY_CHANGE for module update (marked as coupled)
-    await ws_manager.emit_entity_change("module", "update", request.moduleId)
+    await publish_entity_change("module", "update", request.moduleId)
 
     return Response(status_code=status.HTTP_201_CREATED, headers={"Location": f"/plants/{plant.id}"})
 
@@ -197,7 +329,9 @@ async def update_plant(
 ) -> None:
     """Update a plant's details."""
     # Get plant
-    plant = session.execute(select(Plant).where(Plant.id == plant_id)).scalars().first()
+    plant = session.execute(
+        select(Plant).where(Plant.id == plant_id, Plant.deleted_at.is_(None))
+    ).scalars().first()
     if not plant:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plant not found")
 
@@ -240,174 +374,819 @@ async def update_plant(
     session.commit()
     session.refresh(plant)
 
-    # Broadcast ENTITY_CHANGE for plant update
-    await ws_manager.emit_entity_change("plant", "update", plant.id)
+    # Broadcast ENTITY_CHANGE for plant update (a new module starts new anomaly detection states)
+    await publish_entity_change("plant", "update", plant.id, module_changed=bool(module_changed))
 
     # If module changed, broadcast ENTITY_CHANGE for both old and new modules
     if module_changed:
         # Old module (now available)
-        await ws_manager.emit_entity_change("module", "update", old_module_id)
+        await publish_entity_change("module", "update", old_module_id)
         # New module (now coupled)
-        await ws_manager.emit_entity_change("module", "update", request.moduleId)
+        await publish_entity_change("module", "update", request.moduleId)
 
-    
-@router.delete("/{plant_id}", status_code=204)
+
+@router.delete("/{plant_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_plant(
     plant_id: int,
     session: Annotated[Session, Depends(get_session)],
     _current_user: Annotated[User, Depends(verify_jwt_user)],
-) -> None:
-    """Delete a plant."""
+) -> Response:
+    """Delete a plant (its metrics are purged in the background)."""
     # Get plant
-    plant = session.execute(select(Plant).where(Plant.id == plant_id)).scalars().first()
+    plant = session.execute(
+        select(Plant).where(Plant.id == plant_id, Plant.deleted_at.is_(None))
+    ).scalars().first()
     if not plant:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plant not found")
 
     # Save module ID before deletion
     coupled_module_id = plant.module_id
 
-    # Delete metrics
-    session.execute(delete(Metrics).where(Metrics.plant_id == plant.id))
-    session.delete(plant)
-    session.commit()
+    # Mark the plant deleted and release its module
+    plant.deleted_at = datetime.now(timezone.utc)
+    plant.module_id = None
+    session.add(plant)
 
     # Uncouple module
     module = session.execute(select(Module).where(Module.id == coupled_module_id)).scalars().first()
     if module:
         module.coupled = False
         session.add(module)
-        session.commit()
+    session.commit()
 
-    # Broadcast ENTITY_CHANGE for plant deletion
-    await ws_manager.emit_entity_change("plant", "delete", plant_id)
+    # Broadcast ENTITY_CHANGE for plant deletion (dropping its cached history, anomaly detection
+    # states and forecast, and purging its metrics in the background)
+    await publish_entity_change("plant", "delete", plant_id)
 
     # Broadcast ENTITY_CHANGE for module update (now available)
-    await ws_manager.emit_entity_change("module", "update", coupled_module_id)
+    await publish_entity_change("module", "update", coupled_module_id)
+
+    return Response(
+        status_code=status.HTTP_202_ACCEPTED, headers={"Location": f"/plants/{plant_id}/purge"}
+    )
 
-@router.get("/{plant_id}/history", response_model=HistoryResponse)
+@router.get("/{plant_id}/purge", response_model=PlantPurgeResponse)
+async def get_plant_purge(
+    plant_id: int,
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+) -> PlantPurgeResponse:
+    """Get the progress of the background purge of a deleted plant."""
+    progress = plant_purger.progress(plant_id)
+    if progress is None:
+        # Deleted before a restart, and not picked up yet
+        deleted = session.execute(
+            select(Plant.id).where(Plant.id == plant_id, Plant.deleted_at.is_not(None))
+        ).first()
+        if deleted is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="No deletion found for this plant"
+            )
+        return PlantPurgeResponse(plantId=plant_id, status="pending")
+
+    return PlantPurgeResponse(
+        plantId=plant_id,
+        status=progress.status,
+        totalMetrics=progress.total_metrics,
+        deletedMetrics=progress.deleted_metrics,
+    )
+
+@router.get("/{plant_id}/export")
+async def export_plant_metrics(
+    plant_id: int,
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+    export_format: Literal["csv", "ndjson", "parquet"] = Query(default="csv", alias="format"),
+    from_time: datetime | None = Query(default=None, alias="from"),
+    to_time: datetime | None = Query(default=None, alias="to"),
+) -> StreamingResponse:
+    """Export the raw metrics of a plant over a window, streamed."""
+    active = select(Plant.id).where(Plant.id == plant_id, Plant.deleted_at.is_(None))
+    if session.execute(active).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plant not found")
+
+    return _export_response(export_format, [plant_id], from_time, to_time, f"plant-{plant_id}")
+
+@router.get("/{plant_id}/metrics", response_model=MetricsPageResponse)
+async def get_plant_metrics(
+    plant_id: int,
+    request: Request,
+    response: Response,
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+    from_time: datetime | None = Query(default=None, alias="from"),
+    to_time: datetime | None = Query(default=None, alias="to"),
+    limit: int = Query(default=METRICS_PAGE_DEFAULT_SIZE, ge=1, le=METRICS_PAGE_MAX_SIZE),
+    cursor: str | None = Query(default=None),
+) -> MetricsPageResponse:
+    """
+    Get the stored metrics rows of a plant, oldest first, one page at a time.
+
+    Pages are keyed on (timestamp, id): pass the returned `nextCursor` as
+    `cursor` to get the next page, which costs the same whatever its depth.
+    """
+    # Conditional GET (the rows only change with the plant readings)
+    etag, last_modified = versions.validators(
+        plant_key(plant_id), variant=str(request.query_params)
+    )
+    if cached := not_modified(request, response, etag, last_modified):
+        return cached
+
+    active = select(Plant.id).where(Plant.id == plant_id, Plant.deleted_at.is_(None))
+    if session.execute(active).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plant not found")
+
+    from_time = as_utc(from_time) if from_time is not None else None
+    to_time = as_utc(to_time) if to_time is not None else None
+    query = (
+        select(
+            Metrics.timestamp, Metrics.id,
+            Metrics.soil_moist, Metrics.humidity, Metrics.light, Metrics.temp,
+        )
+        .where(Metrics.plant_id == plant_id)
+        .order_by(Metrics.timestamp, Metrics.id)
+        .limit(limit + 1)
+    )
+    if from_time is not None:
+        query = query.where(Metrics.timestamp >= from_time)
+    if to_time is not None:
+        query = query.where(Metrics.timestamp <= to_time)
+    if cursor is not None:
+        after = _decode_metrics_cursor(cursor)
+        # The plain range condition lets the (plant_id, timestamp) index seek to the cursor
+        query = query.where(
+            Metrics.timestamp >= after[0],
+            tuple_(Metrics.timestamp, Metrics.id) > tuple_(*after),
+        )
+        from_time = max(from_time, after[0]) if from_time is not None else after[0]
+
+    # Archived rows come first, the database ones are merged in (the key orders both)
+    archived = read_archive(plant_id, from_time, to_time)
+    if cursor is not None:
+        archived = dropwhile(lambda row: row[:2] <= after, archived)
+    merged = heapq.merge(archived, session.execute(query), key=lambda row: row[:2])
+    rows = list(islice(merged, limit + 1))
+    next_cursor = _encode_metrics_cursor(*rows[limit - 1][:2]) if len(rows) > limit else None
+
+    return MetricsPageResponse(
+        data=[
+            RawMetricsResponse(
+                id=row_id,
+                timestamp=timestamp,
+                soilMoist=soil_moist,
+                humidity=humidity,
+                light=light,
+                temp=temp,
+            )
+            for timestamp, row_id, soil_moist, humidity, light, temp in rows[:limit]
+        ],
+        nextCursor=next_cursor,
+    )
+
+@router.get("/{plant_id}/history", response_model=HistoryResponse | HistoryColumnarResponse)
 async def get_plant_history(
     plant_id: int,
+    request: Request,
+    response: Response,
     session: Annotated[Session, Depends(get_session)],
     time_range : Literal["hour", "day", "week", "month"] = Query(default="hour"),
+    from_time: datetime | None = Query(default=None, alias="from"),
+    to_time: datetime | None = Query(default=None, alias="to"),
+    max_points: int = Query(
+        default=HISTORY_DEFAULT_MAX_POINTS, alias="maxPoints", ge=3, le=HISTORY_MAX_POINTS
+    ),
+    history_format: Literal["points", "columnar"] = Query(default="points", alias="format"),
 ) -> HistoryResponse:
-    """Get plant metrics history with time-series bucketing."""
-    
+    """
+    Get plant metrics history with time-series bucketing.
+
+    When `from` is given, the `time_range` preset is ignored and the `from`/`to`
+    window (default `to`: now) is downsampled to at most `maxPoints` points.
+
+    With `format=columnar`, the data is returned as one array per metric, with
+    either the start and step of the points (regular buckets) or their
+    timestamps (actual measurements and downsampled windows), in epoch seconds.
+    """
+    if from_time is not None:
+        # Conditional GET (the window only changes with the plant readings)
+        etag, last_modified = versions.validators(
+        plant_key(plant_id), variant=str(request.query_params)
+    )
+        if cached := not_modified(request, response, etag, last_modified):
+            return cached
+        meta, columns = _get_plant_history_window(session, plant_id, from_time, to_time, max_points)
+        return fast_json({"meta": meta, "data": _history_data(columns, history_format)}, response)
+
     now = datetime.now(timezone.utc)
-    config = {
-        "hour": (timedelta(hours=1), 30),
-        "day": (timedelta(days=1), 600),
-        "week": (timedelta(days=7), 3600),
-        "month": (timedelta(days=30), 14400),
-    }
-    
-    time_delta, interval = config[time_range ]
+    time_delta, interval = HISTORY_RANGES[time_range]
     start_time = now - time_delta
     start_ts = int(start_time.timestamp())
     now_ts = int(now.timestamp())
     aligned_start = (start_ts // interval) * interval
 
+    # Conditional GET (the buckets also move with time)
+    variant = f"{time_range}:{aligned_start}:{history_format}"
+    etag, last_modified = versions.validators(plant_key(plant_id), variant=variant)
+    if cached := not_modified(request, response, etag, last_modified):
+        return cached
+
+    meta = HistoryMetaResponse(
+        range=time_range, aggregation=f"{interval}s", from_time=start_time, to_time=now
+    )
+
+    # Bucket averages are on a regular grid, actual measurements are not
+    step = interval if time_range != "hour" else None
+
+    # Served from the cache while the bucket is current (kept up to date by ingestion)
+    cached = history_cache.get(plant_id, time_range, aligned_start, start_time)
+    if cached is not None:
+        data = _history_data(cached, history_format, step)
+        return fast_json({"meta": meta, "data": data}, response)
+
     # Special case: hour range with adaptive rhythm (preserves real timestamps)
-    if time_range  == "hour":
-        # Retrieve all actual measurements, ordered
-        measurements = session.execute(
-            select(
-                Metrics.timestamp,
-                Metrics.soil_moist,
-                Metrics.temp,
-                Metrics.light,
-                Metrics.humidity
-            )
-            .where(Metrics.plant_id == plant_id, Metrics.timestamp >= start_time)
-            .order_by(Metrics.timestamp)
-        ).all()
-        
-        if not measurements:
-            return HistoryResponse(
-                meta=HistoryMetaResponse(range=time_range, aggregation="30s", from_time=start_time, to_time=now),
-                data=[]
+    if time_range == "hour":
+        history = _raw_history(session, [plant_id], start_time, interval)
+        columns = history.get(plant_id, EMPTY_HISTORY)
+        history_cache.put(plant_id, time_range, aligned_start, interval, columns, raw=True)
+        data = _history_data(columns, history_format, step)
+        return fast_json({"meta": meta, "data": data}, response)
+
+    # General case: fixed bucket aggregation (day/week/month), read from the same snapshot as
+    # the totals below
+    session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    columns = _bucketed_history(session, [plant_id], aligned_start, now_ts, interval)[plant_id]
+
+    # Totals of the current bucket, so that new readings can update its average in the cache
+    last_timestamp, last_count, *last_sums = session.execute(
+        select(
+            func.max(Metrics.timestamp),
+            func.count(),
+            func.coalesce(func.sum(Metrics.soil_moist), 0.0),
+            func.coalesce(func.sum(Metrics.temp), 0.0),
+            func.coalesce(func.sum(Metrics.light), 0.0),
+            func.coalesce(func.sum(Metrics.humidity), 0.0)
+        )
+        .where(
+            Metrics.plant_id == plant_id,
+            Metrics.timestamp >= datetime.fromtimestamp(now_ts - now_ts % interval, tz=timezone.utc)
+        )
+    ).one()
+    history_cache.put(
+        plant_id, time_range, aligned_start, interval, columns,
+        raw=False, last_count=last_count, last_sums=last_sums, last_timestamp=last_timestamp,
+    )
+    return fast_json({"meta": meta, "data": _history_data(columns, history_format, step)}, response)
+
+@router.get("/{plant_id}/forecast", response_model=PlantForecastResponse)
+async def get_plant_forecast(
+    plant_id: int,
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+) -> PlantForecastResponse:
+    """Get the trend forecast of a plant (see GET /plants/forecast)."""
+    plant = session.execute(
+        select(Plant).where(Plant.id == plant_id, Plant.deleted_at.is_(None))
+    ).scalars().first()
+    if not plant:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plant not found")
+
+    [forecast] = await trend_forecaster.forecast(session, [plant])
+    return _forecast_response(forecast, datetime.now(timezone.utc))
+
+@router.get("/{plant_id}/stats", response_model=PlantStatsResponse)
+async def get_plant_stats(
+    plant_id: int,
+    request: Request,
+    response: Response,
+    session: Annotated[Session, Depends(get_session)],
+    _current_user: Annotated[User, Depends(verify_jwt_user)],
+    from_day: date | None = Query(default=None, alias="from"),
+    to_day: date | None = Query(default=None, alias="to"),
+    percentiles: list[float] | None = Query(default=None),
+) -> PlantStatsResponse:
+    """
+    Get the daily statistics of a plant's metrics over a range of UTC days.
+
+    The range defaults to the last 7 days.
+
+    Each day and the whole range get, per metric, the min/max/mean/standard
+    deviation, the requested `percentiles` (estimated from a histogram) and the
+    time spent below, above and within the plant's thresholds. They are read
+    from per-day accumulators maintained at ingestion, a few rows per day.
+    """
+    to_day = to_day or datetime.now(timezone.utc).date()
+    from_day = from_day or to_day - timedelta(days=STATS_DEFAULT_DAYS - 1)
+    percentiles = percentiles or list(STATS_DEFAULT_PERCENTILES)
+    if from_day > to_day:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must not be after 'to'"
+        )
+    if (to_day - from_day).days >= STATS_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range must not exceed {STATS_MAX_DAYS} days",
+        )
+    if not all(0 <= percentile <= 100 for percentile in percentiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Percentiles must be between 0 and 100"
+        )
+
+    # Conditional GET (the statistics only change with the plant readings)
+    variant = f"{request.query_params}:{from_day}:{to_day}"
+    etag, last_modified = versions.validators(plant_key(plant_id), variant=variant)
+    if cached := not_modified(request, response, etag, last_modified):
+        return cached
+
+    active = select(Plant.id).where(Plant.id == plant_id, Plant.deleted_at.is_(None))
+    if session.execute(active).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plant not found")
+
+    rows = session.execute(
+        select(PlantDailyStats)
+        .where(
+            PlantDailyStats.plant_id == plant_id,
+            PlantDailyStats.day >= from_day,
+            PlantDailyStats.day <= to_day,
+        )
+        .order_by(PlantDailyStats.day)
+    ).scalars().all()
+
+    days = []
+    for day, day_rows in groupby(rows, key=lambda row: row.day):
+        by_metric = {row.metric: [row] for row in day_rows}
+        days.append(DailyStatsResponse(day=day, **_metrics_stats(by_metric, percentiles)))
+    by_metric = {column: [row for row in rows if row.metric == column] for column in STATS_METRICS}
+
+    return PlantStatsResponse(
+        plantId=plant_id,
+        from_day=from_day,
+        to_day=to_day,
+        summary=StatsSummaryResponse(**_metrics_stats(by_metric, percentiles)),
+        days=days,
+    )
+
+
+def _plant_response(
+    plant: Plant, latest: PlantLatestMetrics | None, module: Module | None, now: datetime
+) -> PlantResponse:
+    """Build the response of a plant from its database rows, constructed without validation."""
+    return PlantResponse.model_construct(
+        id=plant.id,
+        name=plant.name,
+        module=ModuleInfoResponse.model_construct(
+            id=plant.module_id,
+            connectivity=ModuleConnectivityResponse.model_construct(
+                isOnline=is_module_online(module, now) if module else False,
+                lastSeen=module.last_seen if module else None,
+            ),
+        ),
+        lastMetricsUpdate=(
+            MetricsResponse.model_construct(
+                timestamp=latest.timestamp,
+                soilMoist=latest.soil_moist,
+                humidity=latest.humidity,
+                light=latest.light,
+                temp=latest.temp,
             )
-        
-        # Build the data by detecting gaps
-        result_data = []
-        
-        for i, row in enumerate(measurements):
-            # Add the current measurement
-            result_data.append(
-                HistoryMetricsResponse(
-                    timestamp=row.timestamp,
-                    soilMoist=round(row.soil_moist, 2) if row.soil_moist is not None else None,
-                    temp=round(row.temp, 2) if row.temp is not None else None,
-                    light=round(row.light, 0) if row.light is not None else None,
-                    humidity=round(row.humidity, 2) if row.humidity is not None else None
-                )
+            if latest
+            else None
+        ),
+        thresholds=ThresholdsResponse.model_construct(
+            soilMoist=ThresholdRangeResponse.model_construct(
+                min=plant.min_soil_moist, max=plant.max_soil_moist
+            ),
+            humidity=ThresholdRangeResponse.model_construct(
+                min=plant.min_humidity, max=plant.max_humidity
+            ),
+            light=ThresholdRangeResponse.model_construct(min=plant.min_light, max=plant.max_light),
+            temp=ThresholdRangeResponse.model_construct(min=plant.min_temp, max=plant.max_temp),
+        ),
+    )
+
+
+def _forecast_response(forecast: PlantForecast, now: datetime) -> PlantForecastResponse:
+    """Build the response of a cached plant forecast (the time left runs from now)."""
+    metrics = {}
+    for column, field in STATS_METRICS.items():
+        metric = forecast.metrics.get(column)
+        if metric is None:
+            continue
+        metrics[field] = MetricForecastResponse(
+            current=round(metric.current, 2),
+            status=metric.status,
+            points=metric.points,
+            slopePerHour=round(metric.slope, 4) if metric.slope is not None else None,
+            r2=round(metric.r2, 3) if metric.r2 is not None else None,
+            trend=metric.trend,
+            threshold=metric.threshold,
+            reachedAt=metric.reached_at,
+            hoursToThreshold=(
+                round(max((metric.reached_at - now).total_seconds(), 0.0) / 3600, 1)
+                if metric.reached_at is not None else None
+            ),
+        )
+    return PlantForecastResponse(
+        plantId=forecast.plant_id, computedAt=forecast.computed_at, **metrics
+    )
+
+
+def _metrics_stats(
+    rows: dict[str, list[PlantDailyStats]], percentiles: list[float]
+) -> dict[str, MetricStatsResponse]:
+    """Combine the daily statistics rows of each metric (response field -> statistics)."""
+    return {
+        field: _metric_stats(column, rows.get(column, []), percentiles)
+        for column, field in STATS_METRICS.items()
+    }
+
+
+def _metric_stats(
+    metric: str, rows: list[PlantDailyStats], percentiles: list[float]
+) -> MetricStatsResponse:
+    """Combine the daily statistics rows of a metric (accumulators add up)."""
+    count = sum(row.count for row in rows)
+    covered = sum(row.seconds_covered for row in rows)
+    below = sum(row.seconds_below for row in rows)
+    above = sum(row.seconds_above for row in rows)
+    stats = MetricStatsResponse(
+        count=count,
+        percentiles={},
+        secondsBelow=below,
+        secondsAbove=above,
+        secondsInRange=max(covered - below - above, 0.0),
+    )
+    if count == 0:
+        return stats
+
+    total = sum(row.sum for row in rows)
+    total_sq = sum(row.sum_sq for row in rows)
+    stats.min = min(row.min for row in rows if row.min is not None)
+    stats.max = max(row.max for row in rows if row.max is not None)
+    stats.mean = round(total / count, 2)
+    # Sample standard deviation
+    variance = max(total_sq - total * total / count, 0.0) / (count - 1) if count > 1 else 0.0
+    stats.stddev = round(math.sqrt(variance), 2)
+
+    histogram = np.sum([row.histogram for row in rows], axis=0)
+    estimates = histogram_percentiles(metric, histogram, stats.min, stats.max, percentiles)
+    stats.percentiles = {
+        f"p{percentile:g}": round(value, 2) for percentile, value in zip(percentiles, estimates)
+    }
+    return stats
+
+
+def _history_columns(timestamps, soil_moist, temp, light, humidity) -> dict[str, list]:
+    """Gather history columns (timestamps as datetimes or epoch seconds), rounded as usual."""
+    return {
+        "timestamp": list(timestamps),
+        "soilMoist": round_column(soil_moist, 2),
+        "temp": round_column(temp, 2),
+        "light": round_column(light, 0),
+        "humidity": round_column(humidity, 2),
+    }
+
+
+def _history_data(
+    columns: dict[str, list], history_format: str, step: int | None = None
+) -> list[dict] | dict:
+    """
+    Lay out history columns in a response format.
+
+    Args:
+        columns (dict): History columns, as built by _history_columns.
+        history_format (str): "points" (HistoryMetricsResponse list) or "columnar"
+            (HistoryColumnsResponse).
+        step (int | None): Seconds between two points on a regular grid, None for irregular
+            points.
+    """
+    if history_format == "points":
+        return [
+            {"timestamp": as_datetime(t), "soilMoist": s, "temp": tp, "light": li, "humidity": h}
+            for t, s, tp, li, h in zip(
+                columns["timestamp"],
+                columns["soilMoist"],
+                columns["temp"],
+                columns["light"],
+                columns["humidity"],
             )
-            
-            # Check if there's a gap before the next measurement
-            if i < len(measurements) - 1:
-                current_ts = int(row.timestamp.timestamp())
-                next_ts = int(measurements[i + 1].timestamp.timestamp())
-                gap = next_ts - current_ts
-                
-                # If the gap is > 45 seconds (1.5x the normal interval), there's an outage
-                if gap > 45:
-                    # Calculate how many slots are missing
-                    missing_slots = (gap // interval) - 1
-                    
-                    # Insert null values for each missing slot
-                    for slot in range(1, int(missing_slots) + 1):
-                        null_timestamp = datetime.fromtimestamp(
-                            current_ts + (slot * interval), 
-                            tz=timezone.utc
-                        )
-                        result_data.append(
-                            HistoryMetricsResponse(
-                                timestamp=null_timestamp,
-                                soilMoist=None,
-                                temp=None,
-                                light=None,
-                                humidity=None
-                            )
-                        )
-        
-        return HistoryResponse(
-            meta=HistoryMetaResponse(range=time_range, aggregation="30s", from_time=start_time, to_time=now),
-            data=result_data
+        ]
+
+    # Columnar: the timestamps of a regular grid come down to its start
+    timestamps = columns["timestamp"]
+    regular = step is not None
+    return {
+        "start": int(as_epoch(timestamps[0])) if regular and timestamps else None,
+        "step": step,
+        "timestamps": None if regular else [round(as_epoch(t), 3) for t in timestamps],
+        "soilMoist": columns["soilMoist"],
+        "temp": columns["temp"],
+        "light": columns["light"],
+        "humidity": columns["humidity"],
+    }
+
+
+def _raw_history(
+    session: Session,
+    plant_ids: list[int],
+    start_time: datetime,
+    interval: int,
+) -> dict[int, dict[str, list]]:
+    """Get the actual measurements of several plants, with null slots inserted in the gaps."""
+    # Retrieve all actual measurements, ordered (epoch seconds computed by the database)
+    measurements = session.execute(
+        select(
+            Metrics.plant_id,
+            Metrics.timestamp,
+            cast(func.floor(func.extract('epoch', Metrics.timestamp)), BigInteger).label('epoch'),
+            Metrics.soil_moist,
+            Metrics.temp,
+            Metrics.light,
+            Metrics.humidity
         )
-    
-    # General case: fixed bucket aggregation (day/week/month)
-    time_grid = select(func.generate_series(aligned_start, now_ts, interval).label('bucket_ts')).subquery()
-    epoch = func.extract('epoch', Metrics.timestamp)
-    
-    result = session.execute(
+        .where(Metrics.plant_id.in_(plant_ids), Metrics.timestamp >= start_time)
+        .order_by(Metrics.plant_id, Metrics.timestamp)
+    ).all()
+
+    if not measurements:
+        return {}
+
+    # Load the measurements column by column, and find where each plant starts
+    plant_column, timestamps, epochs, *values = zip(*measurements)
+    plant_column = np.fromiter(plant_column, dtype=np.int64, count=len(plant_column))
+    epochs = np.fromiter(epochs, dtype=np.int64, count=len(epochs))
+    starts = np.flatnonzero(np.diff(plant_column)) + 1
+    bounds = np.concatenate(([0], starts, [len(plant_column)])).tolist()
+
+    history = {}
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        # Detect gaps > 45 seconds (1.5x the normal interval) and locate the null slots to insert
+        total, real_positions, null_positions, null_epochs = fill_gaps(
+            epochs[lo:hi], HISTORY_GAP_THRESHOLD, interval
+        )
+
+        def spread(column) -> np.ndarray:
+            """Place a measurement column at its output positions, leaving null slots as None."""
+            spread_column = np.full(total, None, dtype=object)
+            spread_column[real_positions] = column[lo:hi]
+            return spread_column
+
+        timestamp_column = spread(timestamps)
+        timestamp_column[null_positions] = null_epochs.tolist()  # Epoch seconds, parsed as UTC
+        history[int(plant_column[lo])] = _history_columns(timestamp_column, *map(spread, values))
+
+    return history
+
+
+def _bucketed_history(
+    session: Session,
+    plant_ids: list[int],
+    aligned_start: int,
+    now_ts: int,
+    interval: int,
+) -> dict[int, dict[str, list]]:
+    """Get the averages of several plants over fixed buckets (null for empty buckets)."""
+    time_grid = select(
+        func.generate_series(aligned_start, now_ts, interval).label('bucket_ts')
+    ).subquery()
+    plants_grid = select(func.unnest(array(plant_ids, type_=Integer)).label('plant_id')).subquery()
+    bucket_ts = cast(
+        func.floor(func.extract('epoch', Metrics.timestamp) / interval) * interval, BigInteger
+    )
+
+    # Aggregate the metrics per bucket first (index range scan), then align them on the grid
+    buckets = (
         select(
-            time_grid.c.bucket_ts,
+            Metrics.plant_id,
+            bucket_ts.label('bucket_ts'),
             func.avg(Metrics.soil_moist).label('avg_soil'),
             func.avg(Metrics.temp).label('avg_temp'),
             func.avg(Metrics.light).label('avg_light'),
             func.avg(Metrics.humidity).label('avg_humidity')
         )
-        .select_from(time_grid)
+        .where(
+            Metrics.plant_id.in_(plant_ids),
+            Metrics.timestamp >= datetime.fromtimestamp(aligned_start, tz=timezone.utc),
+        )
+        .group_by(Metrics.plant_id, bucket_ts)
+        .subquery()
+    )
+
+    result = session.execute(
+        select(
+            plants_grid.c.plant_id,
+            time_grid.c.bucket_ts,
+            buckets.c.avg_soil,
+            buckets.c.avg_temp,
+            buckets.c.avg_light,
+            buckets.c.avg_humidity
+        )
+        .select_from(plants_grid)
+        .join(time_grid, true())
         .outerjoin(
-            Metrics,
+            buckets,
             and_(
-                Metrics.plant_id == plant_id,
-                epoch >= time_grid.c.bucket_ts,
-                epoch < time_grid.c.bucket_ts + interval
+                buckets.c.plant_id == plants_grid.c.plant_id,
+                buckets.c.bucket_ts == time_grid.c.bucket_ts
             )
         )
-        .group_by(time_grid.c.bucket_ts)
-        .order_by(time_grid.c.bucket_ts)
+        .order_by(plants_grid.c.plant_id, time_grid.c.bucket_ts)
     ).all()
-    
-    return HistoryResponse(
-        meta=HistoryMetaResponse(range=time_range , aggregation=f"{interval}s", from_time=start_time, to_time=now),
-        data=[
-            HistoryMetricsResponse(
-                timestamp=datetime.fromtimestamp(row.bucket_ts, tz=timezone.utc),
-                soilMoist=round(row.avg_soil, 2) if row.avg_soil is not None else None,
-                temp=round(row.avg_temp, 2) if row.avg_temp is not None else None,
-                light=round(row.avg_light, 0) if row.avg_light is not None else None,
-                humidity=round(row.avg_humidity, 2) if row.avg_humidity is not None else None
-            ) for row in result
-        ]
-    )
\ No newline at end of file
+
+    return {
+        plant_id: _history_columns(*zip(*(row[1:] for row in rows)))
+        for plant_id, rows in groupby(result, key=lambda row: row.plant_id)
+    }
+
+
+def _rollup_history(
+    session: Session,
+    plant_ids: list[int],
+    aligned_start: int,
+    now_ts: int,
+) -> dict[int, dict[str, list]]:
+    """Get the averages of several plants over the precomputed rollup buckets (null if empty)."""
+    time_grid = select(
+        func.generate_series(aligned_start, now_ts, ROLLUP_INTERVAL).label('bucket_ts')
+    ).subquery()
+    plants_grid = select(func.unnest(array(plant_ids, type_=Integer)).label('plant_id')).subquery()
+
+    result = session.execute(
+        select(
+            plants_grid.c.plant_id,
+            time_grid.c.bucket_ts,
+            (MetricsRollup.soil_moist_sum / MetricsRollup.count).label('avg_soil'),
+            (MetricsRollup.temp_sum / MetricsRollup.count).label('avg_temp'),
+            (MetricsRollup.light_sum / MetricsRollup.count).label('avg_light'),
+            (MetricsRollup.humidity_sum / MetricsRollup.count).label('avg_humidity')
+        )
+        .select_from(plants_grid)
+        .join(time_grid, true())
+        .outerjoin(
+            MetricsRollup,
+            and_(
+                MetricsRollup.plant_id == plants_grid.c.plant_id,
+                MetricsRollup.bucket == func.to_timestamp(time_grid.c.bucket_ts)
+            )
+        )
+        .order_by(plants_grid.c.plant_id, time_grid.c.bucket_ts)
+    ).all()
+
+    return {
+        plant_id: _history_columns(*zip(*(row[1:] for row in rows)))
+        for plant_id, rows in groupby(result, key=lambda row: row.plant_id)
+    }
+
+
+def _merge_archive_buckets(rows, archived: dict[int, tuple[int, np.ndarray]]) -> list[tuple]:
+    """Merge archived (count, sums) buckets into the (timestamp, epoch, averages..., count) rows."""
+    buckets = {row[0]: (row[-1], np.asarray(row[2:6], dtype=float) * row[-1]) for row in rows}
+    for bucket, (count, sums) in archived.items():
+        previous_count, previous_sums = buckets.get(bucket, (0, 0.0))
+        buckets[bucket] = (previous_count + count, previous_sums + sums)
+    return [
+        (bucket, bucket, *(sums / count).tolist(), count)
+        for bucket, (count, sums) in sorted(buckets.items())
+    ]
+
+
+def _encode_metrics_cursor(timestamp: datetime, row_id: int) -> str:
+    """Encode the (timestamp, id) key of the last row of a page as an opaque cursor."""
+    epoch = datetime.fromtimestamp(0, tz=timezone.utc)
+    timestamp_us = (timestamp - epoch) // timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(f"{timestamp_us}:{row_id}".encode()).decode().rstrip("=")
+
+
+def _decode_metrics_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor into the (timestamp, id) key it points after."""
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp_us, row_id = (int(part) for part in decoded.split(":"))
+        epoch = datetime.fromtimestamp(0, tz=timezone.utc)
+        return epoch + timedelta(microseconds=timestamp_us), row_id
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _export_response(
+    export_format: str,
+    plant_ids: list[int] | None,
+    from_time: datetime | None,
+    to_time: datetime | None,
+    name: str,
+) -> StreamingResponse:
+    """Build the streamed response of a metrics export (default window: all data up to now)."""
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet export requires pyarrow"
+        )
+
+    # Naive datetimes are interpreted as UTC
+    from_time = as_utc(from_time) if from_time is not None else None
+    to_time = datetime.now(timezone.utc) if to_time is None else as_utc(to_time)
+    if from_time is not None and from_time >= to_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be before 'to'"
+        )
+
+    media_type, extension = EXPORT_FORMATS[export_format]
+    filename = f"metrics-{name}-{to_time.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}.{extension}"
+    return StreamingResponse(
+        export_metrics(export_format, plant_ids, from_time, to_time),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _get_plant_history_window(
+    session: Session,
+    plant_id: int,
+    from_time: datetime,
+    to_time: datetime | None,
+    max_points: int,
+) -> tuple[HistoryMetaResponse, dict[str, list]]:
+    """Get plant metrics history over an arbitrary window, LTTB downsampled: (meta, columns)."""
+    # Naive datetimes are interpreted as UTC
+    from_time = as_utc(from_time)
+    to_time = datetime.now(timezone.utc) if to_time is None else as_utc(to_time)
+    if from_time >= to_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be before 'to'"
+        )
+
+    window = (
+        Metrics.plant_id == plant_id, Metrics.timestamp >= from_time, Metrics.timestamp <= to_time
+    )
+    epoch = func.extract('epoch', Metrics.timestamp)
+
+    # Pick the source depending on the density of the window (index-only count, archive included)
+    archived_count = count_archive(plant_id, from_time, to_time)
+    count = session.execute(
+        select(func.count()).select_from(Metrics).where(*window)
+    ).scalar_one() + archived_count
+
+    if count <= HISTORY_LTTB_MAX_ROWS:
+        # Raw rows, downsampled in memory if needed
+        aggregation = "raw" if count <= max_points else "lttb"
+        rows = session.execute(
+            select(
+                Metrics.timestamp,
+                cast(epoch, Float).label('epoch'),
+                Metrics.soil_moist,
+                Metrics.temp,
+                Metrics.light,
+                Metrics.humidity
+            )
+            .where(*window)
+            .order_by(Metrics.timestamp)
+        ).all()
+        if archived_count:
+            archived = (
+                (timestamp, timestamp.timestamp(), soil_moist, temp, light, humidity)
+                for timestamp, _, soil_moist, humidity, light, temp
+                in read_archive(plant_id, from_time, to_time)
+            )
+            rows = list(heapq.merge(archived, rows, key=lambda row: row[0]))
+    else:
+        # Too many rows: roll them up in SQL into a few buckets per returned point first
+        interval = math.ceil(
+            (to_time - from_time).total_seconds() / (max_points * HISTORY_ROLLUP_OVERSAMPLING)
+        )
+        aggregation = f"lttb:{interval}s"
+        bucket_ts = cast(func.floor(epoch / interval) * interval, BigInteger)
+        rows = session.execute(
+            select(
+                bucket_ts.label('timestamp'),
+                bucket_ts.label('epoch'),
+                func.avg(Metrics.soil_moist),
+                func.avg(Metrics.temp),
+                func.avg(Metrics.light),
+                func.avg(Metrics.humidity),
+                func.count()
+            )
+            .where(*window)
+            .group_by(bucket_ts)
+            .order_by(bucket_ts)
+        ).all()
+        if archived_count:
+            archived = archive_buckets(plant_id, from_time, to_time, interval)
+            rows = _merge_archive_buckets(rows, archived)
+        rows = [row[:6] for row in rows]
+
+    meta = HistoryMetaResponse(
+        range="custom", aggregation=aggregation, from_time=from_time, to_time=to_time
+    )
+    if not rows:
+        return meta, EMPTY_HISTORY
+
+    # Downsample all metrics at once, keeping a single set of timestamps
+    timestamps, epochs, soil_moist, temp, light, humidity = zip(*rows)
+    values = np.column_stack(
+        [np.asarray(column, dtype=float) for column in (soil_moist, temp, light, humidity)]
+    )
+    keep = lttb(np.asarray(epochs, dtype=float), values, max_points).tolist()
+
+    kept_columns = (
+        [column[i] for i in keep] for column in (timestamps, soil_moist, temp, light, humidity)
+    )
+
+    return meta, _history_columns(*kept_columns)
@@ -18,6 +18,19 @@ class MetricsResponse(BaseModel):
     temp: float
 
 
+class RawMetricsResponse(MetricsResponse):
+    """Stored metrics row response schema."""
+
+    id: int
+
+
+class MetricsPageResponse(BaseModel):
+    """Page of stored metrics rows (keyset pagination)."""
+
+    data: list[RawMetricsResponse]
+    nextCursor: str | None = None
+
+
 # Metrics Requests
 class MetricsAddRequest(BaseModel):
     """Metrics ingestion request schema."""
@@ -42,7 +55,7 @@ class HistoryMetricsResponse(BaseModel):
 class HistoryMetaResponse(BaseModel):
     """Metadata about the history response schema."""
 
-    range: Literal["hour", "day", "week", "month"]
+    range: Literal["hour", "day", "week", "month", "custom", "sparkline"]
     aggregation: str
     from_time: datetime.datetime = Field(alias="from")
     to_time: datetime.datetime = Field(alias="to")
@@ -56,3 +69,129 @@ class HistoryResponse(BaseModel):
 
     meta: HistoryMetaResponse
     data: list[HistoryMetricsResponse]
+
+
+class HistoryColumnsResponse(BaseModel):
+    """History data points as one array per metric (columnar format)."""
+
+    start: int | None = None  # Regular points: epoch seconds of the first one
+    step: int | None = None  # Regular points: seconds between two of them
+    timestamps: list[float] | None = None  # Irregular points: epoch seconds of each one
+    soilMoist: list[float | None]
+    temp: list[float | None]
+    light: list[float | None]
+    humidity: list[float | None]
+
+
+class HistoryColumnarResponse(BaseModel):
+    """Historical data response (columnar format)."""
+
+    meta: HistoryMetaResponse
+    data: HistoryColumnsResponse
+
+
+class PlantHistoryResponse(BaseModel):
+    """History data points of one plant."""
+
+    plantId: int
+    data: list[HistoryMetricsResponse]
+
+
+class MultiHistoryResponse(BaseModel):
+    """Historical data response for several plants."""
+
+    meta: HistoryMetaResponse
+    plants: list[PlantHistoryResponse]
+
+
+class PlantHistoryColumnsResponse(BaseModel):
+    """History data of one plant (columnar format)."""
+
+    plantId: int
+    data: HistoryColumnsResponse
+
+
+class MultiHistoryColumnarResponse(BaseModel):
+    """Historical data response for several plants (columnar format)."""
+
+    meta: HistoryMetaResponse
+    plants: list[PlantHistoryColumnsResponse]
+
+
+# Statistics Response
+class MetricStatsResponse(BaseModel):
+    """Statistics of one metric over a day or a range of days."""
+
+    count: int
+    min: float | None = None
+    max: float | None = None
+    mean: float | None = None
+    stddev: float | None = None
+    percentiles: dict[str, float]  # "p50": estimated median, ...
+    secondsBelow: float
+    secondsAbove: float
+    secondsInRange: float
+
+
+class DailyStatsResponse(BaseModel):
+    """Statistics of a plant's metrics over one UTC day."""
+
+    day: datetime.date
+    soilMoist: MetricStatsResponse
+    humidity: MetricStatsResponse
+    light: MetricStatsResponse
+    temp: MetricStatsResponse
+
+
+class StatsSummaryResponse(BaseModel):
+    """Statistics of a plant's metrics over the whole range of days."""
+
+    soilMoist: MetricStatsResponse
+    humidity: MetricStatsResponse
+    light: MetricStatsResponse
+    temp: MetricStatsResponse
+
+
+class PlantStatsResponse(BaseModel):
+    """Daily statistics of a plant's metrics."""
+
+    plantId: int
+    from_day: datetime.date = Field(alias="from")
+    to_day: datetime.date = Field(alias="to")
+    summary: StatsSummaryResponse
+    days: list[DailyStatsResponse]
+
+    class Config:
+        populate_by_name = True
+
+
+# Forecast Response
+class MetricForecastResponse(BaseModel):
+    """Trend of one metric, and when it is expected to cross a threshold."""
+
+    current: float
+    status: Literal["below", "inRange", "above"]
+    points: int
+    slopePerHour: float | None = None
+    r2: float | None = None
+    trend: Literal["rising", "falling", "stable"] | None = None
+    threshold: Literal["min", "max"] | None = None
+    reachedAt: datetime.datetime | None = None
+    hoursToThreshold: float | None = None
+
+
+class PlantForecastResponse(BaseModel):
+    """Trend forecast of a plant's metrics (null metrics: no recent readings)."""
+
+    plantId: int
+    computedAt: datetime.datetime
+    soilMoist: MetricForecastResponse | None = None
+    humidity: MetricForecastResponse | None = None
+    light: MetricForecastResponse | None = None
+    temp: MetricForecastResponse | None = None
+
+
+class MultiForecastResponse(BaseModel):
+    """Trend forecasts of several plants."""
+
+    plants: list[PlantForecastResponse]
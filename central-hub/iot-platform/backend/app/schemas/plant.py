@@ -1,6 +1,7 @@
 """Plant schemas."""
 
 import datetime
+from typing import Literal
 from pydantic import BaseModel, Field, field_validator, model_validator
 
 from app.common.constants import SENSOR_THRESHOLDS
@@ -117,4 +118,12 @@ class PlantResponse(BaseModel):
     name: str
     module: ModuleInfoResponse
     lastMetricsUpdate: MetricsResponse | None = None
-    thresholds: ThresholdsResponse
\ No newline at end of file
+    thresholds: ThresholdsResponse
+
+class PlantPurgeResponse(BaseModel):
+    """Progress of the background purge of a deleted plant."""
+
+    plantId: int
+    status: Literal["pending", "purging", "done"]
+    totalMetrics: int | None = None
+    deletedMetrics: int = 0
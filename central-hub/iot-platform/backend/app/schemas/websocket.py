@@ -2,10 +2,17 @@
 
 from datetime import datetime
 from typing import Literal, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.schemas.metrics import MetricsResponse
 
+# Base of the event messages
+class EventMessage(BaseModel):
+    """WebSocket event message, numbered in the event stream of the server."""
+
+    seq: int = 0
+
+
 # PlantMetrics WebSocket event schemas
 class PlantMetricsPayload(BaseModel):
     """PLANT_METRICS WebSocket event payload."""
@@ -14,7 +21,7 @@ class PlantMetricsPayload(BaseModel):
     metrics: MetricsResponse
 
 
-class PlantMetricsMessage(BaseModel):
+class PlantMetricsMessage(EventMessage):
     """PLANT_METRICS WebSocket message."""
 
     type: Literal["PLANT_METRICS"] = "PLANT_METRICS"
@@ -36,13 +43,26 @@ class ModuleConnectivityPayload(BaseModel):
     connectivity: ModuleConnectivityUpdate
 
 
-class ModuleConnectivityMessage(BaseModel):
+class ModuleConnectivityMessage(EventMessage):
     """MODULE_CONNECTIVITY WebSocket message."""
 
     type: Literal["MODULE_CONNECTIVITY"] = "MODULE_CONNECTIVITY"
     payload: ModuleConnectivityPayload
 
 
+class ModulesConnectivityPayload(BaseModel):
+    """MODULES_CONNECTIVITY WebSocket event payload."""
+
+    modules: list[ModuleConnectivityPayload]
+
+
+class ModulesConnectivityMessage(EventMessage):
+    """MODULES_CONNECTIVITY WebSocket message (MODULE_CONNECTIVITY event of several modules)."""
+
+    type: Literal["MODULES_CONNECTIVITY"] = "MODULES_CONNECTIVITY"
+    payload: ModulesConnectivityPayload
+
+
 # EntityChange WebSocket event schemas
 class EntityChangePayload(BaseModel):
     """ENTITY_CHANGE WebSocket event payload."""
@@ -52,8 +72,102 @@ class EntityChangePayload(BaseModel):
     id: int | str
 
 
-class EntityChangeMessage(BaseModel):
+class EntityChangeMessage(EventMessage):
     """ENTITY_CHANGE WebSocket message."""
 
     type: Literal["ENTITY_CHANGE"] = "ENTITY_CHANGE"
     payload: EntityChangePayload
+
+
+# Anomaly WebSocket event schemas
+class AnomalyPayload(BaseModel):
+    """ANOMALY WebSocket event payload."""
+
+    plantId: int
+    metric: Literal["soilMoist", "humidity", "light", "temp"]
+    kind: Literal["SPIKE", "STUCK", "DROPOUT"]
+    value: float
+    expected: float
+    score: float | None = None
+    timestamp: datetime
+
+
+class AnomalyMessage(EventMessage):
+    """ANOMALY WebSocket message."""
+
+    type: Literal["ANOMALY"] = "ANOMALY"
+    payload: AnomalyPayload
+
+
+# Subscriptions (client messages and their acknowledgement)
+EventType = Literal["PLANT_METRICS", "MODULE_CONNECTIVITY", "ENTITY_CHANGE", "ANOMALY"]
+
+
+class SubscriptionRequest(BaseModel):
+    """
+    SUBSCRIBE / UNSUBSCRIBE WebSocket client message.
+
+    Each field given changes the matching subscription (all by default):
+    SUBSCRIBE adds its values, or subscribes to all of them with null;
+    UNSUBSCRIBE removes its values, or all of them with null. Removing IDs
+    from a subscription to all of them has no effect: subscribe to a list
+    of IDs first. Omitted fields are left unchanged.
+
+    metricsWindow (SUBSCRIBE only) sets the PLANT_METRICS conflation window:
+    at most one update per plant, its latest, is sent every metricsWindow
+    seconds (0 or null: every update). The server caps it, see the reply.
+    """
+
+    type: Literal["SUBSCRIBE", "UNSUBSCRIBE"]
+    events: list[EventType] | None = None
+    plantIds: list[int] | None = None
+    moduleIds: list[str] | None = None
+    metricsWindow: float | None = Field(default=None, ge=0)
+
+
+class SubscriptionsPayload(BaseModel):
+    """SUBSCRIPTIONS WebSocket event payload (null: all)."""
+
+    events: list[EventType] | None = None
+    plantIds: list[int] | None = None
+    moduleIds: list[str] | None = None
+    metricsWindow: float = 0  # Seconds, 0: no conflation
+
+
+class SubscriptionsMessage(BaseModel):
+    """SUBSCRIPTIONS WebSocket message, acknowledging a subscription change."""
+
+    type: Literal["SUBSCRIPTIONS"] = "SUBSCRIPTIONS"
+    payload: SubscriptionsPayload
+
+
+# Snapshot / Resumed WebSocket event schemas (first message of a connection)
+class SnapshotPayload(BaseModel):
+    """SNAPSHOT WebSocket event payload: live state as of the event seq of the stream."""
+
+    stream: str
+    seq: int
+    plants: list[PlantMetricsPayload]
+    modules: list[ModuleConnectivityPayload]
+
+
+class SnapshotMessage(BaseModel):
+    """SNAPSHOT WebSocket message."""
+
+    type: Literal["SNAPSHOT"] = "SNAPSHOT"
+    payload: SnapshotPayload
+
+
+class ResumedPayload(BaseModel):
+    """RESUMED WebSocket event payload: the events of the stream from since (excluded) to seq follow."""
+
+    stream: str
+    since: int
+    seq: int
+
+
+class ResumedMessage(BaseModel):
+    """RESUMED WebSocket message."""
+
+    type: Literal["RESUMED"] = "RESUMED"
+    payload: ResumedPayload
@@ -0,0 +1,111 @@
+"""Anomaly detection state checkpoint background task."""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.common.anomalies import anomaly_detector, save_states
+from app.common.constants import ANOMALY_CHECKPOINT_INTERVAL
+from app.common.leader import leader_lock
+from app.database import engine
+from app.models.plant import Plant
+
+logger = logging.getLogger(__name__)
+
+
+class AnomalyCheckpointer:
+    """
+    Background task saving the anomaly detector states to the database.
+
+    The states are loaded at startup, then the ones updated by new readings
+    are written every ANOMALY_CHECKPOINT_INTERVAL seconds, and once more at
+    shutdown. At most one interval of updates is lost by a crash.
+
+    Every process folds all the readings into its states (see app.common.events),
+    but only the leader process (see app.common.leader) writes them; the others
+    keep theirs pending, to write them if they take over.
+    """
+
+    def __init__(self) -> None:
+        self._running = False
+        self._task: asyncio.Task | None = None
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.last_checkpoint: datetime | None = None
+
+    async def start(self) -> None:
+        """Load the checkpointed states, then start the checkpoint task."""
+        if not self._running:
+            loaded = await asyncio.to_thread(self._load)
+            logger.info(f"Loaded {loaded} anomaly detection states")
+            self._running = True
+            self._task = asyncio.create_task(self._run())
+            logger.info("Anomaly checkpoint started")
+
+    async def stop(self) -> None:
+        """Stop the checkpoint task, after a last checkpoint."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            try:
+                if leader_lock.leader:
+                    await self._checkpoint()
+            except Exception as e:
+                logger.error(f"Error in anomaly checkpoint: {e}", exc_info=True)
+            logger.info("Anomaly checkpoint stopped")
+
+    def stats(self) -> dict:
+        """Get the detector and checkpoint counters."""
+        return {**anomaly_detector.stats(), "lastCheckpoint": self.last_checkpoint}
+
+    async def _run(self) -> None:
+        """Main loop for the checkpoint."""
+        while self._running:
+            await asyncio.sleep(ANOMALY_CHECKPOINT_INTERVAL)
+            try:
+                if await leader_lock.acquire():
+                    await self._checkpoint()
+            except Exception as e:
+                logger.error(f"Error in anomaly checkpoint: {e}", exc_info=True)
+
+    async def _checkpoint(self) -> None:
+        """Write the states updated since the last checkpoint."""
+        # Taken on the event loop, where readings update the states
+        rows = anomaly_detector.take_dirty()
+        try:
+            await asyncio.to_thread(self._save, rows)
+        except Exception:
+            anomaly_detector.mark_dirty(rows)
+            raise
+        self.last_checkpoint = datetime.now(timezone.utc)
+
+    def _load(self) -> int:
+        """Load the checkpointed states into the detector."""
+        session = self._session_factory()
+        try:
+            return anomaly_detector.load(session)
+        finally:
+            session.close()
+
+    def _save(self, rows: list[dict]) -> None:
+        """Upsert states, skipping the ones of deleted plants."""
+        if not rows:
+            return
+        session = self._session_factory()
+        try:
+            plant_ids = set(session.execute(
+                select(Plant.id).where(Plant.id.in_({row["plant_id"] for row in rows}), Plant.deleted_at.is_(None))
+            ).scalars())
+            save_states(session, [row for row in rows if row["plant_id"] in plant_ids])
+            session.commit()
+        finally:
+            session.close()
+
+
+# Global anomaly checkpointer instance
+anomaly_checkpointer = AnomalyCheckpointer()
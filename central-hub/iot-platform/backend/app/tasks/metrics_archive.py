@@ -0,0 +1,174 @@
+"""Metrics cold-tier archive background task."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.common.archive import ARCHIVE_COLUMNS, write_month
+from app.common.batch_delete import delete_metrics_batch
+from app.common.constants import (
+    METRICS_ARCHIVE_AFTER_DAYS,
+    METRICS_ARCHIVE_BATCH_PAUSE,
+    METRICS_ARCHIVE_BATCH_SIZE,
+    METRICS_ARCHIVE_CHECK_INTERVAL,
+    METRICS_ARCHIVE_MIN_DAYS,
+)
+from app.common.export import parquet_available
+from app.common.leader import leader_lock
+from app.common.partitions import next_period, period_start
+from app.common.rollups import rebuild_rollups
+from app.database import engine
+from app.models.metrics import Metrics, fixed_point_values
+from app.models.plant import Plant
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsArchiver:
+    """
+    Background task moving the old raw metrics to the cold-tier archive.
+
+    Each plant's metrics are archived one whole month at a time, once the month
+    ended more than METRICS_ARCHIVE_AFTER_DAYS ago: the rollups of the month are
+    rebuilt first, its rows are written to the plant's Parquet file of the
+    month, then deleted from the database in small batches. Reads merge the
+    archive back in (see app.common.archive). Only the leader process (see
+    app.common.leader) writes the archive.
+    """
+
+    def __init__(self) -> None:
+        self._running = False
+        self._task: asyncio.Task | None = None
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.last_run: datetime | None = None
+        self.archived_metrics = 0
+
+    async def start(self) -> None:
+        """Start the archive task (if enabled)."""
+        if METRICS_ARCHIVE_AFTER_DAYS <= 0:
+            logger.info("Metrics archive disabled")
+            return
+        if not parquet_available():
+            logger.error("Metrics archive requires pyarrow (parquet extra), not started")
+            return
+        if not self._running:
+            self._running = True
+            self._task = asyncio.create_task(self._run())
+            logger.info("Metrics archive started")
+
+    async def stop(self) -> None:
+        """Stop the archive task."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Metrics archive stopped")
+
+    def stats(self) -> dict:
+        """Get the archive counters."""
+        return {
+            "archiveAfterDays": METRICS_ARCHIVE_AFTER_DAYS,
+            "lastRun": self.last_run,
+            "archivedMetrics": self.archived_metrics,
+        }
+
+    async def _run(self) -> None:
+        """Main loop for the archive."""
+        while self._running:
+            try:
+                if await leader_lock.acquire():
+                    await self._archive()
+            except Exception as e:
+                logger.error(f"Error in metrics archive: {e}", exc_info=True)
+            await asyncio.sleep(METRICS_ARCHIVE_CHECK_INTERVAL)
+
+    async def _archive(self) -> None:
+        """Archive the months of every plant that ended before the cutoff."""
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=max(METRICS_ARCHIVE_AFTER_DAYS, METRICS_ARCHIVE_MIN_DAYS))
+
+        for plant_id in await asyncio.to_thread(self._plant_ids):
+            oldest = await asyncio.to_thread(self._oldest_timestamp, plant_id)
+            while self._running and oldest is not None:
+                start = period_start(oldest, "month")
+                end = next_period(start, "month")
+                if end > cutoff:
+                    break
+                await self._archive_month(plant_id, start, end)
+                oldest = await asyncio.to_thread(self._oldest_timestamp, plant_id)
+
+        self.last_run = now
+
+    async def _archive_month(self, plant_id: int, start: datetime, end: datetime) -> None:
+        """Move the metrics of a plant over the month [start, end) to its archive file."""
+        rows, last_id = await asyncio.to_thread(self._month_rows, plant_id, start, end)
+        if not rows:
+            return
+        await asyncio.to_thread(write_month, plant_id, start, rows)
+
+        # The rows are only deleted once safely archived
+        while self._running:
+            count = await asyncio.to_thread(self._delete_metrics_batch, plant_id, start, end, last_id)
+            self.archived_metrics += count
+            if count < METRICS_ARCHIVE_BATCH_SIZE:
+                break
+            await asyncio.sleep(METRICS_ARCHIVE_BATCH_PAUSE)
+        logger.info(f"Archived {len(rows)} metrics of plant #{plant_id} for {start:%Y-%m}")
+
+    def _plant_ids(self) -> list[int]:
+        """Get the IDs of the plants (deleted ones are left to the purge)."""
+        session = self._session_factory()
+        try:
+            return list(session.execute(select(Plant.id).where(Plant.deleted_at.is_(None))).scalars().all())
+        finally:
+            session.close()
+
+    def _oldest_timestamp(self, plant_id: int) -> datetime | None:
+        """Get the timestamp of the oldest raw metrics of a plant in the database."""
+        session = self._session_factory()
+        try:
+            return session.execute(
+                select(func.min(Metrics.timestamp)).where(Metrics.plant_id == plant_id)
+            ).scalar_one()
+        finally:
+            session.close()
+
+    def _month_rows(self, plant_id: int, start: datetime, end: datetime) -> tuple[list[tuple], int | None]:
+        """Rebuild the rollups of a plant's month, then get its rows (ARCHIVE_COLUMNS) and their last id."""
+        session = self._session_factory()
+        try:
+            rebuild_rollups(session, start, end, plant_id=plant_id)
+            session.commit()
+
+            values = fixed_point_values()
+            rows = session.execute(
+                select(Metrics.id, Metrics.timestamp, *(values[column] for column in ARCHIVE_COLUMNS[2:]))
+                .where(Metrics.plant_id == plant_id, Metrics.timestamp >= start, Metrics.timestamp < end)
+                .order_by(Metrics.timestamp, Metrics.id)
+            ).tuples().all()
+            return rows, max((row[0] for row in rows), default=None)
+        finally:
+            session.close()
+
+    def _delete_metrics_batch(self, plant_id: int, start: datetime, end: datetime, last_id: int) -> int:
+        """Delete up to METRICS_ARCHIVE_BATCH_SIZE archived metrics of a plant's month."""
+        session = self._session_factory()
+        try:
+            # Rows stored after the month was read are kept
+            count = delete_metrics_batch(
+                session, plant_id, METRICS_ARCHIVE_BATCH_SIZE,
+                Metrics.timestamp >= start, Metrics.timestamp < end, Metrics.id <= last_id,
+            )
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+
+# Global metrics archiver instance
+metrics_archiver = MetricsArchiver()
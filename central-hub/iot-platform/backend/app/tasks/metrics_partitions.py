@@ -0,0 +1,69 @@
+"""Metrics partition manager background task."""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from sqlalchemy.orm import sessionmaker
+
+from app.common.constants import METRICS_PARTITIONS_AHEAD, METRICS_PARTITIONS_CHECK_INTERVAL
+from app.common.leader import leader_lock
+from app.common.partitions import ensure_partitions, is_partitioned, partition_granularity
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsPartitionManager:
+    """Background task creating the metrics partitions ahead of time (partitioned table only, leader process)."""
+
+    def __init__(self) -> None:
+        self._running = False
+        self._task: asyncio.Task | None = None
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    async def start(self) -> None:
+        """Start the partition manager."""
+        if not self._running:
+            self._running = True
+            self._task = asyncio.create_task(self._run())
+            logger.info("Metrics partition manager started")
+
+    async def stop(self) -> None:
+        """Stop the partition manager."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Metrics partition manager stopped")
+
+    async def _run(self) -> None:
+        """Main loop for partition management."""
+        while self._running:
+            try:
+                if await leader_lock.acquire():
+                    await asyncio.to_thread(self._ensure_partitions)
+            except Exception as e:
+                logger.error(f"Error in metrics partition manager: {e}", exc_info=True)
+            await asyncio.sleep(METRICS_PARTITIONS_CHECK_INTERVAL)
+
+    def _ensure_partitions(self) -> None:
+        """Create the partitions of the upcoming periods."""
+        session = self._session_factory()
+        try:
+            if not is_partitioned(session):
+                return
+            created = ensure_partitions(
+                session, partition_granularity(), datetime.now(timezone.utc), METRICS_PARTITIONS_AHEAD
+            )
+            session.commit()
+            for name in created:
+                logger.info(f"Created metrics partition {name}")
+        finally:
+            session.close()
+
+
+# Global metrics partition manager instance
+metrics_partition_manager = MetricsPartitionManager()
@@ -0,0 +1,252 @@
+"""Metrics retention background task."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.common.archive import archived_plant_ids, delete_archive
+from app.common.batch_delete import delete_metrics_batch
+from app.common.events import publish_metrics_purged
+from app.common.leader import leader_lock
+from app.common.constants import (
+    METRICS_ARCHIVE_RETENTION_DAYS,
+    METRICS_RAW_RETENTION_DAYS,
+    METRICS_RETENTION_BATCH_PAUSE,
+    METRICS_RETENTION_BATCH_SIZE,
+    METRICS_RETENTION_CHECK_INTERVAL,
+    METRICS_RETENTION_WINDOW,
+    METRICS_ROLLUP_RETENTION_DAYS,
+)
+from app.common.partitions import MetricsPartition, drop_partition, is_partitioned, list_partitions
+from app.common.rollups import rebuild_rollups, rollup_bucket
+from app.database import engine
+from app.models.metrics import Metrics
+from app.models.metrics_rollup import MetricsRollup
+from app.models.plant import Plant
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsRetention:
+    """
+    Background task purging the raw metrics, archives and rollups older than their retention period.
+
+    Raw metrics are purged plant by plant, one window at a time: the rollups of
+    the window are rebuilt first, then its rows are deleted in small batches
+    with a pause between them, so that ingestion is never held up by a long
+    delete. When the metrics table is partitioned, whole expired partitions are
+    rolled up then dropped instead. The archived months (the cold copy of the
+    raw metrics, see app.tasks.metrics_archive) have their own retention.
+    Database work runs in a worker thread, and the deletions are published on
+    the event bus (resource versions).
+    Only the leader process (see app.common.leader) enforces the retention.
+    """
+
+    def __init__(self) -> None:
+        self._running = False
+        self._task: asyncio.Task | None = None
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.last_run: datetime | None = None
+        self.deleted_metrics = 0
+        self.deleted_archived_metrics = 0
+        self.deleted_rollups = 0
+
+    async def start(self) -> None:
+        """Start the retention task (unless all data is kept forever)."""
+        retention_days = (METRICS_RAW_RETENTION_DAYS, METRICS_ARCHIVE_RETENTION_DAYS, METRICS_ROLLUP_RETENTION_DAYS)
+        if max(retention_days) <= 0:
+            logger.info("Metrics retention disabled")
+            return
+        if not self._running:
+            self._running = True
+            self._task = asyncio.create_task(self._run())
+            logger.info("Metrics retention started")
+
+    async def stop(self) -> None:
+        """Stop the retention task."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Metrics retention stopped")
+
+    def stats(self) -> dict:
+        """Get the retention counters."""
+        return {
+            "rawRetentionDays": METRICS_RAW_RETENTION_DAYS,
+            "archiveRetentionDays": METRICS_ARCHIVE_RETENTION_DAYS,
+            "rollupRetentionDays": METRICS_ROLLUP_RETENTION_DAYS,
+            "lastRun": self.last_run,
+            "deletedMetrics": self.deleted_metrics,
+            "deletedArchivedMetrics": self.deleted_archived_metrics,
+            "deletedRollups": self.deleted_rollups,
+        }
+
+    async def _run(self) -> None:
+        """Main loop for retention enforcement."""
+        while self._running:
+            try:
+                if await leader_lock.acquire():
+                    await self._enforce()
+            except Exception as e:
+                logger.error(f"Error in metrics retention: {e}", exc_info=True)
+            await asyncio.sleep(METRICS_RETENTION_CHECK_INTERVAL)
+
+    async def _enforce(self) -> None:
+        """Purge everything older than the retention periods."""
+        now = datetime.now(timezone.utc)
+
+        if METRICS_RAW_RETENTION_DAYS > 0:
+            # Only whole rollup buckets are purged, so a bucket is never rebuilt from partial data
+            cutoff = rollup_bucket(now - timedelta(days=METRICS_RAW_RETENTION_DAYS))
+            if await asyncio.to_thread(self._is_partitioned):
+                await self._drop_expired_partitions(cutoff)
+            else:
+                for plant_id in await asyncio.to_thread(self._plant_ids):
+                    if not self._running:
+                        return
+                    await self._purge_plant_metrics(plant_id, cutoff)
+
+        if METRICS_ARCHIVE_RETENTION_DAYS > 0:
+            # Archived months are only deleted whole
+            cutoff = now - timedelta(days=METRICS_ARCHIVE_RETENTION_DAYS)
+            deleted, plant_ids = await asyncio.to_thread(self._delete_archives, cutoff)
+            self.deleted_archived_metrics += deleted
+            if plant_ids:
+                await publish_metrics_purged(plant_ids)
+
+        if METRICS_ROLLUP_RETENTION_DAYS > 0:
+            cutoff = now - timedelta(days=METRICS_ROLLUP_RETENTION_DAYS)
+            self.deleted_rollups += await asyncio.to_thread(self._delete_rollups, cutoff)
+
+        self.last_run = now
+
+    async def _purge_plant_metrics(self, plant_id: int, cutoff: datetime) -> None:
+        """Roll up then delete the raw metrics of a plant older than the cutoff."""
+        deleted = 0
+        oldest = await asyncio.to_thread(self._oldest_timestamp, plant_id)
+        while self._running and oldest is not None and oldest < cutoff:
+            end = min(rollup_bucket(oldest) + timedelta(seconds=METRICS_RETENTION_WINDOW), cutoff)
+
+            # Make sure the rollups cover the window before its raw data goes away
+            await asyncio.to_thread(self._rebuild_rollups, plant_id, oldest, end)
+
+            while self._running:
+                count = await asyncio.to_thread(self._delete_metrics_batch, plant_id, end)
+                deleted += count
+                if count < METRICS_RETENTION_BATCH_SIZE:
+                    break
+                await asyncio.sleep(METRICS_RETENTION_BATCH_PAUSE)
+
+            oldest = await asyncio.to_thread(self._oldest_timestamp, plant_id)
+
+        if deleted:
+            self.deleted_metrics += deleted
+            await publish_metrics_purged([plant_id])
+            logger.info(f"Purged {deleted} metrics of plant #{plant_id} older than {cutoff.isoformat()}")
+
+    async def _drop_expired_partitions(self, cutoff: datetime) -> None:
+        """Roll up then drop the metrics partitions entirely older than the cutoff."""
+        partitions = await asyncio.to_thread(self._expired_partitions, cutoff)
+        for partition in partitions:
+            if not self._running:
+                return
+            count = await asyncio.to_thread(self._drop_partition, partition)
+            self.deleted_metrics += count
+            await publish_metrics_purged(await asyncio.to_thread(self._plant_ids))
+            logger.info(f"Dropped metrics partition {partition.name} ({count} metrics)")
+
+    def _is_partitioned(self) -> bool:
+        """Check if the metrics table is partitioned."""
+        session = self._session_factory()
+        try:
+            return is_partitioned(session)
+        finally:
+            session.close()
+
+    def _expired_partitions(self, cutoff: datetime) -> list[MetricsPartition]:
+        """Get the metrics partitions whose whole range is older than the cutoff."""
+        session = self._session_factory()
+        try:
+            return [p for p in list_partitions(session) if p.end is not None and p.end <= cutoff]
+        finally:
+            session.close()
+
+    def _drop_partition(self, partition: MetricsPartition) -> int:
+        """Rebuild the rollups of a partition's range, then drop it (returns its number of rows)."""
+        session = self._session_factory()
+        try:
+            rebuild_rollups(session, partition.start, partition.end)
+            count = session.execute(text(f"SELECT count(*) FROM {partition.name}")).scalar_one()
+            drop_partition(session, partition.name)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def _plant_ids(self) -> list[int]:
+        """Get the IDs of all plants."""
+        session = self._session_factory()
+        try:
+            return list(session.execute(select(Plant.id)).scalars().all())
+        finally:
+            session.close()
+
+    def _oldest_timestamp(self, plant_id: int) -> datetime | None:
+        """Get the timestamp of the oldest raw metrics of a plant."""
+        session = self._session_factory()
+        try:
+            return session.execute(
+                select(func.min(Metrics.timestamp)).where(Metrics.plant_id == plant_id)
+            ).scalar_one()
+        finally:
+            session.close()
+
+    def _rebuild_rollups(self, plant_id: int, start: datetime, end: datetime) -> None:
+        """Rebuild the rollups of a plant over [start, end)."""
+        session = self._session_factory()
+        try:
+            rebuild_rollups(session, start, end, plant_id=plant_id)
+            session.commit()
+        finally:
+            session.close()
+
+    def _delete_metrics_batch(self, plant_id: int, end: datetime) -> int:
+        """Delete up to METRICS_RETENTION_BATCH_SIZE raw metrics of a plant older than `end`."""
+        session = self._session_factory()
+        try:
+            count = delete_metrics_batch(session, plant_id, METRICS_RETENTION_BATCH_SIZE, Metrics.timestamp < end)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def _delete_archives(self, cutoff: datetime) -> tuple[int, list[int]]:
+        """Delete the archived months ended before the cutoff (returns their number of rows, and their plants)."""
+        deleted, plant_ids = 0, []
+        for plant_id in archived_plant_ids():
+            count = delete_archive(plant_id, before=cutoff)
+            if count:
+                plant_ids.append(plant_id)
+                logger.info(f"Deleted {count} archived metrics of plant #{plant_id} older than {cutoff.isoformat()}")
+            deleted += count
+        return deleted, plant_ids
+
+    def _delete_rollups(self, cutoff: datetime) -> int:
+        """Delete the rollup buckets older than the cutoff."""
+        session = self._session_factory()
+        try:
+            count = session.execute(delete(MetricsRollup).where(MetricsRollup.bucket < cutoff)).rowcount
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+
+# Global metrics retention instance
+metrics_retention = MetricsRetention()
@@ -6,12 +6,15 @@ from datetime import datetime
 from sqlalchemy import select
 from sqlalchemy.orm import sessionmaker
 
-from app.common.constants import MODULE_HB_CHECK_INTERVAL
+from app.common.constants import MODULE_HB_BATCH_SIZE, MODULE_HB_CHECK_INTERVAL
+from app.common.event_bus import BusEvent, event_bus
+from app.common.leader import leader_lock
 from app.database import engine
 from app.models.module import Module
 from app.models.plant import Plant
 from app.models.settings import Settings
 from app.common.utils import is_module_online
+from app.common.versions import ENTITIES, versions
 from app.websocket import ws_manager
 from app.common.discord_utils import send_discord_message
 from app.common.email_utils import send_email
@@ -24,13 +27,29 @@ logger = logging.getLogger(__name__)
 
 
 class ModuleHeartbeatChecker:
-    """Background task for checking module heartbeats."""
+    """
+    Background task for checking module heartbeats.
+
+    Each sweep broadcasts a single MODULES_CONNECTIVITY message, with the
+    modules gone offline and the online modules seen since the previous
+    sweep (lastSeen refresh). Modules coming back online are broadcast at
+    once by the ingestion.
+
+    A single backend process, the leader (Postgres advisory lock), sweeps the
+    modules and sends the offline alerts; another one takes over within a
+    check interval if it stops. The sweeps are published on the event bus,
+    and modules coming back online by the ingestion, so that the offline
+    modules and the WebSocket clients of all the processes stay in sync.
+    """
 
     def __init__(self) -> None:
         self._running = False
         self._task: asyncio.Task | None = None
         self._offline_modules: set[str] = set()
+        self._last_seen: dict[str, datetime | None] = {}  # Last seen broadcast of each module
         self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.sweeps = 0
+        event_bus.subscribe("modules_connectivity", self._on_modules_connectivity)
 
     async def start(self) -> None:
         """Start the heartbeat checker."""
@@ -41,11 +60,11 @@ class ModuleHeartbeatChecker:
             logger.info("Module heartbeat checker started")
 
     async def _initialize_offline_modules(self) -> None:
-        """Initialize the offline modules set by checking current module states."""
+        """Initialize the offline modules set by checking current module states (as the sweeps, of all the modules)."""
         session = self._session_factory()
         try:
             modules = session.execute(
-                select(Module).where(Module.coupled.is_(True))
+                select(Module)
             ).scalars().all()
 
             for module in modules:
@@ -66,18 +85,33 @@ class ModuleHeartbeatChecker:
                 pass
             logger.info("Module heartbeat checker stopped")
 
-    def mark_module_online(self, module_id: str) -> None:
-        """Mark a module as online. Called when receiving data from a module."""
+    def stats(self) -> dict:
+        """Get the leadership and sweep counters."""
+        return {"leader": leader_lock.leader, "sweeps": self.sweeps, "offlineModules": len(self._offline_modules)}
+
+    def mark_module_online(self, module_id: str) -> bool:
+        """
+        Mark a module as online. Called when receiving data from a module.
+
+        Returns:
+            bool: Whether the module was offline.
+        """
         if module_id in self._offline_modules:
             self._offline_modules.remove(module_id)
             logger.info(f"Module #{module_id} is back online")
+            return True
+        return False
 
     async def _run(self) -> None:
         """Main loop for heartbeat checking."""
         interval = MODULE_HB_CHECK_INTERVAL
         while self._running:
             try:
-                await self._check_heartbeats()
+                # Only the leader sweeps (the others try to take over at each interval)
+                if await leader_lock.acquire():
+                    await self._check_heartbeats()
+                else:
+                    self._last_seen.clear()
             except Exception as e:
                 logger.error(f"Error in heartbeat checker: {e}", exc_info=True)
             await asyncio.sleep(interval)
@@ -93,6 +127,9 @@ class ModuleHeartbeatChecker:
             # Get settings for alerts
             settings = session.execute(select(Settings)).scalars().first()
 
+            # Connectivity changes of the sweep: module ID -> (online, last seen)
+            changes: dict[str, tuple[bool, datetime | None]] = {}
+
             for module in modules:
                 # Extract module info for easier access
                 module_id = module.id
@@ -101,6 +138,9 @@ class ModuleHeartbeatChecker:
                 is_online = is_module_online(module)
                 was_offline = module_id in self._offline_modules
 
+                if is_online and module_last_seen != self._last_seen.get(module_id):
+                    changes[module_id] = (True, module_last_seen)
+
                 if not is_online and not was_offline:
                     # Module vient de passer offline
                     logger.warning(f"Module #{module_id} is offline.")
@@ -139,12 +179,34 @@ class ModuleHeartbeatChecker:
                                     body=email_body
                                 )
                     
-                    # WebSocket notification
-                    await ws_manager.emit_module_connectivity(module_id, False, module_last_seen)
+                    changes[module_id] = (False, module_last_seen)
+
+            # Share the changes with every process (WebSocket notification)
+            modules = [
+                {"moduleId": module_id, "isOnline": is_online, "lastSeen": last_seen.isoformat() if last_seen else None}
+                for module_id, (is_online, last_seen) in changes.items()
+            ]
+            for start in range(0, len(modules), MODULE_HB_BATCH_SIZE):
+                await event_bus.publish("modules_connectivity", {"modules": modules[start:start + MODULE_HB_BATCH_SIZE]})
+            self._last_seen.update((module_id, last_seen) for module_id, (_, last_seen) in changes.items())
+            self.sweeps += 1
 
         finally:
             session.close()
 
+    async def _on_modules_connectivity(self, event: BusEvent) -> None:
+        """Apply the connectivity changes of a sweep (of the leader, in any process), and broadcast them."""
+        changes = {}
+        for module in event.data["modules"]:
+            if not module["isOnline"]:
+                self._offline_modules.add(module["moduleId"])
+            last_seen = datetime.fromisoformat(module["lastSeen"]) if module["lastSeen"] else None
+            changes[module["moduleId"]] = (module["isOnline"], last_seen)
+
+        if any(not is_online for is_online, _ in changes.values()):
+            versions.bump(ENTITIES, at=event.time)
+        await ws_manager.emit_modules_connectivity(changes)
+
 
 # Global heartbeat checker instance
 module_heartbeat_checker = ModuleHeartbeatChecker()
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""Deleted plants purge background task."""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.common.archive import count_archive, delete_archive
+from app.common.batch_delete import delete_metrics_batch
+from app.common.constants import PLANT_PURGE_BATCH_PAUSE, PLANT_PURGE_BATCH_SIZE, PLANT_PURGE_CHECK_INTERVAL
+from app.common.event_bus import BusEvent, event_bus
+from app.common.leader import leader_lock
+from app.database import engine
+from app.models.metrics import Metrics
+from app.models.metrics_rollup import MetricsRollup
+from app.models.plant import Plant
+from app.models.plant_anomaly_state import PlantAnomalyState
+from app.models.plant_daily_stats import PlantDailyStats
+from app.models.plant_latest_metrics import PlantLatestMetrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PlantPurgeProgress:
+    """Progress of the purge of a deleted plant."""
+
+    plant_id: int
+    total_metrics: int | None = None  # Counted when the purge starts
+    deleted_metrics: int = 0
+    done: bool = False
+
+    @property
+    def status(self) -> str:
+        """Get the purge status: pending, purging or done."""
+        if self.done:
+            return "done"
+        return "pending" if self.total_metrics is None else "purging"
+
+
+class PlantPurger:
+    """
+    Background task purging the soft-deleted plants.
+
+    The metrics of a deleted plant are deleted in small batches with a pause
+    between them, then its rollups, daily statistics, anomaly states, latest
+    metrics snapshot and row. Deleted plants left over by a restart are picked
+    up on the first run.
+
+    Only the leader process (see app.common.leader) purges; its progress is
+    published on the event bus, so that any process can report it.
+    """
+
+    def __init__(self) -> None:
+        self._running = False
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._progress: dict[int, PlantPurgeProgress] = {}
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        event_bus.subscribe("plant_purge", self._on_plant_purge)
+
+    async def start(self) -> None:
+        """Start the plant purger."""
+        if not self._running:
+            self._running = True
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info("Plant purger started")
+
+    async def stop(self) -> None:
+        """Stop the plant purger."""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Plant purger stopped")
+
+    def schedule(self, plant_id: int) -> None:
+        """Schedule the purge of a plant that has just been soft-deleted (called in every process)."""
+        self._progress[plant_id] = PlantPurgeProgress(plant_id=plant_id)
+        if self._wakeup:
+            self._wakeup.set()
+
+    def progress(self, plant_id: int) -> PlantPurgeProgress | None:
+        """Get the purge progress of a plant, if known by this process."""
+        return self._progress.get(plant_id)
+
+    async def _run(self) -> None:
+        """Main loop for the purge of deleted plants."""
+        while self._running:
+            self._wakeup.clear()
+            try:
+                if await leader_lock.acquire():
+                    await self._purge_deleted_plants()
+            except Exception as e:
+                logger.error(f"Error in plant purger: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=PLANT_PURGE_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _purge_deleted_plants(self) -> None:
+        """Purge the soft-deleted plants, oldest deletion first."""
+        for plant_id in await asyncio.to_thread(self._deleted_plant_ids):
+            if not self._running:
+                return
+            await self._purge_plant(plant_id)
+
+    async def _purge_plant(self, plant_id: int) -> None:
+        """Delete the metrics of a plant in batches, then the plant itself."""
+        progress = self._progress.setdefault(plant_id, PlantPurgeProgress(plant_id=plant_id))
+        progress.total_metrics = await asyncio.to_thread(self._count_metrics, plant_id)
+        progress.total_metrics += await asyncio.to_thread(count_archive, plant_id)
+        await self._publish_progress(progress)
+
+        while True:
+            count = await asyncio.to_thread(self._delete_metrics_batch, plant_id)
+            progress.deleted_metrics += count
+            await self._publish_progress(progress)
+            if count < PLANT_PURGE_BATCH_SIZE:
+                break
+            await asyncio.sleep(PLANT_PURGE_BATCH_PAUSE)
+
+        progress.deleted_metrics += await asyncio.to_thread(delete_archive, plant_id)
+        await asyncio.to_thread(self._delete_plant, plant_id)
+        progress.done = True
+        await self._publish_progress(progress)
+        logger.info(f"Purged plant #{plant_id} ({progress.deleted_metrics} metrics)")
+
+    async def _publish_progress(self, progress: PlantPurgeProgress) -> None:
+        """Share the progress of a purge with the other processes."""
+        await event_bus.publish("plant_purge", {
+            "plantId": progress.plant_id,
+            "totalMetrics": progress.total_metrics,
+            "deletedMetrics": progress.deleted_metrics,
+            "done": progress.done,
+        })
+
+    async def _on_plant_purge(self, event: BusEvent) -> None:
+        """Record the progress of a purge (of the leader, in the other processes)."""
+        if event.local:
+            return
+        data = event.data
+        self._progress[data["plantId"]] = PlantPurgeProgress(
+            plant_id=data["plantId"],
+            total_metrics=data["totalMetrics"],
+            deleted_metrics=data["deletedMetrics"],
+            done=data["done"],
+        )
+
+    def _deleted_plant_ids(self) -> list[int]:
+        """Get the IDs of the soft-deleted plants."""
+        session = self._session_factory()
+        try:
+            return list(session.execute(
+                select(Plant.id).where(Plant.deleted_at.is_not(None)).order_by(Plant.deleted_at)
+            ).scalars().all())
+        finally:
+            session.close()
+
+    def _count_metrics(self, plant_id: int) -> int:
+        """Count the metrics of a plant."""
+        session = self._session_factory()
+        try:
+            return session.execute(
+                select(func.count()).select_from(Metrics).where(Metrics.plant_id == plant_id)
+            ).scalar_one()
+        finally:
+            session.close()
+
+    def _delete_metrics_batch(self, plant_id: int) -> int:
+        """Delete up to PLANT_PURGE_BATCH_SIZE metrics of a plant."""
+        session = self._session_factory()
+        try:
+            count = delete_metrics_batch(session, plant_id, PLANT_PURGE_BATCH_SIZE)
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    def _delete_plant(self, plant_id: int) -> None:
+        """Delete the rollups, daily statistics, anomaly states, latest metrics snapshot and row of a plant."""
+        session = self._session_factory()
+        try:
+            session.execute(delete(MetricsRollup).where(MetricsRollup.plant_id == plant_id))
+            session.execute(delete(PlantDailyStats).where(PlantDailyStats.plant_id == plant_id))
+            session.execute(delete(PlantAnomalyState).where(PlantAnomalyState.plant_id == plant_id))
+            session.execute(delete(PlantLatestMetrics).where(PlantLatestMetrics.plant_id == plant_id))
+            session.execute(delete(Plant).where(Plant.id == plant_id))
+            session.commit()
+        finally:
+            session.close()
+
+
+# Global plant purger instance
+plant_purger = PlantPurger()
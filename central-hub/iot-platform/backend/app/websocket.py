@@ -1,55 +1,531 @@
 """WebSocket connection management and endpoint handler."""
 
 import asyncio
+import time
 import uuid
+from collections import deque
+from datetime import datetime
+from collections.abc import Callable, Hashable
 from typing import Annotated
 from fastapi import Query, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 from app.auth.jwt import decode_token
+from app.common.live_state import live_state
+from app.common.constants import (
+    WS_MAX_LAG,
+    WS_METRICS_WINDOW,
+    WS_METRICS_WINDOW_MAX,
+    WS_REPLAY_SIZE,
+    WS_SEND_QUEUE_SIZE,
+    WS_SEND_TIMEOUT,
+    WS_SLOW_CONSUMER_POLICY,
+)
+from app.schemas.websocket import (
+    EventMessage,
+    ModuleConnectivityPayload,
+    PlantMetricsPayload,
+    ResumedMessage,
+    ResumedPayload,
+    SnapshotMessage,
+    SnapshotPayload,
+    SubscriptionRequest,
+    SubscriptionsMessage,
+    SubscriptionsPayload,
+)
+
+# Close code of the connections of slow clients (try again later)
+WS_CLOSE_SLOW_CONSUMER = 1013
+
+# Policies applied to the clients whose send queue is full
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "conflate", "disconnect")
+if WS_SLOW_CONSUMER_POLICY not in SLOW_CONSUMER_POLICIES:
+    raise ValueError(
+        f"Unknown WS_SLOW_CONSUMER_POLICY {WS_SLOW_CONSUMER_POLICY!r} "
+        f"(expected one of {', '.join(SLOW_CONSUMER_POLICIES)})"
+    )
+
+# Scopes of the events (entities whose IDs they are filtered on)
+EVENT_SCOPES = {
+    "PLANT_METRICS": ("plant",),
+    "ANOMALY": ("plant",),
+    "MODULE_CONNECTIVITY": ("module",),
+    "ENTITY_CHANGE": ("plant", "module"),
+}
+
+# Topic ID of the subscriptions to all the IDs of a scope
+ALL_IDS = "*"
+
+# WebSocket clients
+class WebSocketClient:
+    """
+    Outgoing side of a WebSocket connection.
+
+    Messages wait in a bounded queue, which the connection's own writer task
+    sends in order, so that a slow client never delays the others.
+    """
+
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+        # (queued at, conflation key, message)
+        self.queue: deque[tuple[float, Hashable | None, str]] = deque()
+        self.ready = asyncio.Event()
+        self.writer: asyncio.Task | None = None
+        self.close_code: int | None = None  # Set to close the connection once the writer gets to it
+        # Subscriptions (None: all)
+        self.events: set[str] | None = None
+        self.plant_ids: set[int] | None = None
+        self.module_ids: set[str] | None = None
+        self.topics: set[tuple] = set()  # (event, scope, ID or ALL_IDS)
+        # PLANT_METRICS conflation window (seconds, 0: none), and the latest metrics waiting for
+        # its end
+        self.metrics_window = min(WS_METRICS_WINDOW, WS_METRICS_WINDOW_MAX)
+        self.pending: dict[Hashable, str] = {}
+        self.flush: asyncio.TimerHandle | None = None
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+
+    def lag(self) -> float:
+        """Seconds the oldest queued message has been waiting."""
+        return time.monotonic() - self.queue[0][0] if self.queue else 0.0
+
+    def subset(self, event: str, scope: str, ids: tuple) -> tuple | None:
+        """Get the IDs of an event's entities the client subscribed to (None: all of them)."""
+        if (event, scope, ALL_IDS) in self.topics:
+            return None
+        return tuple(entity_id for entity_id in ids if (event, scope, entity_id) in self.topics)
+
+    def subscribed_topics(self) -> set[tuple]:
+        """Get the topics matching the subscriptions of the client."""
+        scope_ids = {"plant": self.plant_ids, "module": self.module_ids}
+        topics = set()
+        for event, scopes in EVENT_SCOPES.items():
+            if self.events is not None and event not in self.events:
+                continue
+            for scope in scopes:
+                ids = scope_ids[scope]
+                topic_ids = ids if ids is not None else (ALL_IDS,)
+                topics.update((event, scope, topic_id) for topic_id in topic_ids)
+        return topics
+
 
 # WebSocket Manager
 class WebSocketManager:
-    """Manages WebSocket connections and broadcasts messages."""
+    """
+    Manages WebSocket connections and broadcasts messages.
+
+    Clients receive all the events by default, and may narrow them down to
+    some event types, plants and modules (see SubscriptionRequest). A topic
+    index maps each (event, scope, ID) to its subscribers, so that a
+    broadcast only reaches them.
+
+    A broadcast serialises the message once and only queues it for each
+    subscriber. When a client's queue is full (WS_SEND_QUEUE_SIZE messages), the
+    WS_SLOW_CONSUMER_POLICY applies:
+    - drop_oldest: the oldest queued message is dropped,
+    - conflate: the queued message with the same key (e.g. the previous
+      metrics of the same plant) is replaced, else the oldest one is dropped,
+    - disconnect: the client is disconnected, as well as when its oldest
+      queued message has waited for more than WS_MAX_LAG seconds.
+    A client whose single send takes more than WS_SEND_TIMEOUT seconds is
+    disconnected whatever the policy.
+
+    A client may also set a PLANT_METRICS conflation window (WS_METRICS_WINDOW
+    by default): the metrics of each plant are then held, only the latest
+    kept, and flushed together at the end of the window, so that the client
+    gets at most one update per plant per window whatever the ingestion rate.
+
+    Events are numbered (seq) in the stream of the server process, and the
+    latest WS_REPLAY_SIZE ones are kept. A connection starts with a SNAPSHOT
+    of the live state (app.common.live_state) as of an event seq, which the
+    next events update. A reconnecting client passing the stream and the last
+    seq it received resumes instead: RESUMED, then the events it missed,
+    unless they are no longer kept (or do not fit in its send queue), in
+    which case it gets a SNAPSHOT again.
+    """
 
     def __init__(self) -> None:
         """Initialize the WebSocket manager."""
-        self.active_connections: dict[str, WebSocket] = {}
+        self.active_connections: dict[str, WebSocketClient] = {}
+        self._topics: dict[tuple, set[str]] = {}  # Topic -> subscribed connection IDs
         self._lock = asyncio.Lock()
+        self.slow_disconnects = 0
+        self._sent = 0  # Counters of the closed connections
+        self._dropped = 0
+        self._conflated = 0
+        self.stream = uuid.uuid4().hex  # Event stream of this process
+        self._seq = 0  # Last event seq
+        # (seq, event, scope, entity IDs, conflation key, renderer of the message for a subset of
+        # the IDs)
+        self._replay: deque[tuple[int, str, str, tuple, Hashable | None, Callable]] = deque(
+            maxlen=WS_REPLAY_SIZE
+        )
 
-    async def connect(self, websocket: WebSocket, connection_id: str) -> None:
-        """Accept and register a new WebSocket connection."""
+    async def connect(
+        self,
+        websocket: WebSocket,
+        connection_id: str,
+        stream: str | None = None,
+        since: int | None = None,
+    ) -> None:
+        """
+        Accept and register a new WebSocket connection, and start its writer.
+
+        Args:
+            websocket (WebSocket): Connection.
+            connection_id (str): ID of the connection.
+            stream (str | None): Event stream of a previous connection, to resume.
+            since (int | None): Last event seq received on that stream.
+        """
         await websocket.accept()
+        client = WebSocketClient(websocket)
+        client.writer = asyncio.create_task(self._write(connection_id, client))
         async with self._lock:
-            self.active_connections[connection_id] = websocket
+            self.active_connections[connection_id] = client
+            self._index(connection_id, client)
+            # Queued before any other event, so that the client misses none
+            resumed = (
+                stream == self.stream
+                and since is not None
+                and self._resume(connection_id, client, since)
+            )
+            if not resumed:
+                self._enqueue(connection_id, client, self.snapshot().model_dump_json(), None)
 
     async def disconnect(self, connection_id: str) -> None:
-        """Remove a WebSocket connection."""
+        """Remove a WebSocket connection, and stop its writer."""
         async with self._lock:
-            self.active_connections.pop(connection_id, None)
+            client = self.active_connections.pop(connection_id, None)
+        if client is not None:
+            self._unindex(connection_id, client)
+            self._release(client)
+            if client.writer is not None and client.writer is not asyncio.current_task():
+                client.writer.cancel()
 
-    async def broadcast(self, message: BaseModel) -> None:
-        """Broadcast a Pydantic message to all connected clients."""
+    async def broadcast(
+        self,
+        message: EventMessage,
+        scope: str,
+        entity_id: int | str,
+        key: Hashable | None = None,
+    ) -> None:
+        """
+        Number an event message, and broadcast it to the clients subscribed to its topic.
+
+        Args:
+            message (EventMessage): Message to send (its type is the event).
+            scope (str): Entity the message is about ("plant" or "module").
+            entity_id (int | str): ID of that entity.
+            key (Hashable | None): Conflation key: a queued message with the same key is
+                superseded by this one (e.g. ("PLANT_METRICS", plant_id)).
+        """
+        self._seq += 1
+        message.seq = self._seq
         message_str = message.model_dump_json()
-        disconnected = []
+        self._publish(message.type, scope, (entity_id,), key, lambda _ids: message_str)
 
-        async with self._lock:
-            connection_ids = list(self.active_connections.keys())
+    async def broadcast_batch(
+        self,
+        event: str,
+        scope: str,
+        items: dict[int | str, BaseModel],
+        build: Callable[[list[BaseModel]], EventMessage],
+    ) -> None:
+        """
+        Broadcast an event on several entities as one message, numbered once.
+
+        Each subscribed client gets a single message, with only the entities it
+        subscribed to.
+
+        Args:
+            event (str): Event of the message (for the subscriptions).
+            scope (str): Entities the message is about ("plant" or "module").
+            items (dict[int | str, BaseModel]): Item of the message for each entity ID.
+            build (Callable[[list[BaseModel]], EventMessage]): Builder of the message from items.
+        """
+        if not items:
+            return
+        self._seq += 1
+        seq = self._seq
+        rendered: dict[tuple | None, str] = {}
+
+        def render(ids: tuple | None) -> str:
+            if ids not in rendered:
+                subset = items.values() if ids is None else (items[entity_id] for entity_id in ids)
+                message = build(list(subset))
+                message.seq = seq
+                rendered[ids] = message.model_dump_json()
+            return rendered[ids]
+
+        self._publish(event, scope, tuple(items), None, render)
+
+    def subscribe(
+        self, connection_id: str, request: SubscriptionRequest
+    ) -> SubscriptionsMessage | None:
+        """
+        Apply a SUBSCRIBE or UNSUBSCRIBE request of a client.
+
+        Returns:
+            SubscriptionsMessage | None: The resulting subscriptions, None for an unknown
+                connection.
+        """
+        client = self.active_connections.get(connection_id)
+        if client is None:
+            return None
+
+        subscribing = request.type == "SUBSCRIBE"
+        fields = (("events", "events"), ("plantIds", "plant_ids"), ("moduleIds", "module_ids"))
+        for field, attribute in fields:
+            if field not in request.model_fields_set:
+                continue
+            values = getattr(request, field)
+            values = set(values) if values is not None else None
+            current = getattr(client, attribute)
+            if subscribing:
+                # A list narrows down a subscription to all
+                updated = values | (current or set()) if values is not None else None
+            elif values is None:
+                updated = set()
+            elif current is not None:
+                updated = current - values
+            else:
+                # Only the event types can be removed from a subscription to all of them
+                updated = set(EVENT_SCOPES) - values if field == "events" else None
+            setattr(client, attribute, updated)
+
+        if subscribing and "metricsWindow" in request.model_fields_set:
+            client.metrics_window = min(request.metricsWindow or 0, WS_METRICS_WINDOW_MAX)
+            if not client.metrics_window and client.flush is not None:
+                client.flush.cancel()
+                self._flush(connection_id, client)
+
+        self._unindex(connection_id, client)
+        self._index(connection_id, client)
+        return SubscriptionsMessage(
+            payload=SubscriptionsPayload(
+                events=sorted(client.events) if client.events is not None else None,
+                plantIds=sorted(client.plant_ids) if client.plant_ids is not None else None,
+                moduleIds=sorted(client.module_ids) if client.module_ids is not None else None,
+                metricsWindow=client.metrics_window,
+            )
+        )
+
+    def _publish(
+        self,
+        event: str,
+        scope: str,
+        ids: tuple,
+        key: Hashable | None,
+        render: Callable[[tuple | None], str],
+    ) -> None:
+        """Keep a numbered event for the replays, and queue it for its subscribers."""
+        self._replay.append((self._seq, event, scope, ids, key, render))
+
+        subscribers = set(self._topics.get((event, scope, ALL_IDS), ()))
+        for entity_id in ids:
+            subscribers |= self._topics.get((event, scope, entity_id), set())
+        for connection_id in subscribers:
+            client = self.active_connections.get(connection_id)
+            if client is None:
+                continue
+            message_str = render(client.subset(event, scope, ids))
+            if client.metrics_window and event == "PLANT_METRICS":
+                self._hold(connection_id, client, message_str, key)
+            else:
+                self._enqueue(connection_id, client, message_str, key)
+
+    def snapshot(self) -> SnapshotMessage:
+        """Get the live state, as of the last event."""
+        return SnapshotMessage(
+            payload=SnapshotPayload(
+                stream=self.stream,
+                seq=self._seq,
+                plants=[
+                    PlantMetricsPayload(plantId=plant_id, metrics=metrics)
+                    for plant_id, metrics in live_state.metrics.items()
+                ],
+                modules=[
+                    ModuleConnectivityPayload(moduleId=module_id, connectivity=connectivity)
+                    for module_id, connectivity in live_state.connectivity.items()
+                ],
+            )
+        )
+
+    def send(self, connection_id: str, message_str: str) -> None:
+        """Queue a text message for one client."""
+        client = self.active_connections.get(connection_id)
+        if client is not None:
+            self._enqueue(connection_id, client, message_str, None)
+
+    def stats(self) -> dict:
+        """Get the connections and send queues counters."""
+        clients = list(self.active_connections.values())
+        depths = [len(client.queue) for client in clients]
+        return {
+            "connections": len(clients),
+            "topics": len(self._topics),
+            "seq": self._seq,
+            "replayable": len(self._replay),
+            "policy": WS_SLOW_CONSUMER_POLICY,
+            "queued": sum(depths),
+            "windowed": sum(1 for client in clients if client.metrics_window),
+            "held": sum(len(client.pending) for client in clients),
+            "maxQueueDepth": max(depths, default=0),
+            "maxLag": round(max((client.lag() for client in clients), default=0.0), 3),
+            "sent": self._sent + sum(client.sent for client in clients),
+            "dropped": self._dropped + sum(client.dropped for client in clients),
+            "conflated": self._conflated + sum(client.conflated for client in clients),
+            "slowDisconnects": self.slow_disconnects,
+        }
+
+    def _enqueue(
+        self,
+        connection_id: str,
+        client: WebSocketClient,
+        message_str: str,
+        key: Hashable | None,
+    ) -> None:
+        """Queue a message for a client, applying the slow consumer policy."""
+        if client.close_code is not None:
+            return
+
+        full = len(client.queue) >= WS_SEND_QUEUE_SIZE
+        if WS_SLOW_CONSUMER_POLICY == "disconnect" and (full or client.lag() > WS_MAX_LAG):
+            self._close_slow(connection_id, client)
+            return
+        if full:
+            superseded = None
+            if WS_SLOW_CONSUMER_POLICY == "conflate" and key is not None:
+                superseded = next(
+                    (i for i, (_, queued_key, _) in enumerate(client.queue) if queued_key == key),
+                    None,
+                )
+            if superseded is not None:
+                del client.queue[superseded]
+                client.conflated += 1
+            else:
+                client.queue.popleft()
+                client.dropped += 1
+
+        client.queue.append((time.monotonic(), key, message_str))
+        client.ready.set()
+
+    def _resume(self, connection_id: str, client: WebSocketClient, since: int) -> bool:
+        """
+        Queue the events a client missed since an event seq, if they are all kept and fit in its
+        queue.
+
+        Returns:
+            bool: Whether the connection was resumed.
+        """
+        oldest = self._replay[0][0] if self._replay else self._seq + 1
+        if not oldest - 1 <= since <= self._seq:
+            return False
+        missed = []
+        for seq, event, scope, ids, key, render in self._replay:
+            subset = client.subset(event, scope, ids)
+            if seq > since and subset != ():
+                missed.append((key, render(subset)))
+        if len(missed) >= WS_SEND_QUEUE_SIZE:
+            return False
+
+        resumed = ResumedMessage(
+            payload=ResumedPayload(stream=self.stream, since=since, seq=self._seq)
+        )
+        self._enqueue(connection_id, client, resumed.model_dump_json(), None)
+        for key, message_str in missed:
+            self._enqueue(connection_id, client, message_str, key)
+        return True
+
+    def _hold(
+        self, connection_id: str, client: WebSocketClient, message_str: str, key: Hashable
+    ) -> None:
+        """Hold a message until the end of the client's conflation window, superseding its key."""
+        if client.close_code is not None:
+            return
+        if client.pending.pop(key, None) is not None:
+            client.conflated += 1
+        client.pending[key] = message_str
+        if client.flush is None:
+            client.flush = asyncio.get_running_loop().call_later(
+                client.metrics_window, self._flush, connection_id, client
+            )
 
-        for connection_id in connection_ids:
-            websocket = self.active_connections.get(connection_id)
-            if websocket:
-                try:
-                    await websocket.send_text(message_str)
-                except Exception:
-                    disconnected.append(connection_id)
+    def _flush(self, connection_id: str, client: WebSocketClient) -> None:
+        """Queue the messages held during a client's conflation window."""
+        client.flush = None
+        pending, client.pending = client.pending, {}
+        for key, message_str in pending.items():
+            self._enqueue(connection_id, client, message_str, key)
 
-        # Clean up disconnected clients
-        for connection_id in disconnected:
-            await self.disconnect(connection_id)
+    def _index(self, connection_id: str, client: WebSocketClient) -> None:
+        """Add a client to the index of the topics it subscribed to."""
+        client.topics = client.subscribed_topics()
+        for topic in client.topics:
+            self._topics.setdefault(topic, set()).add(connection_id)
+
+    def _unindex(self, connection_id: str, client: WebSocketClient) -> None:
+        """Remove a client from the topic index."""
+        for topic in client.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection_id)
+                if not subscribers:
+                    del self._topics[topic]
+        client.topics = set()
+
+    def _close_slow(self, connection_id: str, client: WebSocketClient) -> None:
+        """Unregister a slow client, and let its writer close the connection."""
+        self.active_connections.pop(connection_id, None)
+        self._unindex(connection_id, client)
+        self.slow_disconnects += 1
+        client.dropped += len(client.queue)
+        client.queue.clear()
+        client.close_code = WS_CLOSE_SLOW_CONSUMER
+        client.ready.set()
+
+    def _release(self, client: WebSocketClient) -> None:
+        """Keep the counters of a closed connection."""
+        self._sent += client.sent
+        self._dropped += client.dropped + len(client.queue) + len(client.pending)
+        self._conflated += client.conflated
+        client.sent = client.dropped = client.conflated = 0
+        client.queue.clear()
+        client.pending.clear()
+        if client.flush is not None:
+            client.flush.cancel()
+            client.flush = None
+
+    async def _write(self, connection_id: str, client: WebSocketClient) -> None:
+        """Writer task of a client: send its queued messages, in order."""
+        try:
+            while client.close_code is None:
+                await client.ready.wait()
+                while client.queue and client.close_code is None:
+                    _, _, message_str = client.queue.popleft()
+                    await asyncio.wait_for(client.websocket.send_text(message_str), WS_SEND_TIMEOUT)
+                    client.sent += 1
+                client.ready.clear()
+        except asyncio.TimeoutError:
+            # Stalled client (unless already disconnected by the policy)
+            if client.close_code is None:
+                self.slow_disconnects += 1
+                client.close_code = WS_CLOSE_SLOW_CONSUMER
+        except Exception:
+            # Connection closed: the endpoint unregisters it
+            return
+        finally:
+            self._release(client)
+
+        try:
+            await asyncio.wait_for(client.websocket.close(code=client.close_code), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+        await self.disconnect(connection_id)
 
     async def emit_plant_metrics(self, plant_id: int, metrics) -> None:
-        """Broadcast plant metrics to all clients."""
+        """Broadcast plant metrics to the subscribed clients."""
         from app.schemas.websocket import PlantMetricsMessage, PlantMetricsPayload
         message = PlantMetricsMessage(
             payload=PlantMetricsPayload(
@@ -57,21 +533,69 @@ class WebSocketManager:
                 metrics=metrics,
             )
         )
-        await self.broadcast(message)
+        live_state.set_metrics(plant_id, message.payload.metrics)
+        await self.broadcast(message, "plant", plant_id, key=("PLANT_METRICS", plant_id))
 
     async def emit_module_connectivity(self, module_id: str, is_online: bool, last_seen) -> None:
-        """Broadcast module connectivity status to all clients."""
-        from app.schemas.websocket import ModuleConnectivityMessage, ModuleConnectivityPayload, ModuleConnectivityUpdate
+        """Broadcast module connectivity status to the subscribed clients."""
+        from app.schemas.websocket import ModuleConnectivityMessage, ModuleConnectivityUpdate
         message = ModuleConnectivityMessage(
             payload=ModuleConnectivityPayload(
                 moduleId=module_id,
                 connectivity=ModuleConnectivityUpdate(isOnline=is_online, lastSeen=last_seen),
             )
         )
-        await self.broadcast(message)
+        live_state.set_connectivity(module_id, message.payload.connectivity)
+        await self.broadcast(message, "module", module_id, key=("MODULE_CONNECTIVITY", module_id))
+
+    async def emit_modules_connectivity(
+        self, connectivity: dict[str, tuple[bool, datetime | None]]
+    ) -> None:
+        """Broadcast the connectivity of several modules (ID -> (online, last seen)) as one message."""
+        from app.schemas.websocket import (
+            ModuleConnectivityUpdate,
+            ModulesConnectivityMessage,
+            ModulesConnectivityPayload,
+        )
+        items = {
+            module_id: ModuleConnectivityPayload(
+                moduleId=module_id,
+                connectivity=ModuleConnectivityUpdate(isOnline=is_online, lastSeen=last_seen),
+            )
+            for module_id, (is_online, last_seen) in connectivity.items()
+        }
+        for module_id, item in items.items():
+            live_state.set_connectivity(module_id, item.connectivity)
+        await self.broadcast_batch(
+            "MODULE_CONNECTIVITY",
+            "module",
+            items,
+            lambda modules: ModulesConnectivityMessage(
+                payload=ModulesConnectivityPayload(modules=modules)
+            ),
+        )
+
+    async def emit_anomaly(self, anomaly) -> None:
+        """Broadcast an anomaly detected on a plant's readings to the subscribed clients."""
+        from app.schemas.websocket import AnomalyMessage, AnomalyPayload
+        fields = {
+            "soil_moist": "soilMoist", "humidity": "humidity", "light": "light", "temp": "temp",
+        }
+        message = AnomalyMessage(
+            payload=AnomalyPayload(
+                plantId=anomaly.plant_id,
+                metric=fields[anomaly.metric],
+                kind=anomaly.kind,
+                value=anomaly.value,
+                expected=round(anomaly.expected, 2),
+                score=round(anomaly.score, 2) if anomaly.score is not None else None,
+                timestamp=anomaly.timestamp,
+            )
+        )
+        await self.broadcast(message, "plant", anomaly.plant_id)
 
     async def emit_entity_change(self, entity: str, action: str, entity_id) -> None:
-        """Broadcast entity changes to all clients."""
+        """Broadcast entity changes to the subscribed clients."""
         from app.schemas.websocket import EntityChangeMessage, EntityChangePayload
         message = EntityChangeMessage(
             payload=EntityChangePayload(
@@ -80,7 +604,9 @@ class WebSocketManager:
                 id=entity_id,
             )
         )
-        await self.broadcast(message)
+        if entity == "plant" and action == "delete":
+            live_state.forget_plant(entity_id)
+        await self.broadcast(message, entity, entity_id)
 
 # Global WebSocket manager instance
 ws_manager = WebSocketManager()
@@ -89,19 +615,37 @@ ws_manager = WebSocketManager()
 async def websocket_endpoint(
     websocket: WebSocket,
     token: Annotated[str | None, Query()] = None,
+    stream: Annotated[str | None, Query()] = None,
+    since: Annotated[int | None, Query()] = None,
 ) -> None:
     """
     WebSocket endpoint for real-time updates.
 
     Connect with: ws://host/ws?token=<jwt_token>
+    Reconnect with: ws://host/ws?token=<jwt_token>&stream=<stream>&since=<last seq received>
+
+    First message from server:
+    - SNAPSHOT: Latest metrics of the plants and connectivity of the modules,
+      with the event stream and seq they are as of
+    - RESUMED: On reconnection, when the missed events (seq > since) follow
 
-    Messages from server:
+    Messages from server (numbered by seq):
     - PLANT_METRICS: Metrics data updates
-    - MODULE_CONNECTIVITY: Module connectivity status
+    - MODULE_CONNECTIVITY: Module connectivity status (when a module comes back online)
+    - MODULES_CONNECTIVITY: Connectivity status of several modules, from a
+      heartbeat sweep (modules gone offline, lastSeen of the online ones)
     - ENTITY_CHANGE: Structural changes (CRUD operations)
+    - ANOMALY: Anomaly detected on a plant's readings (spike, stuck sensor, dropout)
+
+    - SUBSCRIPTIONS: Subscriptions of the client, after a change
 
     Messages from client:
     - PING: Keep-alive (server responds with PONG)
+    - SUBSCRIBE / UNSUBSCRIBE: Change the event types, plant IDs and module
+      IDs received (all by default), e.g.
+      {"type": "SUBSCRIBE", "plantIds": [1]}, and the PLANT_METRICS
+      conflation window, e.g. {"type": "SUBSCRIBE", "metricsWindow": 1}
+      for at most one update per plant per second (see SubscriptionRequest)
     """
     # Validate authentication token
     if not token or not decode_token(token):
@@ -113,14 +657,23 @@ async def websocket_endpoint(
     connection_id = str(uuid.uuid4())
 
     # Accept and register connection
-    await ws_manager.connect(websocket, connection_id)
+    await ws_manager.connect(websocket, connection_id, stream, since)
 
     # Listen for incoming messages
     try:
         while True:
             data = await websocket.receive_text()
             if data == "PING":
-                await websocket.send_text("PONG")
+                ws_manager.send(connection_id, "PONG")
+                continue
+
+            # Subscription changes (other messages are ignored)
+            try:
+                request = SubscriptionRequest.model_validate_json(data)
+            except ValidationError:
+                continue
+            if reply := ws_manager.subscribe(connection_id, request):
+                ws_manager.send(connection_id, reply.model_dump_json())
     except WebSocketDisconnect:
         await ws_manager.disconnect(connection_id)
     except Exception:
@@ -0,0 +1,121 @@
+"""
+Benchmark of the history responses: p99 latency and bytes of a month of history.
+
+Serves the month history of several plants (one point per 4-hour bucket, as
+GET /plants/history?time_range=month) through two endpoints of a scratch app:
+the former one, validated and encoded again through its response model, and
+the fast one, rendered by orjson (app.common.responses). Both are measured
+with and without gzip compression. No database is needed.
+
+Usage: python scripts/benchmark_history_responses.py [plants] [requests]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from fastapi import FastAPI, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.common.constants import RESPONSE_GZIP_LEVEL  # noqa: E402
+from app.common.responses import fast_json  # noqa: E402
+from app.schemas.metrics import HistoryMetaResponse, MultiHistoryResponse  # noqa: E402
+
+MONTH = timedelta(days=30)
+INTERVAL = 14400  # Bucket of the month range
+
+
+def history(plants: int) -> tuple[datetime, datetime, dict[int, list[dict]]]:
+    """Generate the month history of plants, as the history queries return it (null if empty)."""
+    rnd = random.Random(0)
+    now = datetime.now(timezone.utc)
+    start = now - MONTH
+    aligned_start = int(start.timestamp()) // INTERVAL * INTERVAL
+    buckets = range(aligned_start, int(now.timestamp()) + 1, INTERVAL)
+    data = {}
+    for plant_id in range(1, plants + 1):
+        data[plant_id] = [
+            {
+                "timestamp": datetime.fromtimestamp(bucket, tz=timezone.utc),
+                "soilMoist": round(rnd.uniform(0, 100), 2),
+                "temp": round(rnd.uniform(-10, 50), 2),
+                "light": round(rnd.uniform(0, 65000), 0),
+                "humidity": round(rnd.uniform(0, 100), 2),
+            }
+            if rnd.random() > 0.02
+            else {"timestamp": datetime.fromtimestamp(bucket, tz=timezone.utc), **dict.fromkeys(
+                ("soilMoist", "temp", "light", "humidity")
+            )}
+            for bucket in buckets
+        ]
+    return start, now, data
+
+
+def scratch_app(start: datetime, now: datetime, data: dict[int, list[dict]]) -> FastAPI:
+    """Build an app serving the history through both paths."""
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=RESPONSE_GZIP_LEVEL)
+
+    def meta() -> HistoryMetaResponse:
+        return HistoryMetaResponse(
+            range="month", aggregation=f"{INTERVAL}s", from_time=start, to_time=now
+        )
+
+    @app.get("/validated", response_model=MultiHistoryResponse)
+    async def validated() -> MultiHistoryResponse:
+        return MultiHistoryResponse(
+            meta=meta(),
+            plants=[{"plantId": plant_id, "data": points} for plant_id, points in data.items()],
+        )
+
+    @app.get("/fast", response_model=MultiHistoryResponse)
+    async def fast(response: Response) -> MultiHistoryResponse:
+        return fast_json({
+            "meta": meta(),
+            "plants": [{"plantId": plant_id, "data": points} for plant_id, points in data.items()],
+        }, response)
+
+    return app
+
+
+def measure(
+    client: TestClient, path: str, encoding: str, requests: int
+) -> tuple[float, float, int]:
+    """Request a path repeatedly: (p50 ms, p99 ms, response bytes on the wire)."""
+    headers = {"Accept-Encoding": encoding}
+    client.get(path, headers=headers)  # Warm-up
+    latencies = []
+    size = 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        size = int(response.headers["content-length"])
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99)), size
+
+
+def main() -> None:
+    plants = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    start, now, data = history(plants)
+    client = TestClient(scratch_app(start, now, data))
+
+    # Both paths must render the same document
+    assert client.get("/validated").json() == client.get("/fast").json()
+
+    print(f"{plants} plants, {sum(map(len, data.values()))} points, {requests} requests")
+    print(f"{'path':<12}{'encoding':<10}{'p50 ms':>10}{'p99 ms':>10}{'bytes':>12}")
+    for path in ("validated", "fast"):
+        for encoding in ("identity", "gzip"):
+            p50, p99, size = measure(client, f"/{path}", encoding, requests)
+            print(f"{path:<12}{encoding:<10}{p50:>10.1f}{p99:>10.1f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
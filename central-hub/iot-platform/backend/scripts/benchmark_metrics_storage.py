@@ -0,0 +1,116 @@
+"""
+Benchmark of the metrics storage schemas: bytes per row and insert throughput.
+
+Compares the float schema (integer id primary key, four float columns, plant_id
+and (plant_id, timestamp) indexes) with the compact one of app.models.metrics,
+in scratch tables which are dropped afterwards.
+
+Usage: DATABASE_URL=postgresql://... python scripts/benchmark_metrics_storage.py [rows] [plants]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+SCHEMAS = {
+    "former": [
+        "CREATE TABLE bench_metrics_former ("
+        "id SERIAL PRIMARY KEY, plant_id INTEGER NOT NULL, "
+        "timestamp TIMESTAMP WITH TIME ZONE NOT NULL, "
+        "soil_moist FLOAT NOT NULL, humidity FLOAT NOT NULL, "
+        "light FLOAT NOT NULL, temp FLOAT NOT NULL)",
+        "CREATE INDEX ix_bench_metrics_former_plant_id "
+        "ON bench_metrics_former (plant_id)",
+        "CREATE INDEX ix_bench_metrics_former_plant_timestamp "
+        "ON bench_metrics_former (plant_id, timestamp)",
+    ],
+    "compact": [
+        "CREATE TABLE bench_metrics_compact ("
+        "id BIGSERIAL, timestamp TIMESTAMP WITH TIME ZONE NOT NULL, "
+        "plant_id INTEGER NOT NULL, light_lux INTEGER NOT NULL, "
+        "soil_moist_centi SMALLINT NOT NULL, humidity_centi SMALLINT NOT NULL, "
+        "temp_centi SMALLINT NOT NULL, PRIMARY KEY (plant_id, timestamp, id))",
+    ],
+}
+
+INSERTS = {
+    "former": (
+        "INSERT INTO bench_metrics_former (plant_id, timestamp, soil_moist, humidity, light, temp) "
+        "VALUES (:plant_id, :timestamp, :soil_moist, :humidity, :light, :temp)"
+    ),
+    "compact": (
+        "INSERT INTO bench_metrics_compact "
+        "(plant_id, timestamp, soil_moist_centi, humidity_centi, light_lux, temp_centi) "
+        "VALUES (:plant_id, :timestamp, :soil_moist_centi, :humidity_centi, :light_lux, "
+        ":temp_centi)"
+    ),
+}
+
+BATCH_SIZE = 1000
+
+
+def readings(rows: int, plants: int) -> list[dict]:
+    """Generate readings as they are ingested: every plant reports in turn, in time order."""
+    rnd = random.Random(0)
+    start = datetime.now(timezone.utc) - timedelta(seconds=rows)
+    data = []
+    for index in range(rows):
+        reading = {
+            "plant_id": index % plants + 1,
+            "timestamp": start + timedelta(seconds=index),
+            "soil_moist": rnd.uniform(0, 100),
+            "humidity": rnd.uniform(0, 100),
+            "light": rnd.uniform(0, 65000),
+            "temp": rnd.uniform(-10, 50),
+        }
+        # Fixed-point values, as stored by the Metrics model
+        reading.update(
+            soil_moist_centi=round(reading["soil_moist"] * 100),
+            humidity_centi=round(reading["humidity"] * 100),
+            light_lux=round(reading["light"]),
+            temp_centi=round(reading["temp"] * 100),
+        )
+        data.append(reading)
+    return data
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    plants = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    engine = create_engine(os.environ["DATABASE_URL"])
+    data = readings(rows, plants)
+
+    print(f"{rows} rows, {plants} plants")
+    print(f"{'schema':<10}{'bytes/row':>12}{'heap':>10}{'indexes':>10}{'rows/s':>12}")
+    for name, ddl in SCHEMAS.items():
+        table = f"bench_metrics_{name}"
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            for statement in ddl:
+                connection.execute(text(statement))
+
+        started = time.perf_counter()
+        for index in range(0, rows, BATCH_SIZE):
+            with engine.begin() as connection:
+                connection.execute(text(INSERTS[name]), data[index:index + BATCH_SIZE])
+        elapsed = time.perf_counter() - started
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text(f"VACUUM ANALYZE {table}"))
+            heap, indexes = connection.execute(text(
+                f"SELECT pg_table_size('{table}'), pg_indexes_size('{table}')"
+            )).one()
+            connection.execute(text(f"DROP TABLE {table}"))
+
+        print(
+            f"{name:<10}{(heap + indexes) / rows:>12.1f}{heap / rows:>10.1f}"
+            f"{indexes / rows:>10.1f}{rows / elapsed:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Migration of the metrics table to the compact storage schema (METRICS_STORAGE=compact).
+
+Run it while the backend is stopped: the metrics table is renamed to
+metrics_former, and its rows are copied plant by plant into a new compact
+table. The former table is kept until the migration is run again with
+--drop-former; an interrupted copy restarts from scratch when run again.
+Then start the backend with METRICS_STORAGE=compact.
+
+Usage: DATABASE_URL=postgresql://... python scripts/migrate_metrics_compact.py [--drop-former]
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+load_dotenv()
+
+from app.common.compact_metrics import FORMER_TABLE, migrate_to_compact  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate the metrics table to the compact schema.")
+    parser.add_argument(
+        "--drop-former",
+        action="store_true",
+        help=f"drop the former table ({FORMER_TABLE}) once migrated",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    migrate_to_compact(SessionLocal, drop_former=args.drop_former)
+
+
+if __name__ == "__main__":
+    main()
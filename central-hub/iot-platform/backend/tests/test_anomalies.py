@@ -0,0 +1,145 @@
+"""Tests of the streaming anomaly detection."""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.common.anomalies import AnomalyDetector
+from app.common.constants import ANOMALY_STUCK_READINGS, ANOMALY_WARMUP_READINGS
+
+PLANT_ID = 1
+START = datetime(2025, 6, 1, tzinfo=timezone.utc)
+READING_INTERVAL = timedelta(seconds=30)
+
+
+class Readings:
+    """Readings of a plant every READING_INTERVAL, with noisy values around usual levels."""
+
+    def __init__(self, detector: AnomalyDetector) -> None:
+        self.detector = detector
+        self.rng = np.random.default_rng(0)
+        self.timestamp = START
+
+    def values(self, **overrides: float) -> dict[str, float]:
+        values = {
+            "soil_moist": round(float(self.rng.normal(50, 0.5)), 1),
+            "humidity": round(float(self.rng.normal(60, 0.5)), 1),
+            "light": round(float(self.rng.normal(3000, 20))),
+            "temp": round(float(self.rng.normal(22, 0.2)), 1),
+        }
+        return values | overrides
+
+    def read(self, **overrides: float) -> list:
+        self.timestamp += READING_INTERVAL
+        return self.detector.update(PLANT_ID, self.timestamp, self.values(**overrides))
+
+    def warm_up(self, readings: int = 2 * ANOMALY_WARMUP_READINGS) -> None:
+        for _ in range(readings):
+            assert self.read() == []
+
+
+def test_spike():
+    readings = Readings(AnomalyDetector())
+    readings.warm_up()
+
+    anomalies = readings.read(temp=35.0)
+
+    assert [(anomaly.metric, anomaly.kind) for anomaly in anomalies] == [("temp", "SPIKE")]
+    spike = anomalies[0]
+    assert spike.plant_id == PLANT_ID and spike.value == 35.0
+    assert spike.timestamp == readings.timestamp
+    assert abs(spike.expected - 22) < 0.5
+    assert spike.score > 4
+
+
+def test_no_spike_before_warm_up():
+    readings = Readings(AnomalyDetector())
+    readings.warm_up(ANOMALY_WARMUP_READINGS // 2)
+
+    assert readings.read(temp=35.0) == []
+
+
+def test_no_spike_on_slow_drift():
+    readings = Readings(AnomalyDetector())
+    readings.warm_up()
+
+    # 22°C to 32°C over 10 hours
+    for step in range(1200):
+        assert readings.read(temp=round(22 + step / 120, 2)) == []
+
+
+def test_no_spike_on_light_steps():
+    readings = Readings(AnomalyDetector())
+    readings.warm_up()
+
+    assert readings.read(light=20000) == []
+    assert readings.read(light=0) == []
+
+
+def test_spike_cooldown():
+    readings = Readings(AnomalyDetector())
+    readings.warm_up()
+    assert len(readings.read(temp=35.0)) == 1
+    readings.warm_up(5)
+
+    # Within ANOMALY_SPIKE_COOLDOWN of the previous one
+    assert readings.read(temp=35.0) == []
+
+
+def test_stuck():
+    readings = Readings(AnomalyDetector())
+    readings.warm_up()
+
+    kinds = [
+        [(anomaly.metric, anomaly.kind) for anomaly in readings.read(soil_moist=47.3)]
+        for _ in range(2 * ANOMALY_STUCK_READINGS)
+    ]
+
+    # Reported once, on the ANOMALY_STUCK_READINGS-th identical reading
+    assert kinds[ANOMALY_STUCK_READINGS - 1] == [("soil_moist", "STUCK")]
+    assert sum(map(len, kinds)) == 1
+
+    # Reported again once the readings recovered and got stuck again
+    readings.warm_up(5)
+    kinds = [
+        [anomaly.kind for anomaly in readings.read(soil_moist=47.3)]
+        for _ in range(ANOMALY_STUCK_READINGS)
+    ]
+    assert kinds[-1] == ["STUCK"] and sum(map(len, kinds)) == 1
+
+
+def test_dark_is_not_stuck():
+    readings = Readings(AnomalyDetector())
+    readings.warm_up()
+
+    for _ in range(2 * ANOMALY_STUCK_READINGS):
+        assert readings.read(light=0) == []
+
+
+def test_dropout():
+    detector = AnomalyDetector()
+    readings = Readings(detector)
+    readings.warm_up()
+    mean = detector._states[PLANT_ID, "humidity"].mean
+
+    anomalies = readings.read(humidity=0.0)
+
+    assert [(anomaly.metric, anomaly.kind) for anomaly in anomalies] == [("humidity", "DROPOUT")]
+    assert anomalies[0].expected == mean and anomalies[0].score < -4
+
+    # Reported once, and not folded into the statistics
+    assert readings.read(humidity=0.0) == []
+    assert detector._states[PLANT_ID, "humidity"].mean == mean
+
+    # Reported again after the readings recovered
+    assert readings.read() == []
+    assert [anomaly.kind for anomaly in readings.read(humidity=0.0)] == ["DROPOUT"]
+
+
+def test_out_of_order_readings_ignored():
+    detector = AnomalyDetector()
+    readings = Readings(detector)
+    readings.warm_up()
+
+    assert detector.update(PLANT_ID, START, readings.values(temp=35.0)) == []
+    assert detector._states[PLANT_ID, "temp"].last_timestamp == readings.timestamp
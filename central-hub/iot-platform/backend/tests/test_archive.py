@@ -0,0 +1,112 @@
+"""Tests of the metrics archive: merge on rewrite, reads, buckets merged with the database's."""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.common import archive as archive_module
+from app.common.archive import (
+    archive_buckets,
+    archived_months,
+    count_archive,
+    delete_archive,
+    read_archive,
+    write_month,
+)
+from app.routers.plants import _merge_archive_buckets
+
+pytest.importorskip("pyarrow")
+
+MONTH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(archive_module, "METRICS_ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def row(row_id: int, minutes: int, soil_moist: int = 4000) -> tuple:
+    """Stored row (ARCHIVE_COLUMNS): light in lux, the other metrics in hundredths."""
+    return (row_id, MONTH + timedelta(minutes=minutes), 1000, soil_moist, 5000, 2150)
+
+
+def stored(plant_id: int) -> list[tuple[int, int]]:
+    """(id, minutes) of the archived rows of a plant, in stored order."""
+    return [
+        (row_id, (timestamp - MONTH) // timedelta(minutes=1))
+        for timestamp, row_id, *_ in read_archive(plant_id)
+    ]
+
+
+def test_rewrite_merges_rows():
+    assert write_month(1, MONTH, [row(1, 0), row(2, 10), row(3, 20)]) == 3
+
+    # Rows read again after an interrupted run, and rows stored since, out of order
+    rows = [row(5, 40), row(3, 20, soil_moist=9999), row(4, 20), row(2, 10)]
+    assert write_month(1, MONTH, rows) == 5
+
+    assert stored(1) == [(1, 0), (2, 10), (3, 20), (4, 20), (5, 40)]
+    # Rows archived twice are kept once, as first archived
+    assert [soil_moist for _, row_id, soil_moist, *_ in read_archive(1) if row_id == 3] == [40.0]
+    assert [month.start for month in archived_months(1)] == [MONTH]
+    # Replaced atomically, without leftovers
+    files = archive_module.plant_archive_dir(1).iterdir()
+    assert [path.name for path in files] == ["2026-01.parquet"]
+
+
+def test_read_window_and_values():
+    write_month(1, MONTH, [row(index, 10 * index) for index in range(6)])
+
+    rows = list(read_archive(1, MONTH + timedelta(minutes=10), MONTH + timedelta(minutes=30)))
+
+    assert [row_id for _, row_id, *_ in rows] == [1, 2, 3]
+    # (timestamp, id, soil_moist, humidity, light, temp)
+    assert rows[0] == (MONTH + timedelta(minutes=10), 1, 40.0, 50.0, 1000.0, 21.5)
+    assert count_archive(1, MONTH + timedelta(minutes=10), MONTH + timedelta(minutes=30)) == 3
+    assert count_archive(1) == 6 and count_archive(2) == 0
+
+
+def test_buckets():
+    write_month(1, MONTH, [row(1, 0, 4000), row(2, 10, 5000), row(3, 35, 6000)])
+    start = int(MONTH.timestamp())
+
+    buckets = archive_buckets(1, MONTH, MONTH + timedelta(hours=1), 1800)
+
+    assert sorted(buckets) == [start, start + 1800]
+    count, sums = buckets[start]
+    # Sums of soil_moist, temp, light, humidity
+    assert count == 2 and sums.tolist() == [90.0, 43.0, 2000.0, 100.0]
+
+
+def test_merge_archive_buckets():
+    start = int(MONTH.timestamp())
+    # (timestamp, epoch, soil_moist, temp, light, humidity averages, count) of the database
+    rows = [
+        (start, start, 40.0, 20.0, 1000.0, 50.0, 2),
+        (start + 60, start + 60, 50.0, 20.0, 900.0, 60.0, 1),
+    ]
+    archived = {
+        start: (2, np.array([100.0, 44.0, 3000.0, 80.0])),
+        start - 60: (1, np.array([30.0, 21.0, 500.0, 45.0])),
+    }
+
+    merged = _merge_archive_buckets(rows, archived)
+
+    assert [bucket[0] for bucket in merged] == [start - 60, start, start + 60]
+    # Averages weighted by the number of readings of each side
+    assert merged[1] == (start, start, 45.0, 21.0, 1250.0, 45.0, 4)
+    assert merged[0] == (start - 60, start - 60, 30.0, 21.0, 500.0, 45.0, 1)
+    assert merged[2] == rows[1]
+
+
+def test_delete_archive():
+    write_month(1, MONTH, [row(1, 0)])
+    february = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    write_month(1, february, [(2, february, 1000, 4000, 5000, 2150)])
+
+    assert delete_archive(1, before=february) == 1
+    assert [month.start for month in archived_months(1)] == [february]
+    assert delete_archive(1) == 1
+    assert not archive_module.plant_archive_dir(1).exists()
@@ -0,0 +1,59 @@
+"""Tests of the daily statistics percentile estimates."""
+
+import numpy as np
+import pytest
+
+from app.common.constants import STATS_HISTOGRAM_BINS
+from app.common.daily_stats import histogram_bins, histogram_percentiles, sensor_range
+
+PERCENTILES = [0, 5, 25, 50, 75, 95, 100]
+
+
+def _histogram(metric: str, values: np.ndarray) -> list[int]:
+    return np.bincount(histogram_bins(metric, values), minlength=STATS_HISTOGRAM_BINS).tolist()
+
+
+@pytest.mark.parametrize(
+    "metric, values",
+    [
+        ("soil_moist", np.random.default_rng(0).uniform(20, 80, 5000)),
+        ("humidity", np.random.default_rng(1).normal(55, 8, 5000)),
+        ("light", np.random.default_rng(2).exponential(4000, 5000)),
+        ("temp", np.random.default_rng(3).normal(22, 3, 5000)),
+    ],
+)
+def test_percentiles_within_a_bin(metric, values):
+    low, high = sensor_range(metric)
+    values = np.clip(values, low, high)
+
+    histogram = _histogram(metric, values)
+    estimates = histogram_percentiles(metric, histogram, values.min(), values.max(), PERCENTILES)
+
+    width = (high - low) / STATS_HISTOGRAM_BINS
+    assert estimates == pytest.approx(np.percentile(values, PERCENTILES).tolist(), abs=width)
+    assert estimates == sorted(estimates)
+
+
+def test_percentiles_clamped_to_extremes():
+    values = np.array([21.3, 21.4, 21.5])
+
+    estimates = histogram_percentiles("temp", _histogram("temp", values), 21.3, 21.5, [0, 50, 100])
+
+    # All the values share a bin wider than their range
+    assert estimates[0] == 21.3
+    assert 21.3 <= estimates[1] <= 21.5
+    assert estimates[2] == 21.5
+
+
+def test_percentiles_single_value():
+    histogram = _histogram("humidity", np.array([40.0] * 10))
+    estimates = histogram_percentiles("humidity", histogram, 40.0, 40.0, PERCENTILES)
+
+    assert estimates == [40.0] * len(PERCENTILES)
+
+
+def test_out_of_range_values_in_edge_bins():
+    bins = histogram_bins("soil_moist", np.array([-5.0, 0.0, 50.0, 100.0, 130.0]))
+
+    last = STATS_HISTOGRAM_BINS - 1
+    assert bins.tolist() == [0, 0, STATS_HISTOGRAM_BINS // 2, last, last]
@@ -0,0 +1,180 @@
+"""Tests of the event buses: dispatch, handler isolation, notifications and resync."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+
+from app.common import event_bus as event_bus_module
+from app.common import events
+from app.common.event_bus import (
+    NOTIFY_MAX_PAYLOAD,
+    RESYNC,
+    BusEvent,
+    InProcessEventBus,
+    PostgresEventBus,
+)
+from app.common.versions import plant_key, versions
+
+
+def _recorder(bus, kind: str, name: str, calls: list) -> None:
+    async def handler(event: BusEvent) -> None:
+        calls.append((name, event.kind, event.data, event.local))
+
+    bus.subscribe(kind, handler)
+
+
+def _remote_event(kind: str) -> dict:
+    """Event as received from another process."""
+    time = datetime.now(timezone.utc).isoformat()
+    return {"kind": kind, "origin": "other-process", "time": time, "data": {}}
+
+
+async def test_dispatch_order():
+    bus = InProcessEventBus()
+    calls = []
+    _recorder(bus, "a", "first", calls)
+    _recorder(bus, "a", "second", calls)
+    _recorder(bus, "b", "other", calls)
+
+    await bus.publish("a", {"n": 1})
+    await bus.publish("b", {"n": 2})
+    await bus.publish("a", {"n": 3})
+
+    assert [(name, data["n"]) for name, _, data, _ in calls] == [
+        ("first", 1), ("second", 1), ("other", 2), ("first", 3), ("second", 3),
+    ]
+    assert bus.published == 3
+
+
+async def test_data_decoded_from_json():
+    bus = InProcessEventBus()
+    calls = []
+    _recorder(bus, "a", "handler", calls)
+
+    await bus.publish("a", {"ids": (1, 2), "at": "2026-01-01T00:00:00+00:00"})
+
+    assert calls[0][2] == {"ids": [1, 2], "at": "2026-01-01T00:00:00+00:00"}
+
+
+async def test_local_flag():
+    bus = InProcessEventBus()
+    calls = []
+    _recorder(bus, "a", "handler", calls)
+
+    await bus.publish("a", {})
+    await bus._dispatch(_remote_event("a"))
+
+    assert [local for *_, local in calls] == [True, False]
+
+
+async def test_handler_isolation():
+    bus = InProcessEventBus()
+    calls = []
+
+    async def failing(event: BusEvent) -> None:
+        raise RuntimeError("boom")
+
+    bus.subscribe("a", failing)
+    _recorder(bus, "a", "after", calls)
+
+    await bus.publish("a", {"n": 1})
+
+    assert [name for name, *_ in calls] == ["after"]
+    assert bus.failed == 1
+
+
+@pytest.fixture
+async def postgres_bus():
+    """Postgres bus whose notifications are recorded instead of sent."""
+    bus = PostgresEventBus()
+    bus.notified = []
+    bus._notify = bus.notified.append
+    bus._delivery = asyncio.create_task(bus._deliver())
+    yield bus
+    await bus.stop()
+
+
+async def test_notifications_in_publication_order(postgres_bus):
+    calls = []
+    _recorder(postgres_bus, "a", "handler", calls)
+
+    for n in range(5):
+        await postgres_bus.publish("a", {"n": n})
+    await postgres_bus._outbox.join()
+
+    assert [data["n"] for _, _, data, _ in calls] == list(range(5))
+    notified = [orjson.loads(payload) for payload in postgres_bus.notified]
+    assert [event["data"]["n"] for event in notified] == list(range(5))
+
+
+async def test_oversize_payload_not_sent(postgres_bus):
+    calls = []
+    _recorder(postgres_bus, "a", "handler", calls)
+
+    await postgres_bus.publish("a", {"text": "x" * NOTIFY_MAX_PAYLOAD})
+    await postgres_bus.publish("a", {"text": "small"})
+    await postgres_bus._outbox.join()
+
+    # Still handled by the publishing process
+    assert len(calls) == 2
+    assert len(postgres_bus.notified) == 1 and b"small" in postgres_bus.notified[0]
+    assert postgres_bus.failed == 1
+
+
+async def test_stop_sends_the_pending_notifications(postgres_bus):
+    for n in range(3):
+        await postgres_bus.publish("a", {"n": n})
+    assert postgres_bus.stats()["pending"] == 3
+
+    await postgres_bus.stop()
+
+    assert len(postgres_bus.notified) == 3
+    assert postgres_bus.stats()["pending"] == 0
+
+
+async def test_resync_after_reconnection(monkeypatch):
+    monkeypatch.setattr(event_bus_module, "EVENT_BUS_RECONNECT_INTERVAL", 0)
+    bus = PostgresEventBus()
+    calls = []
+    _recorder(bus, "a", "handler", calls)
+    _recorder(bus, RESYNC, "resync", calls)
+    attempts = []
+
+    def listen() -> None:
+        attempts.append(True)
+        if len(attempts) < 2:
+            raise event_bus_module.psycopg2.OperationalError("connection refused")
+        bus._listener = object()
+
+    bus._listen = listen
+    # Received before the connection was lost, not yet handled
+    bus._queue.put_nowait(_remote_event("a"))
+    await bus._reconnect_listener()
+    bus._consumer = asyncio.create_task(bus._consume())
+    await asyncio.sleep(0)
+    bus._listener = None
+    await bus.stop()
+
+    assert len(attempts) == 2
+    assert [(name, local) for name, *_, local in calls] == [("handler", False), ("resync", True)]
+    assert (bus.received, bus.stats()["resyncs"]) == (1, 1)
+
+
+async def test_resync_handler(monkeypatch):
+    reloads = []
+    monkeypatch.setattr(events, "init_live_state", lambda: reloads.append(True))
+    cleared = []
+    monkeypatch.setattr(events.history_cache, "clear", lambda: cleared.append("history"))
+    monkeypatch.setattr(events.trend_forecaster, "clear", lambda: cleared.append("forecasts"))
+    key = plant_key(424242)
+    versions.bump(key, at=datetime.now(timezone.utc) - timedelta(hours=1))
+    before = versions.validators(key)[0]
+
+    at = datetime.now(timezone.utc)
+    await events._on_resync(BusEvent(kind=RESYNC, data={}, local=True, time=at))
+
+    assert cleared == ["history", "forecasts"]
+    assert reloads == [True]
+    assert versions.validators(key)[0] != before
@@ -0,0 +1,64 @@
+"""Tests of the metrics export writers."""
+
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+
+from app.common.export import EXPORT_COLUMNS, _chunks, _csv_chunks, _ndjson_chunks, _parquet_chunks
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ROWS = [
+    (plant_id, START + timedelta(minutes=index), 40.5 + index, 60.25, 1200.0 + index, 21.5 - index)
+    for plant_id in (1, 2)
+    for index in range(3)
+]
+
+
+def test_chunks():
+    assert list(_chunks(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(_chunks(iter(range(6)), 3)) == [[0, 1, 2], [3, 4, 5]]
+    assert list(_chunks(iter(()), 3)) == []
+
+
+def test_csv():
+    chunks = list(_csv_chunks(_chunks(ROWS, 4)))
+
+    # Header, then a chunk per partition
+    assert len(chunks) == 3
+    lines = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert lines[0] == list(EXPORT_COLUMNS)
+    assert lines[1:] == [
+        [str(value) for value in (plant_id, timestamp.isoformat(), *values)]
+        for plant_id, timestamp, *values in ROWS
+    ]
+
+
+def test_csv_without_rows():
+    assert b"".join(_csv_chunks(_chunks([], 4))).decode().splitlines() == [",".join(EXPORT_COLUMNS)]
+
+
+def test_ndjson():
+    chunks = list(_ndjson_chunks(_chunks(ROWS, 4)))
+
+    assert len(chunks) == 2
+    objects = [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+    assert objects == [
+        dict(zip(EXPORT_COLUMNS, (plant_id, timestamp.isoformat(), *values)))
+        for plant_id, timestamp, *values in ROWS
+    ]
+
+
+def test_parquet():
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    chunks = list(_parquet_chunks(_chunks(ROWS, 4)))
+
+    file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    # A row group per partition
+    assert file.metadata.num_row_groups == 2
+    table = file.read()
+    assert table.column_names == list(EXPORT_COLUMNS)
+    assert [tuple(row.values()) for row in table.to_pylist()] == ROWS
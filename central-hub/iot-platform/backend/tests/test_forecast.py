@@ -0,0 +1,146 @@
+"""Tests of the trend forecaster cache: hits, invalidation and incremental bucket reads."""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.common import forecast as forecast_module
+from app.common.constants import ROLLUP_INTERVAL
+from app.common.forecast import TrendForecaster
+from app.common.rollups import METRIC_COLUMNS
+from app.common.versions import plant_key, versions
+from app.models.plant import Plant
+
+BUCKET = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeRollups:
+    """Rollup buckets of the plants, answering the forecaster's queries (recorded)."""
+
+    def __init__(self) -> None:
+        self.rows: list[SimpleNamespace] = []
+        self.queries: list[tuple[list[int], datetime]] = []
+
+    def add(self, plant_id: int, bucket: datetime, soil_moist: float, count: int = 60) -> None:
+        values = {"soil_moist": soil_moist, "humidity": 50.0, "light": 1000.0, "temp": 21.0}
+        sums = {f"{column}_sum": values[column] * count for column in METRIC_COLUMNS}
+        self.rows = [row for row in self.rows if (row.plant_id, row.bucket) != (plant_id, bucket)]
+        self.rows.append(SimpleNamespace(plant_id=plant_id, bucket=bucket, count=count, **sums))
+
+    def execute(self, statement):
+        params = statement.compile().params
+        plant_ids = next(value for value in params.values() if isinstance(value, list))
+        since = next(value for value in params.values() if isinstance(value, datetime))
+        self.queries.append((sorted(plant_ids), since))
+        rows = [row for row in self.rows if row.plant_id in plant_ids and row.bucket >= since]
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+
+def plant(plant_id: int) -> Plant:
+    return Plant(
+        id=plant_id, name="Basil", module_id=None,
+        min_soil_moist=20, max_soil_moist=80, min_humidity=30, max_humidity=70,
+        min_light=100, max_light=10_000, min_temp=10, max_temp=30,
+    )
+
+
+@pytest.fixture
+def rollups(monkeypatch):
+    """Drying plants: 8 closed buckets and the current one, the current bucket being BUCKET."""
+    current = {"bucket": BUCKET}
+    monkeypatch.setattr(forecast_module, "rollup_bucket", lambda now: current["bucket"])
+    rollups = FakeRollups()
+    rollups.current = current
+    for plant_id in (901, 902):
+        for index in range(9):
+            bucket = BUCKET - timedelta(seconds=ROLLUP_INTERVAL * (8 - index))
+            rollups.add(plant_id, bucket, 60 - index)
+    return rollups
+
+
+def bump(plant_id: int) -> None:
+    versions.bump(plant_key(plant_id), at=datetime.now(timezone.utc))
+
+
+async def test_cached_until_invalidated(rollups):
+    forecaster = TrendForecaster()
+    plants = [plant(901), plant(902)]
+
+    first = await forecaster.forecast(rollups, plants)
+    again = await forecaster.forecast(rollups, plants)
+
+    assert again == first and again[0].metrics["soil_moist"].trend == "falling"
+    assert (forecaster.hits, forecaster.fits, forecaster.fitted_plants) == (2, 1, 2)
+    assert len(rollups.queries) == 1
+
+
+async def test_new_reading_refreshes_the_plant(rollups):
+    forecaster = TrendForecaster()
+    plants = [plant(901), plant(902)]
+    await forecaster.forecast(rollups, plants)
+
+    # A reading of the first plant changes its version and its current bucket
+    rollups.add(901, BUCKET, 30, count=61)
+    bump(901)
+    [first, second] = await forecaster.forecast(rollups, plants)
+
+    assert (forecaster.hits, forecaster.fits, forecaster.fitted_plants) == (1, 2, 3)
+    assert first.metrics["soil_moist"].current == 30
+    assert second.metrics["soil_moist"].current == 52
+    # Only the current bucket is read again
+    assert rollups.queries[-1] == ([901], BUCKET)
+
+
+async def test_new_bucket_refreshes_all(rollups):
+    forecaster = TrendForecaster()
+    plants = [plant(901), plant(902)]
+    await forecaster.forecast(rollups, plants)
+
+    rollups.current["bucket"] = BUCKET + timedelta(seconds=ROLLUP_INTERVAL)
+    forecasts = await forecaster.forecast(rollups, plants)
+
+    assert forecaster.fits == 2 and forecaster.hits == 0
+    bucket = int(rollups.current["bucket"].timestamp())
+    assert all(forecast.bucket == bucket for forecast in forecasts)
+    # The bucket that was current is now closed: read again, with the new one
+    assert rollups.queries[-1] == ([901, 902], BUCKET)
+    assert forecasts[0].metrics["soil_moist"].points == 9
+
+
+@pytest.mark.parametrize("drop", ["forget", "clear"])
+async def test_dropped_plants_reloaded(rollups, drop):
+    forecaster = TrendForecaster()
+    await forecaster.forecast(rollups, [plant(901)])
+
+    if drop == "forget":
+        forecaster.forget(901)
+    else:
+        forecaster.clear()
+    await forecaster.forecast(rollups, [plant(901)])
+
+    assert forecaster.fits == 2
+    # The whole window is read again
+    window_start = BUCKET - timedelta(seconds=forecast_module.FORECAST_WINDOW)
+    assert rollups.queries[-1] == ([901], window_start)
+
+
+async def test_failed_fit_reloads_the_buckets(rollups, monkeypatch):
+    forecaster = TrendForecaster()
+    fit_trends = forecast_module.fit_trends
+    calls = []
+
+    def failing_once(*args):
+        calls.append(True)
+        if len(calls) == 1:
+            raise RuntimeError("worker died")
+        return fit_trends(*args)
+
+    monkeypatch.setattr(forecast_module, "fit_trends", failing_once)
+    with pytest.raises(RuntimeError):
+        await forecaster.forecast(rollups, [plant(901)])
+    [forecast] = await forecaster.forecast(rollups, [plant(901)])
+
+    window_start = BUCKET - timedelta(seconds=forecast_module.FORECAST_WINDOW)
+    assert rollups.queries == [([901], window_start)] * 2
+    assert forecast.metrics["soil_moist"].points == 9
@@ -0,0 +1,126 @@
+"""Tests of the history cache: readings folded into the entries, skipped once included."""
+
+from datetime import datetime, timedelta, timezone
+
+from app.common.history_cache import METRICS, HistoryCache
+
+START = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+INTERVAL = 300
+
+
+def values(soil_moist: float) -> dict[str, float]:
+    return {"soil_moist": soil_moist, "temp": 21.0, "light": 1000.0, "humidity": 50.0}
+
+
+def raw_columns(timestamps: list[datetime]) -> dict[str, list]:
+    columns = {"timestamp": list(timestamps)}
+    for column, name, _ in METRICS:
+        columns[name] = [values(40.0)[column]] * len(timestamps)
+    return columns
+
+
+def bucket_columns(buckets: list[int], soil_moist: list[float]) -> dict[str, list]:
+    count = len(buckets)
+    return {
+        "timestamp": list(buckets),
+        "soilMoist": list(soil_moist),
+        "temp": [21.0] * count,
+        "light": [1000.0] * count,
+        "humidity": [50.0] * count,
+    }
+
+
+def as_seconds(value: datetime | int) -> int:
+    """Seconds from START of a datetime or epoch seconds."""
+    epoch = value.timestamp() if isinstance(value, datetime) else value
+    return int(epoch - START.timestamp())
+
+
+def test_raw_entry_appends_readings():
+    cache = HistoryCache()
+    timestamps = [START + timedelta(seconds=30 * i) for i in range(3)]
+    cache.put(1, "1h", 0, 30, raw_columns(timestamps), raw=True)
+
+    cache.add_reading(1, timestamps[-1] + timedelta(seconds=30), values(42.123))
+
+    columns = cache.get(1, "1h", 0, START)
+    assert columns["timestamp"][-1] == timestamps[-1] + timedelta(seconds=30)
+    assert columns["soilMoist"][-1] == 42.12
+    assert cache.stats()["points"] == 4 and cache.updates == 1
+
+
+def test_raw_entry_fills_gaps():
+    cache = HistoryCache()
+    cache.put(1, "1h", 0, 30, raw_columns([START]), raw=True)
+
+    # Two intervals missed: null slots every interval after the last measurement
+    cache.add_reading(1, START + timedelta(seconds=90), values(42))
+
+    columns = cache.get(1, "1h", 0, START)
+    assert [as_seconds(t) for t in columns["timestamp"]] == [0, 30, 60, 90]
+    assert columns["soilMoist"] == [40.0, None, None, 42]
+
+
+def test_included_readings_skipped():
+    cache = HistoryCache()
+    timestamps = [START + timedelta(seconds=30 * i) for i in range(3)]
+    cache.put(1, "1h", 0, 30, raw_columns(timestamps), raw=True)
+    bucket = int(START.timestamp())
+    cache.put(1, "24h", bucket, INTERVAL, bucket_columns([bucket], [40.0]), raw=False,
+              last_count=2, last_sums=[80.0, 42.0, 2000.0, 100.0], last_timestamp=timestamps[1])
+
+    # Already read from the database by both entries
+    cache.add_reading(1, timestamps[1], values(99))
+
+    assert cache.get(1, "1h", 0, START)["soilMoist"] == [40.0] * 3
+    assert cache.get(1, "24h", bucket, START)["soilMoist"] == [40.0]
+    assert cache.updates == 0
+
+
+def test_bucket_entry_updates_last_bucket():
+    cache = HistoryCache()
+    buckets = [int(START.timestamp()) - INTERVAL, int(START.timestamp())]
+    cache.put(1, "24h", buckets[0], INTERVAL, bucket_columns(buckets, [30.0, 40.0]), raw=False,
+              last_count=2, last_sums=[80.0, 42.0, 2000.0, 100.0], last_timestamp=START)
+
+    cache.add_reading(1, START + timedelta(seconds=60), values(49))
+    cache.add_reading(1, START + timedelta(seconds=90), values(59))
+
+    # Running average of the last bucket only
+    assert cache.get(1, "24h", buckets[0], START)["soilMoist"] == [30.0, 47.0]
+    assert cache.updates == 2
+
+
+def test_bucket_entry_dropped_for_a_new_bucket():
+    cache = HistoryCache()
+    bucket = int(START.timestamp())
+    cache.put(1, "24h", bucket, INTERVAL, bucket_columns([bucket], [40.0]), raw=False,
+              last_count=1, last_sums=[40.0, 21.0, 1000.0, 50.0], last_timestamp=START)
+
+    cache.add_reading(1, START + timedelta(seconds=INTERVAL), values(42))
+
+    assert cache.get(1, "24h", bucket, START) is None
+    assert cache.stats()["points"] == 0
+
+
+def test_other_plants_untouched():
+    cache = HistoryCache()
+    cache.put(1, "1h", 0, 30, raw_columns([START]), raw=True)
+
+    cache.add_reading(2, START + timedelta(seconds=30), values(42))
+
+    assert cache.get(1, "1h", 0, START)["soilMoist"] == [40.0]
+
+
+def test_appended_points_count_towards_the_cap():
+    cache = HistoryCache(max_points=5)
+    cache.put(1, "1h", 0, 30, raw_columns([START, START + timedelta(seconds=30)]), raw=True)
+    cache.put(2, "1h", 0, 30, raw_columns([START, START + timedelta(seconds=30)]), raw=True)
+    cache.get(1, "1h", 0, START)
+
+    cache.add_reading(1, START + timedelta(seconds=60), values(42))
+    cache.add_reading(1, START + timedelta(seconds=90), values(42))
+
+    # The least recently used entry is evicted
+    assert cache.get(2, "1h", 0, START) is None
+    assert cache.stats()["points"] == 4 and cache.evictions == 1
@@ -0,0 +1,98 @@
+"""Tests of the history response formats: points and columnar layouts of the same columns."""
+
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi import Response
+
+from app.common.responses import fast_json
+from app.routers.plants import _history_columns, _history_data
+from app.schemas.metrics import HistoryColumnsResponse, HistoryMetricsResponse
+
+START = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def columns(timestamps: list) -> dict[str, list]:
+    count = len(timestamps)
+    return _history_columns(
+        timestamps,
+        [40.123 + index for index in range(count)],
+        [21.456] * count,
+        [1000.4] * count,
+        [50.0] * count,
+    )
+
+
+def rendered(data) -> object:
+    """Data as sent by the endpoints."""
+    return orjson.loads(fast_json(data, Response()).body)
+
+
+def test_points():
+    epochs = [int(START.timestamp()) + 3600 * index for index in range(3)]
+
+    data = rendered(_history_data(columns(epochs), "points", step=3600))
+
+    assert len(data) == 3
+    assert data[0] == {
+        "timestamp": "2026-03-10T12:00:00Z",
+        "soilMoist": 40.12,
+        "temp": 21.46,
+        "light": 1000.0,
+        "humidity": 50.0,
+    }
+    assert [HistoryMetricsResponse.model_validate(point) for point in data]
+
+
+def test_columnar_regular_grid():
+    start = int(START.timestamp())
+    epochs = [start + 3600 * index for index in range(3)]
+
+    data = rendered(_history_data(columns(epochs), "columnar", step=3600))
+
+    # The timestamps come down to the grid's start and step
+    assert data == {
+        "start": start,
+        "step": 3600,
+        "timestamps": None,
+        "soilMoist": [40.12, 41.12, 42.12],
+        "temp": [21.46] * 3,
+        "light": [1000.0] * 3,
+        "humidity": [50.0] * 3,
+    }
+    assert HistoryColumnsResponse.model_validate(data)
+
+
+def test_columnar_irregular_points():
+    # Actual measurements (datetimes) with a null slot (epoch seconds) in a gap
+    timestamps = [START, START + timedelta(seconds=30.1234), int(START.timestamp()) + 60]
+    data_columns = columns(timestamps)
+    data_columns["soilMoist"][2] = None
+
+    data = rendered(_history_data(data_columns, "columnar"))
+
+    assert (data["start"], data["step"]) == (None, None)
+    epoch = START.timestamp()
+    assert data["timestamps"] == [epoch, epoch + 30.123, epoch + 60]
+    assert data["soilMoist"] == [40.12, 41.12, None]
+    assert HistoryColumnsResponse.model_validate(data)
+
+
+def test_same_points_in_both_formats():
+    timestamps = [START + timedelta(seconds=30 * index) for index in range(4)]
+    data_columns = columns(timestamps)
+
+    points = rendered(_history_data(data_columns, "points"))
+    columnar = rendered(_history_data(data_columns, "columnar"))
+
+    for index, point in enumerate(points):
+        timestamp = datetime.fromisoformat(point["timestamp"])
+        assert timestamp.timestamp() == columnar["timestamps"][index]
+        for name in ("soilMoist", "temp", "light", "humidity"):
+            assert point[name] == columnar[name][index]
+
+
+def test_columnar_empty():
+    data = rendered(_history_data(columns([]), "columnar", step=3600))
+
+    assert data["start"] is None and data["soilMoist"] == []
@@ -0,0 +1,92 @@
+"""Tests of the latest metrics snapshot: upsert at ingestion, backfill (database tests)."""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.common.latest_metrics import backfill_latest_metrics, upsert_latest_metrics
+from app.models.metrics import Metrics
+from app.models.plant import Plant
+from app.models.plant_latest_metrics import PlantLatestMetrics
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def reading(soil_moist: float) -> dict[str, float]:
+    return {"soil_moist": soil_moist, "humidity": 50.0, "light": 1000.0, "temp": 21.0}
+
+
+def add_plant(session, name: str = "Basil", **kwargs) -> Plant:
+    plant = Plant(
+        name=name, module_id=None,
+        min_soil_moist=20, max_soil_moist=80, min_humidity=30, max_humidity=70,
+        min_light=100, max_light=10_000, min_temp=10, max_temp=30,
+        **kwargs,
+    )
+    session.add(plant)
+    session.flush()
+    return plant
+
+
+def latest(session, plant_id: int) -> tuple[datetime, float] | None:
+    row = session.execute(
+        select(PlantLatestMetrics.timestamp, PlantLatestMetrics.soil_moist)
+        .where(PlantLatestMetrics.plant_id == plant_id)
+    ).first()
+    return tuple(row) if row else None
+
+
+def test_upsert_inserts_then_updates(db_session):
+    plant = add_plant(db_session)
+
+    upsert_latest_metrics(db_session, plant.id, NOW, reading(40))
+    assert latest(db_session, plant.id) == (NOW, 40)
+
+    upsert_latest_metrics(db_session, plant.id, NOW + timedelta(seconds=30), reading(42))
+    assert latest(db_session, plant.id) == (NOW + timedelta(seconds=30), 42)
+
+
+def test_upsert_keeps_the_newest_reading(db_session):
+    plant = add_plant(db_session)
+    upsert_latest_metrics(db_session, plant.id, NOW, reading(40))
+
+    # Out of order (e.g. a concurrent ingestion committed first)
+    upsert_latest_metrics(db_session, plant.id, NOW - timedelta(seconds=30), reading(38))
+    assert latest(db_session, plant.id) == (NOW, 40)
+
+    # A tie is taken as the latest write
+    upsert_latest_metrics(db_session, plant.id, NOW, reading(41))
+    assert latest(db_session, plant.id) == (NOW, 41)
+
+
+def test_upsert_one_row_per_plant(db_session):
+    first, second = add_plant(db_session), add_plant(db_session, "Mint")
+
+    for index in range(3):
+        upsert_latest_metrics(db_session, first.id, NOW + timedelta(seconds=index), reading(index))
+    upsert_latest_metrics(db_session, second.id, NOW, reading(60))
+
+    plant_ids = db_session.execute(
+        select(PlantLatestMetrics.plant_id)
+        .where(PlantLatestMetrics.plant_id.in_([first.id, second.id]))
+    ).scalars().all()
+    assert sorted(plant_ids) == [first.id, second.id]
+    assert latest(db_session, first.id) == (NOW + timedelta(seconds=2), 2)
+
+
+def test_backfill_missing_snapshots(db_session):
+    missing, present = add_plant(db_session), add_plant(db_session, "Mint")
+    deleted = add_plant(db_session, "Thyme", deleted_at=NOW)
+    for plant in (missing, present, deleted):
+        for index in range(3):
+            timestamp = NOW - timedelta(minutes=index)
+            db_session.add(Metrics(plant_id=plant.id, timestamp=timestamp, **reading(40 - index)))
+    upsert_latest_metrics(db_session, present.id, NOW + timedelta(minutes=1), reading(70))
+    db_session.flush()
+
+    backfill_latest_metrics(db_session)
+
+    assert latest(db_session, missing.id) == (NOW, 40)
+    # Existing snapshots and deleted plants are left as is
+    assert latest(db_session, present.id) == (NOW + timedelta(minutes=1), 70)
+    assert latest(db_session, deleted.id) is None
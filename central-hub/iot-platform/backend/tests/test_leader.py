@@ -0,0 +1,116 @@
+"""Tests of the leader election (advisory lock failover)."""
+
+import asyncio
+import threading
+
+import psycopg2
+import pytest
+
+from app.common import leader as leader_module
+from app.common.leader import LeaderLock
+
+
+class FakeServer:
+    """Database server holding the advisory locks of its connections."""
+
+    def __init__(self) -> None:
+        self.locks: dict[int, "FakeConnection"] = {}
+        self.connections: list["FakeConnection"] = []
+        self.timeouts: list[float | None] = []
+        self.threads: set[int] = set()
+
+    def connect(self, timeout: float | None = None) -> "FakeConnection":
+        self.timeouts.append(timeout)
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+    def terminate(self, connection: "FakeConnection") -> None:
+        """Kill a connection (e.g. network failure): its locks are released."""
+        connection.terminated = True
+        self.locks = {key: holder for key, holder in self.locks.items() if holder is not connection}
+
+
+class FakeConnection:
+    def __init__(self, server: FakeServer) -> None:
+        self.server = server
+        self.terminated = False
+        self.closed = False
+        self._result = None
+
+    def cursor(self) -> "FakeConnection":
+        return self
+
+    def __enter__(self) -> "FakeConnection":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute(self, query: str, params: tuple = ()) -> None:
+        self.server.threads.add(threading.get_ident())
+        if self.terminated:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        if "pg_try_advisory_lock" in query:
+            holder = self.server.locks.setdefault(params[0], self)
+            self._result = (holder is self,)
+        else:
+            self._result = (1,)
+
+    def fetchone(self) -> tuple:
+        return self._result
+
+    def close(self) -> None:
+        self.closed = True
+        self.server.terminate(self)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(leader_module, "unpooled_connection", server.connect)
+    return server
+
+
+async def test_failover(server):
+    first, second = LeaderLock("tasks"), LeaderLock("tasks")
+
+    assert await first.acquire()
+    assert not await second.acquire()
+    assert await first.acquire()
+
+    # The leader's connection is lost: it steps down, and the other process takes over
+    server.terminate(first._connection)
+    assert not await first.acquire()
+    assert await second.acquire()
+    assert not await first.acquire()
+
+    # The new leader stops: the lock is acquired again by the first process
+    second.release()
+    assert await first.acquire()
+    assert not await second.acquire()
+
+
+async def test_checks_off_the_event_loop(server):
+    lock = LeaderLock("tasks")
+
+    assert await lock.acquire()
+
+    assert threading.get_ident() not in server.threads
+    assert server.timeouts == [leader_module.LEADER_LOCK_TIMEOUT]
+
+
+async def test_other_locks_are_independent(server):
+    tasks, other = LeaderLock("tasks"), LeaderLock("other")
+
+    assert await tasks.acquire()
+    assert await other.acquire()
+
+
+async def test_concurrent_checks_share_the_connection(server):
+    lock = LeaderLock("tasks")
+
+    results = await asyncio.gather(*(lock.acquire() for _ in range(6)))
+
+    assert results == [True] * 6
+    assert len(server.connections) == 1
@@ -0,0 +1,59 @@
+"""Tests of the raw metrics pagination cursors."""
+
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers.plants import _decode_metrics_cursor, _encode_metrics_cursor
+
+
+@pytest.mark.parametrize(
+    "timestamp, row_id",
+    [
+        (datetime(2025, 3, 14, 15, 9, 26, 535897, tzinfo=timezone.utc), 42),
+        (datetime(2025, 1, 1, tzinfo=timezone.utc), 1),
+        (datetime(1970, 1, 1, tzinfo=timezone.utc), 0),
+        (datetime(2099, 12, 31, 23, 59, 59, 999999, tzinfo=timezone.utc), 2**62),
+    ],
+)
+def test_cursor_round_trip(timestamp, row_id):
+    cursor = _encode_metrics_cursor(timestamp, row_id)
+
+    assert "=" not in cursor
+    assert _decode_metrics_cursor(cursor) == (timestamp, row_id)
+
+
+def test_cursor_keeps_order():
+    earlier = datetime(2025, 6, 1, 12, 0, 0, 1, tzinfo=timezone.utc)
+    later = datetime(2025, 6, 1, 12, 0, 0, 2, tzinfo=timezone.utc)
+
+    first = _decode_metrics_cursor(_encode_metrics_cursor(earlier, 9))
+    assert first < _decode_metrics_cursor(_encode_metrics_cursor(later, 1))
+
+
+def _encode(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not a cursor!",
+        "A",
+        _encode("123"),
+        _encode("123:45:6"),
+        _encode("abc:1"),
+        _encode("1.5:1"),
+        _encode(f"{10**20}:1"),
+        base64.urlsafe_b64encode(b"\xff\xfe:1").decode(),
+    ],
+)
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_metrics_cursor(cursor)
+
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid cursor"
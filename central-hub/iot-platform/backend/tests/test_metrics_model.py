@@ -0,0 +1,75 @@
+"""Tests of the fixed-point values of the compact metrics schema."""
+
+import pytest
+from sqlalchemy import MetaData
+
+from app.common.constants import SENSOR_THRESHOLDS
+from app.models.metrics import COMPACT_COLUMNS, compact_table, scaled_value
+
+
+class Reading:
+    """Plain object with the compact metrics columns and their float values."""
+
+    soil_moist_centi = humidity_centi = light_lux = temp_centi = None
+
+    soil_moist = scaled_value("soil_moist", "soil_moist_centi", 100, "SOIL_MOIST")
+    humidity = scaled_value("humidity", "humidity_centi", 100, "HUMIDITY")
+    light = scaled_value("light", "light_lux", 1, "LIGHT")
+    temp = scaled_value("temp", "temp_centi", 100, "TEMP")
+
+
+@pytest.mark.parametrize(
+    "value, column, stored",
+    [
+        ("soil_moist", "soil_moist_centi", 42.37),
+        ("humidity", "humidity_centi", 99.99),
+        ("light", "light_lux", 1234.0),
+        ("temp", "temp_centi", -5.5),
+    ],
+)
+def test_round_trip(value, column, stored):
+    reading = Reading()
+    setattr(reading, value, stored)
+
+    assert isinstance(getattr(reading, column), int)
+    assert getattr(reading, value) == stored
+
+
+def test_rounded_to_the_scale():
+    reading = Reading()
+    reading.soil_moist = 42.3449
+    reading.temp = 21.996
+    reading.light = 1234.6
+
+    assert (reading.soil_moist_centi, reading.temp_centi, reading.light_lux) == (4234, 2200, 1235)
+    assert (reading.soil_moist, reading.temp, reading.light) == (42.34, 22.0, 1235)
+
+
+@pytest.mark.parametrize("value, _, scale, sensor", COMPACT_COLUMNS)
+def test_clamped_to_the_sensor_range(value, _, scale, sensor):
+    low, high = SENSOR_THRESHOLDS[sensor]["MIN"], SENSOR_THRESHOLDS[sensor]["MAX"]
+    reading = Reading()
+
+    for stored in (low, high):
+        setattr(reading, value, stored)
+        assert getattr(reading, value) == stored
+
+    setattr(reading, value, high + 0.004)
+    assert getattr(reading, value) == high
+    setattr(reading, value, high * 10)
+    assert getattr(reading, value) == high
+    setattr(reading, value, low - 1)
+    assert getattr(reading, value) == low
+
+
+@pytest.mark.parametrize("value, column, scale, sensor", COMPACT_COLUMNS)
+def test_clamped_within_the_bounds_check(value, column, scale, sensor):
+    low, high = SENSOR_THRESHOLDS[sensor]["MIN"] * scale, SENSOR_THRESHOLDS[sensor]["MAX"] * scale
+    table = compact_table(MetaData(), partitioned=False)
+    check = next(c for c in table.constraints if c.name == f"check_{column}_bounds")
+
+    assert str(check.sqltext) == f"{column} >= {low:g} AND {column} <= {high:g}"
+
+
+def test_unset_value():
+    assert Reading().soil_moist is None
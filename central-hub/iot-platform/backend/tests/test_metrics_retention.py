@@ -0,0 +1,140 @@
+"""Tests of the metrics retention: rollups before deletes, batched deletes, archive retention."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.common.rollups import rollup_bucket
+from app.tasks import metrics_retention as retention_module
+from app.tasks.metrics_retention import MetricsRetention
+
+NOW = datetime(2026, 3, 10, 12, 7, tzinfo=timezone.utc)
+
+
+class FakeMetrics:
+    """Raw metrics of the plants, with the database work of the retention recorded in order."""
+
+    def __init__(self, timestamps: dict[int, list[datetime]]) -> None:
+        self.timestamps = {plant_id: sorted(values) for plant_id, values in timestamps.items()}
+        self.rolled_up: dict[int, list[tuple[datetime, datetime]]] = {p: [] for p in timestamps}
+        self.calls: list[tuple] = []
+
+    def oldest_timestamp(self, plant_id: int) -> datetime | None:
+        return min(self.timestamps[plant_id], default=None)
+
+    def rebuild_rollups(self, plant_id: int, start: datetime, end: datetime) -> None:
+        self.rolled_up[plant_id].append((start, end))
+        self.calls.append(("rollup", plant_id))
+
+    def delete_metrics_batch(self, plant_id: int, end: datetime) -> int:
+        size = retention_module.METRICS_RETENTION_BATCH_SIZE
+        batch = [t for t in self.timestamps[plant_id] if t < end][:size]
+        for timestamp in batch:
+            # A row is only deleted once a rebuilt rollup window covers it
+            assert any(start <= timestamp < stop for start, stop in self.rolled_up[plant_id])
+            self.timestamps[plant_id].remove(timestamp)
+        self.calls.append(("delete", plant_id, len(batch)))
+        return len(batch)
+
+
+@pytest.fixture
+def published(monkeypatch):
+    published: list[list[int]] = []
+
+    async def publish_metrics_purged(plant_ids: list[int]) -> None:
+        published.append(list(plant_ids))
+
+    monkeypatch.setattr(retention_module, "publish_metrics_purged", publish_metrics_purged)
+    monkeypatch.setattr(retention_module, "METRICS_RETENTION_BATCH_SIZE", 3)
+    monkeypatch.setattr(retention_module, "METRICS_RETENTION_BATCH_PAUSE", 0)
+    monkeypatch.setattr(retention_module, "METRICS_RETENTION_WINDOW", 3600)
+    return published
+
+
+def _retention(metrics: FakeMetrics) -> MetricsRetention:
+    retention = MetricsRetention()
+    retention._running = True
+    retention._oldest_timestamp = metrics.oldest_timestamp
+    retention._rebuild_rollups = metrics.rebuild_rollups
+    retention._delete_metrics_batch = metrics.delete_metrics_batch
+    return retention
+
+
+async def test_rollups_rebuilt_before_deletes(published):
+    cutoff = rollup_bucket(NOW - timedelta(days=1))
+    # 7 expired rows per hour window over 3 hours, then rows to keep
+    expired = [cutoff - timedelta(hours=3) + timedelta(minutes=8 * i) for i in range(22)]
+    kept = [cutoff + timedelta(minutes=i) for i in range(5)]
+    metrics = FakeMetrics({1: expired + kept})
+    retention = _retention(metrics)
+
+    await retention._purge_plant_metrics(1, cutoff)
+
+    assert metrics.timestamps[1] == kept
+    assert retention.deleted_metrics == len(expired)
+    assert published == [[1]]
+    # Each window is rolled up, then deleted in full batches until a partial one
+    windows = metrics.rolled_up[1]
+    assert windows[0][0] == expired[0] and windows[-1][1] == cutoff
+    assert all(previous[1] <= start for previous, (start, _) in zip(windows, windows[1:]))
+    assert metrics.calls[0] == ("rollup", 1)
+    for index, call in enumerate(metrics.calls):
+        if call[0] == "delete" and call[2] == 3:
+            assert metrics.calls[index + 1][0] == "delete"
+        if call[0] == "delete" and call[2] < 3 and index + 1 < len(metrics.calls):
+            assert metrics.calls[index + 1][0] == "rollup"
+
+
+async def test_nothing_expired(published):
+    cutoff = rollup_bucket(NOW - timedelta(days=1))
+    metrics = FakeMetrics({1: [cutoff + timedelta(minutes=1)], 2: []})
+    retention = _retention(metrics)
+
+    await retention._purge_plant_metrics(1, cutoff)
+    await retention._purge_plant_metrics(2, cutoff)
+
+    assert metrics.calls == []
+    assert published == []
+
+
+async def test_purge_stops_with_the_task(published):
+    cutoff = rollup_bucket(NOW - timedelta(days=1))
+    expired = [cutoff - timedelta(minutes=i + 1) for i in range(10)]
+    metrics = FakeMetrics({1: expired})
+    retention = _retention(metrics)
+
+    def stop_after_first_batch(plant_id: int, end: datetime) -> int:
+        retention._running = False
+        return FakeMetrics.delete_metrics_batch(metrics, plant_id, end)
+
+    retention._delete_metrics_batch = stop_after_first_batch
+    await retention._purge_plant_metrics(1, cutoff)
+
+    assert len(metrics.timestamps[1]) == len(expired) - 3
+    assert published == [[1]]
+
+
+@pytest.mark.parametrize("archive_days", [0, 400])
+async def test_archives_have_their_own_retention(monkeypatch, published, archive_days):
+    monkeypatch.setattr(retention_module, "METRICS_RAW_RETENTION_DAYS", 35)
+    monkeypatch.setattr(retention_module, "METRICS_ARCHIVE_RETENTION_DAYS", archive_days)
+    monkeypatch.setattr(retention_module, "METRICS_ROLLUP_RETENTION_DAYS", 0)
+    retention = _retention(FakeMetrics({}))
+    retention._is_partitioned = lambda: False
+    retention._plant_ids = lambda: []
+    cutoffs = []
+
+    def delete_archives(cutoff: datetime) -> tuple[int, list[int]]:
+        cutoffs.append(cutoff)
+        return 42, [7]
+
+    retention._delete_archives = delete_archives
+    await retention._enforce()
+
+    if archive_days:
+        expected = datetime.now(timezone.utc) - timedelta(days=archive_days)
+        assert len(cutoffs) == 1 and abs(cutoffs[0] - expected) < timedelta(minutes=1)
+        assert (retention.deleted_archived_metrics, published) == (42, [[7]])
+    else:
+        # The raw retention alone never deletes the cold copy of the metrics
+        assert (cutoffs, retention.deleted_archived_metrics, published) == ([], 0, [])
@@ -0,0 +1,122 @@
+"""Tests of the module heartbeat sweeps: connectivity transitions, batched in events."""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.common.constants import MODULE_HB_TIMEOUT
+from app.common.event_bus import InProcessEventBus
+from app.common.versions import ENTITIES, versions
+from app.models.module import Module
+from app.tasks import module_heartbeat as heartbeat_module
+from app.tasks.module_heartbeat import ModuleHeartbeatChecker
+
+
+class FakeSession:
+    """Session answering the sweep's queries: the modules, no settings and no coupled plants."""
+
+    def __init__(self, modules: list[Module]) -> None:
+        self.modules = modules
+
+    def execute(self, statement):
+        entity = statement.column_descriptions[0]["entity"]
+        rows = self.modules if entity is Module else []
+        scalars = SimpleNamespace(all=lambda: rows, first=lambda: None)
+        return SimpleNamespace(scalars=lambda: scalars)
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def sweeps(monkeypatch):
+    """Event bus and WebSocket broadcasts of the heartbeat checker, recorded."""
+    bus = InProcessEventBus()
+    recorded = SimpleNamespace(events=[], broadcasts=[])
+
+    async def record(event) -> None:
+        recorded.events.append([module["moduleId"] for module in event.data["modules"]])
+
+    async def emit_modules_connectivity(changes: dict) -> None:
+        recorded.broadcasts.append(changes)
+
+    bus.subscribe("modules_connectivity", record)
+    monkeypatch.setattr(heartbeat_module, "event_bus", bus)
+    monkeypatch.setattr(heartbeat_module, "ws_manager", SimpleNamespace(
+        emit_modules_connectivity=emit_modules_connectivity,
+    ))
+    monkeypatch.setattr(heartbeat_module, "MODULE_HB_BATCH_SIZE", 2)
+    recorded.bus = bus
+    return recorded
+
+
+def checker(modules: list[Module]) -> ModuleHeartbeatChecker:
+    checker = ModuleHeartbeatChecker()
+    checker._session_factory = lambda: FakeSession(modules)
+    return checker
+
+
+def seen(seconds_ago: float) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)
+
+
+async def test_offline_modules_batched(sweeps):
+    last_seen = seen(2 * MODULE_HB_TIMEOUT)
+    modules = [Module(id=f"M{index}", coupled=False, last_seen=last_seen) for index in range(5)]
+    before = versions.validators(ENTITIES)[0]
+    heartbeat = checker(modules)
+
+    await heartbeat._check_heartbeats()
+
+    # One event per MODULE_HB_BATCH_SIZE modules, each broadcast once
+    assert sweeps.events == [["M0", "M1"], ["M2", "M3"], ["M4"]]
+    assert [sorted(changes) for changes in sweeps.broadcasts] == sweeps.events
+    assert all(not online for changes in sweeps.broadcasts for online, _ in changes.values())
+    assert heartbeat.stats()["offlineModules"] == 5
+    assert versions.validators(ENTITIES)[0] != before
+
+    # Already offline: not broadcast again
+    await heartbeat._check_heartbeats()
+    assert len(sweeps.events) == 3 and heartbeat.sweeps == 2
+
+
+async def test_last_seen_refreshed_once(sweeps):
+    module = Module(id="M0", coupled=False, last_seen=seen(5))
+    heartbeat = checker([module])
+
+    await heartbeat._check_heartbeats()
+    await heartbeat._check_heartbeats()
+    assert sweeps.events == [["M0"]]
+
+    # Seen again since the previous sweep
+    module.last_seen = seen(0)
+    await heartbeat._check_heartbeats()
+    assert sweeps.events == [["M0"], ["M0"]]
+    assert sweeps.broadcasts[-1] == {"M0": (True, module.last_seen)}
+
+
+async def test_sweep_without_changes(sweeps):
+    heartbeat = checker([])
+
+    await heartbeat._check_heartbeats()
+
+    assert sweeps.events == [] and heartbeat.sweeps == 1
+
+
+async def test_sweep_of_the_leader_applied(sweeps):
+    heartbeat = checker([])
+    last_seen = seen(2 * MODULE_HB_TIMEOUT)
+    module = {"moduleId": "M7", "isOnline": False, "lastSeen": last_seen.isoformat()}
+
+    # Sweep of the leader, received from another process
+    await sweeps.bus._dispatch({
+        "kind": "modules_connectivity",
+        "origin": "leader",
+        "time": datetime.now(timezone.utc).isoformat(),
+        "data": {"modules": [module]},
+    })
+
+    assert sweeps.broadcasts == [{"M7": (False, last_seen)}]
+    assert heartbeat.mark_module_online("M7")
+    assert not heartbeat.mark_module_online("M7")
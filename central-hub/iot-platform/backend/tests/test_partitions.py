@@ -0,0 +1,132 @@
+"""Tests of the metrics partitioning: periods, conversion and partition naming (database tests)."""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import MetaData, func, select, text
+
+from app.common import partitions as partitions_module
+from app.common.partitions import (
+    DEFAULT_PARTITION,
+    LEGACY_PARTITION,
+    convert_to_partitioned,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    next_period,
+    period_start,
+)
+from app.models.metrics import Metrics, float_table
+from app.models.plant import Plant
+
+NOW = datetime(2026, 3, 18, 15, 30, tzinfo=timezone.utc)  # A Wednesday
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "granularity, start, following",
+    [
+        ("month", utc(2026, 3, 1), utc(2026, 4, 1)),
+        ("week", utc(2026, 3, 16), utc(2026, 3, 23)),
+    ],
+)
+def test_periods(granularity, start, following):
+    assert period_start(NOW, granularity) == start
+    assert next_period(start, granularity) == following
+
+
+def test_periods_across_years():
+    assert next_period(utc(2026, 12, 1), "month") == utc(2027, 1, 1)
+    assert period_start(utc(2027, 1, 1, 8), "week") == utc(2026, 12, 28)
+    # Periods are UTC, whatever the timestamp's zone
+    local = datetime(2026, 4, 1, 1, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert period_start(local, "month") == utc(2026, 3, 1)
+
+
+@pytest.fixture
+def metrics_rows(db_session, monkeypatch):
+    """Unpartitioned metrics table holding rows of a plant, up to NOW (float storage)."""
+    monkeypatch.setattr(partitions_module, "METRICS_STORAGE", "float")
+    # Definition of the partitioned table (the model's depends on METRICS_PARTITIONING at import)
+    metadata = MetaData()
+    Plant.__table__.to_metadata(metadata)
+    partitioned = float_table(metadata, partitioned=True)
+    model = SimpleNamespace(timestamp=Metrics.timestamp, __table__=partitioned)
+    monkeypatch.setattr(partitions_module, "Metrics", model)
+
+    plant = Plant(
+        name="Basil", module_id=None,
+        min_soil_moist=20, max_soil_moist=80, min_humidity=30, max_humidity=70,
+        min_light=100, max_light=10_000, min_temp=10, max_temp=30,
+    )
+    db_session.add(plant)
+    db_session.flush()
+    for days in (60, 30, 0):
+        db_session.add(Metrics(
+            plant_id=plant.id, timestamp=NOW - timedelta(days=days),
+            soil_moist=40, humidity=50, light=1000, temp=21,
+        ))
+    db_session.flush()
+    return plant
+
+
+def test_convert_to_partitioned(db_session, metrics_rows):
+    before = db_session.execute(select(func.max(Metrics.id))).scalar_one()
+
+    convert_to_partitioned(db_session, "month", NOW)
+
+    assert is_partitioned(db_session)
+    # The former table holds everything up to the end of the current period
+    [legacy] = list_partitions(db_session)
+    assert (legacy.name, legacy.start, legacy.end) == (LEGACY_PARTITION, None, utc(2026, 4, 1))
+    assert db_session.execute(select(func.count()).select_from(Metrics)).scalar_one() == 3
+
+    # Its indexes and sequence were renamed out of the way of the partitioned table's
+    indexes = set(db_session.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename IN ('metrics', :legacy)"
+    ), {"legacy": LEGACY_PARTITION}).scalars())
+    assert {f"ix_{LEGACY_PARTITION}_plant_id", f"ix_{LEGACY_PARTITION}_plant_timestamp"} <= indexes
+    assert {"ix_metrics_plant_id", "ix_metrics_plant_timestamp"} <= indexes
+
+    # New rows keep numbering after the former ones
+    db_session.add(Metrics(
+        plant_id=metrics_rows.id, timestamp=NOW, soil_moist=41, humidity=50, light=1000, temp=21,
+    ))
+    db_session.flush()
+    assert db_session.execute(select(func.max(Metrics.id))).scalar_one() > before
+
+
+@pytest.mark.parametrize(
+    "granularity, created",
+    [
+        # The current month is covered by the legacy partition
+        ("month", ["metrics_p20260401", "metrics_p20260501"]),
+        # Weeks starting before the legacy partition's end are skipped
+        ("week", []),
+    ],
+)
+def test_ensure_partitions(db_session, metrics_rows, granularity, created):
+    convert_to_partitioned(db_session, "month", NOW)
+
+    assert ensure_partitions(db_session, granularity, NOW, ahead=2) == created
+    # Idempotent
+    assert ensure_partitions(db_session, granularity, NOW, ahead=2) == []
+
+    partitions = list_partitions(db_session)
+    assert [p.name for p in partitions] == [LEGACY_PARTITION, *created, DEFAULT_PARTITION]
+    assert partitions[-1].default
+
+
+def test_ensure_week_partitions(db_session, metrics_rows):
+    convert_to_partitioned(db_session, "week", NOW)
+
+    created = ensure_partitions(db_session, "week", NOW + timedelta(days=7), ahead=1)
+
+    # Named after the Monday they start on
+    assert created == ["metrics_p20260323", "metrics_p20260330"]
+    partition = {p.name: p for p in list_partitions(db_session)}[created[0]]
+    assert (partition.start, partition.end) == (utc(2026, 3, 23), utc(2026, 3, 30))
@@ -0,0 +1,113 @@
+"""Tests of the deleted plants purge: batched deletes and progress events."""
+
+import pytest
+
+from app.common.event_bus import InProcessEventBus
+from app.tasks import plant_purge as purge_module
+from app.tasks.plant_purge import PlantPurger
+
+
+class FakePlant:
+    """Stored data of a deleted plant, with the database work of the purge recorded in order."""
+
+    def __init__(self, metrics: int, archived: int = 0) -> None:
+        self.metrics = metrics
+        self.archived = archived
+        self.calls: list[tuple] = []
+
+    def count_metrics(self, plant_id: int) -> int:
+        return self.metrics
+
+    def count_archive(self, plant_id: int) -> int:
+        return self.archived
+
+    def delete_metrics_batch(self, plant_id: int) -> int:
+        count = min(self.metrics, purge_module.PLANT_PURGE_BATCH_SIZE)
+        self.metrics -= count
+        self.calls.append(("metrics", count))
+        return count
+
+    def delete_archive(self, plant_id: int) -> int:
+        count, self.archived = self.archived, 0
+        self.calls.append(("archive", count))
+        return count
+
+    def delete_plant(self, plant_id: int) -> None:
+        self.calls.append(("plant", plant_id))
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    """Event bus of the purger, recording the progress events."""
+    bus = InProcessEventBus()
+    bus.events = []
+
+    async def record(event) -> None:
+        bus.events.append((event.data, event.local))
+
+    bus.subscribe("plant_purge", record)
+    monkeypatch.setattr(purge_module, "event_bus", bus)
+    monkeypatch.setattr(purge_module, "PLANT_PURGE_BATCH_SIZE", 3)
+    monkeypatch.setattr(purge_module, "PLANT_PURGE_BATCH_PAUSE", 0)
+    return bus
+
+
+def _purger(monkeypatch, plant: FakePlant) -> PlantPurger:
+    monkeypatch.setattr(purge_module, "count_archive", plant.count_archive)
+    monkeypatch.setattr(purge_module, "delete_archive", plant.delete_archive)
+    purger = PlantPurger()
+    purger._count_metrics = plant.count_metrics
+    purger._delete_metrics_batch = plant.delete_metrics_batch
+    purger._delete_plant = plant.delete_plant
+    return purger
+
+
+def _status(progress) -> tuple:
+    return progress.status, progress.total_metrics, progress.deleted_metrics
+
+
+def _progress(data: dict) -> tuple:
+    return data["totalMetrics"], data["deletedMetrics"], data["done"]
+
+
+@pytest.mark.parametrize("metrics, batches", [(7, [3, 3, 1]), (6, [3, 3, 0]), (0, [0])])
+async def test_purge_in_batches(monkeypatch, bus, metrics, batches):
+    plant = FakePlant(metrics, archived=2)
+    purger = _purger(monkeypatch, plant)
+    purger.schedule(5)
+    assert purger.progress(5).status == "pending"
+
+    await purger._purge_plant(5)
+
+    # Metrics batches until a partial one, then the archive, then the plant
+    assert plant.calls == [*(("metrics", count) for count in batches), ("archive", 2), ("plant", 5)]
+    assert _status(purger.progress(5)) == ("done", metrics + 2, metrics + 2)
+
+
+async def test_progress_events(monkeypatch, bus):
+    purger = _purger(monkeypatch, FakePlant(7, archived=2))
+
+    await purger._purge_plant(5)
+
+    # Counted, after each batch, then done
+    assert [_progress(data) for data, _ in bus.events] == [
+        (9, 0, False), (9, 3, False), (9, 6, False), (9, 7, False), (9, 9, True),
+    ]
+    assert all(data["plantId"] == 5 for data, _ in bus.events)
+
+
+async def test_progress_of_the_leader(monkeypatch, bus):
+    purger = _purger(monkeypatch, FakePlant(0))
+    purger.schedule(5)
+
+    # Published by the leader process
+    time = "2026-03-10T12:00:00+00:00"
+    data = {"plantId": 5, "totalMetrics": 9, "deletedMetrics": 3, "done": False}
+    await bus._dispatch({"kind": "plant_purge", "origin": "leader", "time": time, "data": data})
+
+    assert _status(purger.progress(5)) == ("purging", 9, 3)
+
+    # Its own events are already applied
+    purger.progress(5).deleted_metrics = 6
+    await bus.publish("plant_purge", data)
+    assert purger.progress(5).deleted_metrics == 6
@@ -0,0 +1,178 @@
+"""Tests of the vectorised time-series helpers."""
+
+import numpy as np
+import pytest
+
+from app.common.timeseries import fill_gaps, fit_trends, lttb
+
+GAP_THRESHOLD = 45
+INTERVAL = 30
+
+
+def _fill_gaps_loop(epochs: list[int], gap_threshold: int, interval: int) -> list:
+    """Previous history gap filling: a None slot per missing interval after each outage."""
+    result = []
+    for i, current_ts in enumerate(epochs):
+        result.append(current_ts)
+        if i + 1 < len(epochs):
+            gap = epochs[i + 1] - current_ts
+            if gap > gap_threshold:
+                for slot in range(1, gap // interval):
+                    result.append(None)
+    return result
+
+
+def _fill_gaps_vectorised(epochs: list[int], gap_threshold: int, interval: int) -> tuple:
+    """Lay out the fill_gaps result as the loop's list, and the epochs of the null slots."""
+    epochs_array = np.array(epochs, dtype=np.int64)
+    total, real_positions, null_positions, null_epochs = fill_gaps(
+        epochs_array, gap_threshold, interval
+    )
+    result: list[int | None] = [None] * total
+    for position, epoch in zip(real_positions, epochs):
+        result[position] = epoch
+    assert all(result[position] is None for position in null_positions)
+    return result, [int(epoch) for epoch in null_epochs]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fill_gaps_matches_loop(seed):
+    rng = np.random.default_rng(seed)
+    # Mostly regular readings, with outages of various lengths
+    outages = rng.random(300) < 0.1
+    steps = np.where(outages, rng.integers(46, 2000, 300), rng.integers(25, 46, 300))
+    epochs = (1_700_000_000 + np.cumsum(steps)).tolist()
+
+    result, null_epochs = _fill_gaps_vectorised(epochs, GAP_THRESHOLD, INTERVAL)
+
+    assert result == _fill_gaps_loop(epochs, GAP_THRESHOLD, INTERVAL)
+    expected_null_epochs = [
+        current + slot * INTERVAL
+        for current, following in zip(epochs, epochs[1:])
+        if following - current > GAP_THRESHOLD
+        for slot in range(1, (following - current) // INTERVAL)
+    ]
+    assert null_epochs == expected_null_epochs
+
+
+@pytest.mark.parametrize("epochs", [[], [1_700_000_000], [1_700_000_000, 1_700_000_030]])
+def test_fill_gaps_without_gaps(epochs):
+    epochs_array = np.array(epochs, dtype=np.int64)
+    total, real_positions, null_positions, null_epochs = fill_gaps(
+        epochs_array, GAP_THRESHOLD, INTERVAL
+    )
+
+    assert total == len(epochs)
+    assert real_positions.tolist() == list(range(len(epochs)))
+    assert len(null_positions) == len(null_epochs) == 0
+
+
+def test_fill_gaps_slots():
+    epochs = np.array([0, 30, 150, 180])
+    total, real_positions, null_positions, null_epochs = fill_gaps(epochs, GAP_THRESHOLD, INTERVAL)
+
+    assert total == 7
+    assert real_positions.tolist() == [0, 1, 5, 6]
+    assert null_positions.tolist() == [2, 3, 4]
+    assert null_epochs.tolist() == [60, 90, 120]
+
+
+@pytest.mark.parametrize("threshold", [3, 10, 100, 999])
+def test_lttb_point_count_and_endpoints(threshold):
+    rng = np.random.default_rng(0)
+    x = np.arange(1000) * 30
+    y = np.column_stack([np.sin(x / 3000) + rng.normal(0, 0.1, 1000), rng.random(1000)])
+
+    selected = lttb(x, y, threshold)
+
+    assert len(selected) == threshold
+    assert selected[0] == 0 and selected[-1] == 999
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[247] = 10.0
+
+    assert 247 in lttb(x, y, 20)
+
+
+@pytest.mark.parametrize("threshold", [2, 0, 50, 60])
+def test_lttb_keeps_all_points(threshold):
+    x = np.arange(50)
+
+    assert lttb(x, np.ones(50), threshold).tolist() == list(range(50))
+
+
+def test_fit_trends_exact_line():
+    times = np.array([[-5.0, -4.0, -3.0, -2.0, -1.0]])
+    values = 2.0 * times + 7.0
+
+    breaks = np.array([100.0])
+    slopes, intercepts, r2, fitted = fit_trends(times, values, np.ones_like(times), breaks)
+
+    assert slopes[0] == pytest.approx(2.0)
+    assert intercepts[0] == pytest.approx(7.0)
+    assert r2[0] == pytest.approx(1.0)
+    assert fitted[0] == 5
+
+
+def test_fit_trends_weighted():
+    rng = np.random.default_rng(1)
+    times = np.linspace(-24, 0, 40)
+    values = -0.8 * times + 40 + rng.normal(0, 2, 40)
+    weights = rng.integers(1, 120, 40).astype(float)
+
+    breaks = np.array([1e9])
+    slopes, intercepts, _, fitted = fit_trends(times[None], values[None], weights[None], breaks)
+
+    # np.polyfit weights the residuals, i.e. the square root of the squared residual weights
+    slope, intercept = np.polyfit(times, values, 1, w=np.sqrt(weights))
+    assert slopes[0] == pytest.approx(slope)
+    assert intercepts[0] == pytest.approx(intercept)
+    assert fitted[0] == 40
+
+
+def test_fit_trends_after_last_break():
+    times = np.arange(-10.0, 0.0)[None]
+    # Drying soil, watered twice: only the points after the last watering are fitted
+    values = np.array([[60.0, 58.0, 80.0, 78.0, 76.0, 90.0, 89.0, 88.0, 87.0, 86.0]])
+
+    slopes, intercepts, _, fitted = fit_trends(times, values, np.ones_like(times), np.array([10.0]))
+
+    assert fitted[0] == 5
+    assert slopes[0] == pytest.approx(-1.0)
+    assert intercepts[0] == pytest.approx(85.0)
+
+
+def test_fit_trends_ignores_padding():
+    times = np.array([[0.0, 0.0, -3.0, -2.0, -1.0], [-5.0, -4.0, -3.0, -2.0, -1.0]])
+    values = np.array([[0.0, 0.0, 3.0, 2.0, 1.0], [10.0, 11.0, 12.0, 13.0, 14.0]])
+    weights = np.array([[0.0, 0.0, 1.0, 1.0, 1.0], [1.0, 1.0, 1.0, 1.0, 1.0]])
+
+    # The padding would otherwise be seen as a jump (and fitted)
+    slopes, intercepts, _, fitted = fit_trends(times, values, weights, np.array([2.0, 2.0]))
+
+    assert fitted.tolist() == [3, 5]
+    assert slopes == pytest.approx([-1.0, 1.0])
+    assert intercepts == pytest.approx([0.0, 15.0])
+
+
+def test_fit_trends_not_enough_points():
+    times = np.array([[0.0, 0.0, -1.0], [0.0, -2.0, -2.0]])
+    weights = np.array([[0.0, 0.0, 5.0], [0.0, 1.0, 1.0]])
+
+    values = np.ones_like(times)
+    slopes, intercepts, r2, fitted = fit_trends(times, values, weights, np.array([1.0, 1.0]))
+
+    assert np.isnan(slopes).all() and np.isnan(intercepts).all() and np.isnan(r2).all()
+    assert fitted.tolist() == [1, 2]
+
+
+def test_fit_trends_no_points():
+    empty = np.zeros((4, 0))
+    slopes, intercepts, r2, fitted = fit_trends(empty, empty, empty, np.ones(4))
+
+    assert np.isnan(slopes).all() and np.isnan(intercepts).all() and np.isnan(r2).all()
+    assert fitted.tolist() == [0, 0, 0, 0]
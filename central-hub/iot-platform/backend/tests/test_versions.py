@@ -0,0 +1,49 @@
+"""Tests of the resource versions: connectivity variants of the ETags."""
+
+from datetime import datetime, timedelta, timezone
+
+from app.common import versions as versions_module
+from app.common.versions import ENTITIES, READINGS, ConnectivityExpiries
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+KEYS = (ENTITIES, READINGS)
+
+
+def test_unknown_before_a_full_response():
+    expiries = ConnectivityExpiries()
+
+    assert expiries.variant('W/"1"', *KEYS, at=NOW) is None
+
+
+def test_variant_changes_as_modules_go_offline(monkeypatch):
+    monkeypatch.setattr(versions_module, "MODULE_HB_TIMEOUT", 60)
+    expiries = ConnectivityExpiries()
+    last_seen = [NOW - timedelta(seconds=30), NOW - timedelta(seconds=10), None]
+
+    current = expiries.record('W/"1"', *KEYS, last_seen=last_seen, at=NOW)
+
+    assert expiries.variant('W/"1"', *KEYS, at=NOW + timedelta(seconds=29)) == current
+    # Online up to the timeout included (see is_module_online)
+    assert expiries.variant('W/"1"', *KEYS, at=NOW + timedelta(seconds=30)) == current
+    first_offline = expiries.variant('W/"1"', *KEYS, at=NOW + timedelta(seconds=31))
+    all_offline = expiries.variant('W/"1"', *KEYS, at=NOW + timedelta(seconds=51))
+    assert len({current, first_offline, all_offline}) == 3
+    assert expiries.variant('W/"1"', *KEYS, at=NOW + timedelta(hours=1)) == all_offline
+
+
+def test_unknown_once_the_versions_changed():
+    expiries = ConnectivityExpiries()
+    expiries.record('W/"1"', *KEYS, last_seen=[NOW], at=NOW)
+
+    assert expiries.variant('W/"2"', *KEYS, at=NOW) is None
+    # Resources are recorded separately
+    assert expiries.variant('W/"1"', ENTITIES, "plant:1", at=NOW) is None
+
+
+def test_naive_last_seen_is_utc(monkeypatch):
+    monkeypatch.setattr(versions_module, "MODULE_HB_TIMEOUT", 60)
+    expiries = ConnectivityExpiries()
+
+    current = expiries.record('W/"1"', *KEYS, last_seen=[NOW.replace(tzinfo=None)], at=NOW)
+
+    assert expiries.variant('W/"1"', *KEYS, at=NOW + timedelta(seconds=61)) != current
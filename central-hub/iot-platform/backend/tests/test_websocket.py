@@ -0,0 +1,423 @@
+"""Tests of the WebSocket fan-out (subscriptions, slow consumers, conflation window, resumption)."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import app.websocket
+from app.common.constants import WS_METRICS_WINDOW_MAX
+from app.common.live_state import live_state
+from app.schemas.metrics import MetricsResponse
+from app.schemas.websocket import SubscriptionRequest
+from app.websocket import WS_CLOSE_SLOW_CONSUMER, WebSocketManager
+
+
+class FakeWebSocket:
+    """WebSocket recording the messages sent to it; its sends block while it is stalled."""
+
+    def __init__(self) -> None:
+        self.accepted = False
+        self.messages: list[dict] = []
+        self.close_code: int | None = None
+        self.flowing = asyncio.Event()
+        self.flowing.set()
+
+    async def accept(self) -> None:
+        self.accepted = True
+
+    async def send_text(self, data: str) -> None:
+        await self.flowing.wait()
+        self.messages.append(json.loads(data))
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.close_code = code
+
+    def types(self) -> list[str]:
+        return [message["type"] for message in self.messages]
+
+    def events(self) -> list[dict]:
+        """Messages after the first one (SNAPSHOT or RESUMED)."""
+        return self.messages[1:]
+
+
+@pytest.fixture(autouse=True)
+def empty_live_state(monkeypatch):
+    monkeypatch.setattr(live_state, "metrics", {})
+    monkeypatch.setattr(live_state, "connectivity", {})
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    """Set the slow consumer policy, with a send queue of 3 messages."""
+    def set_policy(name: str) -> None:
+        monkeypatch.setattr(app.websocket, "WS_SLOW_CONSUMER_POLICY", name)
+        monkeypatch.setattr(app.websocket, "WS_SEND_QUEUE_SIZE", 3)
+    return set_policy
+
+
+async def settle() -> None:
+    """Let the writer tasks send what they can."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def metrics(value: float) -> MetricsResponse:
+    timestamp = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    return MetricsResponse(timestamp=timestamp, soilMoist=value, humidity=50, light=1000, temp=21)
+
+
+def soil_moist(events: list[dict]) -> list[tuple[int, float]]:
+    """(plant ID, soil moisture) of PLANT_METRICS messages."""
+    payloads = [event["payload"] for event in events]
+    return [(payload["plantId"], payload["metrics"]["soilMoist"]) for payload in payloads]
+
+
+async def connect(manager: WebSocketManager, connection_id: str, **kwargs) -> FakeWebSocket:
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, connection_id, **kwargs)
+    await settle()
+    return websocket
+
+
+async def connect_stalled(manager: WebSocketManager, connection_id: str) -> FakeWebSocket:
+    """Connect a client whose writer is stuck sending its SNAPSHOT."""
+    websocket = FakeWebSocket()
+    websocket.flowing.clear()
+    await manager.connect(websocket, connection_id)
+    await settle()
+    return websocket
+
+
+async def test_broadcast():
+    manager = WebSocketManager()
+    websockets = [await connect(manager, connection_id) for connection_id in ("a", "b")]
+
+    await manager.emit_plant_metrics(1, metrics(40))
+    await manager.emit_entity_change("plant", "update", 1)
+    await settle()
+
+    for websocket in websockets:
+        assert websocket.accepted
+        assert websocket.types() == ["SNAPSHOT", "PLANT_METRICS", "ENTITY_CHANGE"]
+    assert manager.stats()["sent"] == 6
+
+
+async def test_connect_sends_snapshot():
+    manager = WebSocketManager()
+    await manager.emit_plant_metrics(1, metrics(40))
+    await manager.emit_module_connectivity("A", True, None)
+
+    websocket = await connect(manager, "a")
+
+    assert websocket.accepted
+    assert websocket.types() == ["SNAPSHOT"]
+    payload = websocket.messages[0]["payload"]
+    assert payload["stream"] == manager.stream and payload["seq"] == 2
+    plants = [(plant["plantId"], plant["metrics"]["soilMoist"]) for plant in payload["plants"]]
+    assert plants == [(1, 40)]
+    assert [module["moduleId"] for module in payload["modules"]] == ["A"]
+
+
+async def test_seq_numbers_stream():
+    manager = WebSocketManager()
+    everything = await connect(manager, "all")
+    plant_2 = await connect(manager, "plant-2")
+    manager.subscribe("plant-2", SubscriptionRequest(type="SUBSCRIBE", plantIds=[2]))
+
+    for plant_id in (1, 2, 1, 2):
+        await manager.emit_entity_change("plant", "update", plant_id)
+    await settle()
+
+    # Numbered in the stream, whatever the subscriptions
+    assert [event["seq"] for event in everything.events()] == [1, 2, 3, 4]
+    assert [event["seq"] for event in plant_2.events()] == [2, 4]
+
+
+async def test_topic_filtering():
+    manager = WebSocketManager()
+    everything = await connect(manager, "all")
+    plant_1 = await connect(manager, "plant-1")
+    reply = manager.subscribe(
+        "plant-1", SubscriptionRequest(type="SUBSCRIBE", events=["PLANT_METRICS"], plantIds=[1])
+    )
+    assert reply.payload.events == ["PLANT_METRICS"]
+    assert reply.payload.plantIds == [1] and reply.payload.moduleIds is None
+    module_a = await connect(manager, "module-a")
+    manager.subscribe(
+        "module-a",
+        SubscriptionRequest(
+            type="SUBSCRIBE", events=["MODULE_CONNECTIVITY", "ENTITY_CHANGE"], moduleIds=["A"]
+        ),
+    )
+    manager.subscribe("module-a", SubscriptionRequest(type="UNSUBSCRIBE", events=["ENTITY_CHANGE"]))
+
+    await manager.emit_plant_metrics(1, metrics(40))
+    await manager.emit_plant_metrics(2, metrics(41))
+    await manager.emit_entity_change("plant", "update", 1)
+    await manager.emit_module_connectivity("B", True, None)
+    await manager.emit_module_connectivity("A", False, None)
+    await manager.emit_entity_change("module", "update", "A")
+    await settle()
+
+    assert everything.types()[1:] == [
+        "PLANT_METRICS", "PLANT_METRICS", "ENTITY_CHANGE",
+        "MODULE_CONNECTIVITY", "MODULE_CONNECTIVITY", "ENTITY_CHANGE",
+    ]
+    assert soil_moist(plant_1.events()) == [(1, 40)]
+    assert module_a.types()[1:] == ["MODULE_CONNECTIVITY"]
+    assert module_a.events()[0]["payload"]["moduleId"] == "A"
+
+
+async def test_batch_subsets():
+    manager = WebSocketManager()
+    everything = await connect(manager, "all")
+    module_a = await connect(manager, "module-a")
+    manager.subscribe("module-a", SubscriptionRequest(type="SUBSCRIBE", moduleIds=["A"]))
+    module_c = await connect(manager, "module-c")
+    manager.subscribe("module-c", SubscriptionRequest(type="SUBSCRIBE", moduleIds=["C"]))
+
+    await manager.emit_modules_connectivity({"A": (False, None), "B": (True, None)})
+    await settle()
+
+    # A single message, numbered once, with only the subscribed modules
+    modules = [event["payload"]["modules"] for event in everything.events()]
+    assert [[module["moduleId"] for module in batch] for batch in modules] == [["A", "B"]]
+    assert module_a.types()[1:] == ["MODULES_CONNECTIVITY"]
+    assert [module["moduleId"] for module in module_a.events()[0]["payload"]["modules"]] == ["A"]
+    assert module_a.events()[0]["seq"] == everything.events()[0]["seq"] == 1
+    assert module_c.types() == ["SNAPSHOT"]
+    assert not live_state.connectivity["A"].isOnline and live_state.connectivity["B"].isOnline
+
+
+async def test_unsubscribe_all():
+    manager = WebSocketManager()
+    websocket = await connect(manager, "a")
+    manager.subscribe("a", SubscriptionRequest(type="UNSUBSCRIBE", plantIds=None))
+
+    await manager.emit_plant_metrics(1, metrics(40))
+    await manager.emit_module_connectivity("A", True, None)
+    await settle()
+
+    assert websocket.types()[1:] == ["MODULE_CONNECTIVITY"]
+
+
+async def test_unknown_connection():
+    manager = WebSocketManager()
+
+    assert manager.subscribe("a", SubscriptionRequest(type="SUBSCRIBE", plantIds=[1])) is None
+
+
+async def test_metrics_window():
+    manager = WebSocketManager()
+    websocket = await connect(manager, "a")
+    reply = manager.subscribe("a", SubscriptionRequest(type="SUBSCRIBE", metricsWindow=0.05))
+    assert reply.payload.metricsWindow == 0.05
+
+    for value in range(10):
+        await manager.emit_plant_metrics(1 + value % 2, metrics(value))
+    await manager.emit_entity_change("plant", "update", 1)
+    await settle()
+
+    # Other events are not held
+    assert websocket.types()[1:] == ["ENTITY_CHANGE"]
+
+    await asyncio.sleep(0.1)
+    await settle()
+    assert soil_moist(websocket.events()[1:]) == [(1, 8), (2, 9)]
+
+    # One update per plant per window
+    for value in range(10, 13):
+        await manager.emit_plant_metrics(1, metrics(value))
+    await asyncio.sleep(0.1)
+    await settle()
+    assert soil_moist(websocket.events()[3:]) == [(1, 12)]
+    assert manager.stats()["conflated"] == 10
+
+
+async def test_metrics_window_off_flushes():
+    manager = WebSocketManager()
+    websocket = await connect(manager, "a")
+    manager.subscribe("a", SubscriptionRequest(type="SUBSCRIBE", metricsWindow=60))
+
+    await manager.emit_plant_metrics(1, metrics(1))
+    await manager.emit_plant_metrics(1, metrics(2))
+    assert manager.stats()["held"] == 1
+    manager.subscribe("a", SubscriptionRequest(type="SUBSCRIBE", metricsWindow=0))
+    await manager.emit_plant_metrics(1, metrics(3))
+    await settle()
+
+    assert soil_moist(websocket.events()) == [(1, 2), (1, 3)]
+
+
+async def test_metrics_window_capped():
+    manager = WebSocketManager()
+    await connect(manager, "a")
+
+    reply = manager.subscribe("a", SubscriptionRequest(type="SUBSCRIBE", metricsWindow=86400))
+
+    assert reply.payload.metricsWindow == WS_METRICS_WINDOW_MAX
+
+
+async def test_drop_oldest(policy):
+    policy("drop_oldest")
+    manager = WebSocketManager()
+    websocket = await connect_stalled(manager, "a")
+
+    for plant_id in range(1, 11):
+        await manager.emit_entity_change("plant", "update", plant_id)
+    websocket.flowing.set()
+    await settle()
+
+    # The SNAPSHOT was being sent, the 3 latest events were kept
+    assert websocket.types() == ["SNAPSHOT", "ENTITY_CHANGE", "ENTITY_CHANGE", "ENTITY_CHANGE"]
+    assert [event["seq"] for event in websocket.events()] == [8, 9, 10]
+    stats = manager.stats()
+    assert stats["dropped"] == 7 and stats["conflated"] == 0 and stats["slowDisconnects"] == 0
+    assert "a" in manager.active_connections
+
+
+async def test_conflate(policy):
+    policy("conflate")
+    manager = WebSocketManager()
+    websocket = await connect_stalled(manager, "a")
+
+    await manager.emit_entity_change("plant", "update", 1)
+    for value in range(10):
+        await manager.emit_plant_metrics(1 + value % 2, metrics(value))
+    # Nothing to conflate it with: the oldest message is dropped
+    await manager.emit_entity_change("plant", "update", 2)
+    websocket.flowing.set()
+    await settle()
+
+    # Full queue: the metrics of a plant replaced its queued ones
+    assert websocket.types()[1:] == ["PLANT_METRICS", "PLANT_METRICS", "ENTITY_CHANGE"]
+    events = websocket.events()
+    assert soil_moist(events[:2]) == [(1, 8), (2, 9)]
+    assert events[2]["payload"]["id"] == 2
+    stats = manager.stats()
+    assert stats["dropped"] == 1 and stats["conflated"] == 8
+
+
+async def test_disconnect(policy):
+    policy("disconnect")
+    manager = WebSocketManager()
+    websocket = await connect_stalled(manager, "slow")
+    other = await connect(manager, "other")
+
+    for plant_id in range(1, 5):
+        await manager.emit_entity_change("plant", "update", plant_id)
+        await settle()
+
+    # Unregistered at once, closed once its pending send returns
+    assert "slow" not in manager.active_connections
+    websocket.flowing.set()
+    await settle()
+
+    assert websocket.close_code == WS_CLOSE_SLOW_CONSUMER
+    assert websocket.types() == ["SNAPSHOT"]
+    assert len(other.events()) == 4
+    stats = manager.stats()
+    assert stats["slowDisconnects"] == 1 and stats["connections"] == 1 and stats["dropped"] == 3
+
+
+async def test_send_timeout(monkeypatch):
+    monkeypatch.setattr(app.websocket, "WS_SEND_TIMEOUT", 0.01)
+    manager = WebSocketManager()
+    websocket = await connect_stalled(manager, "a")
+
+    await asyncio.sleep(0.05)
+    await settle()
+
+    # Stalled whatever the policy
+    assert websocket.close_code == WS_CLOSE_SLOW_CONSUMER
+    assert "a" not in manager.active_connections
+    assert manager.stats()["slowDisconnects"] == 1
+
+
+async def test_closed_connection_released():
+    manager = WebSocketManager()
+    websocket = await connect(manager, "a")
+    manager.subscribe("a", SubscriptionRequest(type="SUBSCRIBE", metricsWindow=60))
+    await manager.emit_plant_metrics(1, metrics(1))
+    client = manager.active_connections["a"]
+    flush = client.flush
+
+    async def closed(data: str) -> None:
+        raise RuntimeError("connection closed")
+
+    websocket.send_text = closed
+    for plant_id in range(2, 4):
+        await manager.emit_entity_change("plant", "update", plant_id)
+    await settle()
+
+    # Released by the writer, before the endpoint unregisters the connection
+    assert client.writer.done()
+    assert flush.cancelled() and client.flush is None
+    assert (len(client.queue), len(client.pending)) == (0, 0)
+    stats = manager.stats()
+    # The SNAPSHOT was sent, the held metrics and the event queued behind the failed send dropped
+    assert stats["sent"] == 1 and stats["dropped"] == 2
+
+
+async def test_resume_within_replay():
+    manager = WebSocketManager()
+    first = await connect(manager, "a")
+    for plant_id in range(1, 6):
+        await manager.emit_entity_change("plant", "update", plant_id)
+    await settle()
+    since = first.events()[1]["seq"]
+    await manager.disconnect("a")
+
+    for plant_id in range(6, 9):
+        await manager.emit_entity_change("plant", "update", plant_id)
+    websocket = await connect(manager, "b", stream=manager.stream, since=since)
+
+    assert websocket.types()[0] == "RESUMED"
+    assert websocket.messages[0]["payload"] == {"stream": manager.stream, "since": 2, "seq": 8}
+    assert [event["seq"] for event in websocket.events()] == [3, 4, 5, 6, 7, 8]
+    assert [event["payload"]["id"] for event in websocket.events()] == [3, 4, 5, 6, 7, 8]
+
+
+async def test_resume_up_to_date():
+    manager = WebSocketManager()
+    await manager.emit_entity_change("plant", "update", 1)
+
+    websocket = await connect(manager, "a", stream=manager.stream, since=1)
+
+    assert websocket.types() == ["RESUMED"]
+
+
+@pytest.mark.parametrize("since", [2, 11])
+async def test_resume_outside_replay(monkeypatch, since):
+    monkeypatch.setattr(app.websocket, "WS_REPLAY_SIZE", 4)
+    manager = WebSocketManager()
+    for plant_id in range(1, 11):
+        await manager.emit_entity_change("plant", "update", plant_id)
+
+    websocket = await connect(manager, "a", stream=manager.stream, since=since)
+
+    # Events 3 to 6 are no longer kept (and 11 was never sent): the client starts over
+    assert websocket.types() == ["SNAPSHOT"]
+    assert websocket.messages[0]["payload"]["seq"] == 10
+
+
+async def test_resume_other_stream():
+    manager = WebSocketManager()
+    await manager.emit_entity_change("plant", "update", 1)
+
+    websocket = await connect(manager, "a", stream=WebSocketManager().stream, since=0)
+
+    assert websocket.types() == ["SNAPSHOT"]
+
+
+async def test_resume_beyond_send_queue(monkeypatch):
+    monkeypatch.setattr(app.websocket, "WS_SEND_QUEUE_SIZE", 3)
+    manager = WebSocketManager()
+    for plant_id in range(1, 5):
+        await manager.emit_entity_change("plant", "update", plant_id)
+
+    websocket = await connect(manager, "a", stream=manager.stream, since=0)
+
+    assert websocket.types() == ["SNAPSHOT"]
@@ -1,5 +1,5 @@
 import { useQueryClient } from "@tanstack/react-query"
-import { useRef, useState } from "react"
+import { useCallback, useRef, useState } from "react"
 import useWebSocket, { ReadyState } from "react-use-websocket"
 import { toast } from "sonner"
 import { getToken } from "./use-auth"
@@ -8,7 +8,10 @@ import type {
   IncomingWebSocketMessage,
   PlantMetricsMessage,
   ModuleConnectivityMessage,
+  ModulesConnectivityMessage,
   EntityChangeMessage,
+  SnapshotMessage,
+  ResumedMessage,
   Plant,
   Module
 } from "../types"
@@ -22,18 +25,26 @@ export function useSystemWebSocket() {
   const offlineToastId = useRef<string | number | null>(null)
   const [reconnectKey, setReconnectKey] = useState(0)
 
+  // Event stream and last event seq received, to resume the connection after a reconnect
+  const stream = useRef<string | null>(null)
+  const lastSeq = useRef(0)
+
   const reconnect = () => setReconnectKey((prev) => prev + 1)
 
-  const { readyState } = useWebSocket(`${WS_BASE_URL}/ws?token=${token}&key=${reconnectKey}`, {
+  // Called on every (re)connection
+  const getUrl = useCallback(() => {
+    const resume = stream.current ? `&stream=${stream.current}&since=${lastSeq.current}` : ""
+    return `${WS_BASE_URL}/ws?token=${token}&key=${reconnectKey}${resume}`
+  }, [token, reconnectKey])
+
+  const { readyState } = useWebSocket(getUrl, {
     onOpen: () => {
       if (offlineToastId.current) {
         // Dismiss the offline toast when connection is restored
         toast.dismiss(offlineToastId.current)
         offlineToastId.current = null
 
-        // Refetch cache on connect
-        queryClient.invalidateQueries({ queryKey: QueryKeys.plants, refetchType: "all" })
-        queryClient.invalidateQueries({ queryKey: QueryKeys.modules(), refetchType: "all" })
+        // Plants and modules are brought up to date by the missed events, or the snapshot
         queryClient.invalidateQueries({ queryKey: QueryKeys.alertsSettings })
         toast.success("Connected.")
       }
@@ -62,14 +73,26 @@ export function useSystemWebSocket() {
 
       // If it's not "PONG", it must be a JSON message
       const message = JSON.parse(event.data) as IncomingWebSocketMessage
+      if ("seq" in message) {
+        lastSeq.current = Math.max(lastSeq.current, message.seq)
+      }
 
       switch (message.type) {
+        case "SNAPSHOT":
+          handleSnapshot(message as SnapshotMessage)
+          break
+        case "RESUMED":
+          handleResumed(message as ResumedMessage)
+          break
         case "PLANT_METRICS":
           handleMetrics(message as PlantMetricsMessage)
           break
         case "MODULE_CONNECTIVITY":
           handleModuleConnectivity(message as ModuleConnectivityMessage)
           break
+        case "MODULES_CONNECTIVITY":
+          handleModulesConnectivity(message as ModulesConnectivityMessage)
+          break
         case "ENTITY_CHANGE":
           handleEntityChange(message as EntityChangeMessage)
           break
@@ -87,6 +110,28 @@ export function useSystemWebSocket() {
     }
   })
 
+  function handleSnapshot(message: SnapshotMessage) {
+    const { payload } = message
+
+    // Events may have been missed: refetch the plants and modules (conditional requests), on a reconnection only
+    if (stream.current) {
+      queryClient.invalidateQueries({ queryKey: QueryKeys.plants, refetchType: "all" })
+      queryClient.invalidateQueries({ queryKey: QueryKeys.modules(), refetchType: "all" })
+    }
+    stream.current = payload.stream
+    lastSeq.current = payload.seq
+
+    payload.plants.forEach((plant) => handleMetrics({ type: "PLANT_METRICS", seq: payload.seq, payload: plant }))
+    payload.modules.forEach((module) =>
+      handleModuleConnectivity({ type: "MODULE_CONNECTIVITY", seq: payload.seq, payload: module })
+    )
+  }
+
+  function handleResumed(message: ResumedMessage) {
+    // The missed events follow, the cached plants and modules are kept
+    stream.current = message.payload.stream
+  }
+
   function handleMetrics(message: PlantMetricsMessage) {
     const { plantId, metrics } = message.payload
 
@@ -131,6 +176,12 @@ export function useSystemWebSocket() {
     }
   }
 
+  function handleModulesConnectivity(message: ModulesConnectivityMessage) {
+    message.payload.modules.forEach((module) =>
+      handleModuleConnectivity({ type: "MODULE_CONNECTIVITY", seq: message.seq, payload: module })
+    )
+  }
+
   function handleEntityChange(message: EntityChangeMessage) {
     const { entity, action, id } = message.payload
 
@@ -17,7 +17,7 @@ export type HistoryMetrics = {
 }
 
 export type HistoryMeta = {
-  range: "hour" | "day" | "week" | "month"
+  range: "hour" | "day" | "week" | "month" | "custom"
   aggregation: string
   from: string
   to: string
@@ -27,3 +27,19 @@ export type HistoryResponse = {
   meta: HistoryMeta
   data: HistoryMetrics[]
 }
+
+// Columnar history (format=columnar): epoch seconds, one array per metric
+export type HistoryColumns = {
+  start: number | null
+  step: number | null
+  timestamps: number[] | null
+  soilMoist: (number | null)[]
+  temp: (number | null)[]
+  light: (number | null)[]
+  humidity: (number | null)[]
+}
+
+export type HistoryColumnarResponse = {
+  meta: HistoryMeta
+  data: HistoryColumns
+}
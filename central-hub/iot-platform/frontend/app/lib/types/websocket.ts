@@ -8,6 +8,7 @@ export type PlantMetricsPayload = {
 
 export type PlantMetricsMessage = {
   type: "PLANT_METRICS"
+  seq: number
   payload: PlantMetricsPayload
 }
 
@@ -22,9 +23,19 @@ export type ModuleConnectivityPayload = {
 
 export type ModuleConnectivityMessage = {
   type: "MODULE_CONNECTIVITY"
+  seq: number
   payload: ModuleConnectivityPayload
 }
 
+// MODULES_CONNECTIVITY - Connectivity of several modules, from a heartbeat sweep (offline modules, lastSeen refresh)
+export type ModulesConnectivityMessage = {
+  type: "MODULES_CONNECTIVITY"
+  seq: number
+  payload: {
+    modules: ModuleConnectivityPayload[]
+  }
+}
+
 // ENTITY_CHANGE - Cache invalidation signal (Refetch)
 export type EntityChangePayload = {
   entity: "plant" | "module"
@@ -34,12 +45,82 @@ export type EntityChangePayload = {
 
 export type EntityChangeMessage = {
   type: "ENTITY_CHANGE"
+  seq: number
   payload: EntityChangePayload
 }
 
+// ANOMALY - Unusual readings of a plant (spike, stuck sensor, dropout)
+export type AnomalyPayload = {
+  plantId: number
+  metric: "soilMoist" | "humidity" | "light" | "temp"
+  kind: "SPIKE" | "STUCK" | "DROPOUT"
+  value: number
+  expected: number
+  score: number | null
+  timestamp: string
+}
+
+export type AnomalyMessage = {
+  type: "ANOMALY"
+  seq: number
+  payload: AnomalyPayload
+}
+
+export type WebSocketEvent = "PLANT_METRICS" | "MODULE_CONNECTIVITY" | "ENTITY_CHANGE" | "ANOMALY"
+
+// SUBSCRIPTIONS - Current subscriptions of the connection (null: all)
+export type SubscriptionsPayload = {
+  events: WebSocketEvent[] | null
+  plantIds: number[] | null
+  moduleIds: string[] | null
+  metricsWindow: number // Seconds between PLANT_METRICS of a plant, 0: every update
+}
+
+export type SubscriptionsMessage = {
+  type: "SUBSCRIPTIONS"
+  payload: SubscriptionsPayload
+}
+
+// SNAPSHOT - Live state of the plants and modules (first message of a connection)
+export type SnapshotPayload = {
+  stream: string
+  seq: number
+  plants: PlantMetricsPayload[]
+  modules: ModuleConnectivityPayload[]
+}
+
+export type SnapshotMessage = {
+  type: "SNAPSHOT"
+  payload: SnapshotPayload
+}
+
+// RESUMED - The events missed since the reconnection's `since` seq follow (first message, instead of SNAPSHOT)
+export type ResumedPayload = {
+  stream: string
+  since: number
+  seq: number
+}
+
+export type ResumedMessage = {
+  type: "RESUMED"
+  payload: ResumedPayload
+}
+
 // Union of all possible messages
 export type IncomingWebSocketMessage =
   | PlantMetricsMessage
   | ModuleConnectivityMessage
+  | ModulesConnectivityMessage
   | EntityChangeMessage
+  | AnomalyMessage
+  | SubscriptionsMessage
+  | SnapshotMessage
+  | ResumedMessage
   | { type: "PONG" }
+
+// SUBSCRIBE / UNSUBSCRIBE - Add or remove subscriptions (omitted fields are unchanged)
+export type SubscriptionRequest = {
+  type: "SUBSCRIBE" | "UNSUBSCRIBE"
+} & Partial<Omit<SubscriptionsPayload, "metricsWindow">> & {
+  metricsWindow?: number | null // SUBSCRIBE only
+}